@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException
+from app.core.responses import FastResponseRoute
 
 from app.models.dto.compartilhado.response import Response
 from app.models.dto.module_auth.infoAuth import InfoAuth
@@ -14,6 +15,7 @@ logging.basicConfig(level=logging.DEBUG)
 service_user = ServiceAuth()
 router = APIRouter(
   prefix="/auth",
+  route_class=FastResponseRoute,
   tags=["Autenticação"]
 )
 
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, HTTPException, Depends
+from app.core.responses import FastResponseRoute
+
+from app.models.dto.compartilhado.response import Response
+from app.services.module_jobs.service_jobs import ServiceJobs
+from app.core.auth import get_current_user_id
+
+router = APIRouter(
+    prefix="/jobs",
+    route_class=FastResponseRoute,
+    tags=["jobs"],
+)
+
+# Compartilhado pelos controllers que registram handlers ou enfileiram jobs
+service_jobs = ServiceJobs()
+
+@router.get("/{job_id}", response_model=Response)
+async def get_job(job_id: str, current_user_id: str = Depends(get_current_user_id)):
+    """Status of a background job of the current user (queued, running, succeeded or failed) and its result."""
+    result = await service_jobs.get_job(job_id, current_user_id)
+    
+    if not result.success:
+        raise HTTPException(status_code=404, detail=result.data)
+    
+    return Response(data=result.data, success=True)
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends
+from app.core.responses import FastResponseRoute
+
+from app.models.dto.compartilhado.response import Response
+from app.core.auth import require_metrics_token
+from app.core.metrics import collect_metrics
+
+router = APIRouter(
+    prefix="/metrics",
+    route_class=FastResponseRoute,
+    tags=["metrics"],
+)
+
+@router.get("", response_model=Response, dependencies=[Depends(require_metrics_token)])
+async def get_metrics():
+    """In-process counters (caches, resilience, storage clients) of this worker. Internal: requires X-Metrics-Token."""
+    return Response(data=collect_metrics(), success=True)
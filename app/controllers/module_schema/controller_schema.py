@@ -1,4 +1,7 @@
-from fastapi import APIRouter, HTTPException, Depends, Form, File, UploadFile
+from fastapi import APIRouter, HTTPException, Depends, Form, File, UploadFile, Header
+from fastapi import Response as HTTPResponse
+from fastapi.responses import StreamingResponse
+from app.core.responses import FastJSONResponse, FastResponseRoute
 from typing import Optional
 import json
 import logging
@@ -11,36 +14,86 @@ from app.models.dto.compartilhado.response import Response
 from app.models.dto.module_schema.create_schema import CreateSchema
 from app.models.dto.module_schema.vinculate_schema import VinculateSchema
 from app.models.dto.module_schema.update_schema_title import UpdateSchemaTitle
+from app.models.dto.module_schema.fork_schema import ForkSchema
 from app.services.module_schema.service_schema import ServiceSchema
+from app.services.module_schema.service_export import ServiceExport
+from app.controllers.module_websocket.controller_websocket import service_websocket
+from app.controllers.module_jobs.controller_jobs import service_jobs
 from app.core.auth import get_current_user_id
 
 router = APIRouter(
     prefix="/schemas",
+    route_class=FastResponseRoute,
     tags=["schemas"],
     responses={404: {"description": "Not found"}},
 )
 
 # Initialize service
 service_schema = ServiceSchema()
+service_export = ServiceExport()
+service_jobs.register("publish_schema_image", service_schema.run_publish_image_job, on_failed=service_schema.discard_publish_image_job)
+service_jobs.register("purge_schema_data", service_schema.run_purge_schema_job)
 
 def http_exception(result, status=500):
     raise HTTPException(detail=result.data, status_code=status)
 
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # comparação fraca (RFC 9110): ignora o prefixo W/ que proxies com compressão adicionam
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
 @router.get("", response_model=Response)
-async def get_all_schemas(current_user_id: str = Depends(get_current_user_id)):
-    result = await service_schema.get_schemas_by_user(current_user_id)
+async def get_all_schemas(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    count: bool = False,
+    thumbnails: bool = False,
+    current_user_id: str = Depends(get_current_user_id)):
+    """
+    Schemas of the current user.
+    
+    Without limit or cursor the full list is returned, as before. With either of them the
+    result is paginated (most recently updated first): pass the returned next_cursor to get
+    the following page; fields is a comma separated list of schema columns (all by default)
+    and count=true also returns the total number of schemas.
+    """
+    if limit is None and cursor is None:
+        result = await service_schema.get_schemas_by_user(current_user_id, with_thumbnails=thumbnails)
+        
+        if not result.success:
+            http_exception(result, 500)
+        
+        return Response(data=result.data, success=True)
+    
+    result = await service_schema.get_schemas_page(
+        current_user_id, limit, cursor, fields, with_count=count, with_thumbnails=thumbnails
+    )
     
     if not result.success:
+        if isinstance(result.data, dict) and result.data.get("invalid_request"):
+            raise HTTPException(status_code=400, detail=result.data["message"])
         http_exception(result, 500)
     
     return Response(data=result.data, success=True)
 
+@router.get("/export")
+async def export_user_schemas(current_user_id: str = Depends(get_current_user_id)):
+    """All schemas of the current user as NDJSON (schema line, one line per cell, schema_end), streamed."""
+    return StreamingResponse(
+        service_export.stream_export(current_user_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="schemas.ndjson"'}
+    )
+
 @router.get("/user/{user_id}", response_model=Response)
-async def get_schemas_by_user(user_id: str, current_user_id: str = Depends(get_current_user_id)):
+async def get_schemas_by_user(user_id: str, thumbnails: bool = False, current_user_id: str = Depends(get_current_user_id)):
     if user_id != current_user_id:
         raise HTTPException(status_code=403, detail="Acesso negado: você só pode acessar seus próprios schemas")
     
-    result = await service_schema.get_schemas_by_user(user_id)
+    result = await service_schema.get_schemas_by_user(user_id, with_thumbnails=thumbnails)
     
     if not result.success:
         http_exception(result, 404)
@@ -48,14 +101,93 @@ async def get_schemas_by_user(user_id: str, current_user_id: str = Depends(get_c
     return Response(data=result.data, success=True)
 
 @router.get("/{schema_id}", response_model=Response)
-async def get_schema_by_id(schema_id: str, current_user_id: str = Depends(get_current_user_id)):
+async def get_schema_by_id(
+    schema_id: str,
+    if_none_match: Optional[str] = Header(None),
+    current_user_id: str = Depends(get_current_user_id)):
+    """
+    Schema with its cells. Sends an ETag; a request with a matching If-None-Match gets
+    304 Not Modified without the cells being read.
+    """
+    if if_none_match:
+        etag_result = await service_schema.get_schema_etag(
+            schema_id, current_user_id, service_websocket.get_live_version(schema_id)
+        )
+        if etag_result.success and etag_matches(if_none_match, etag_result.data):
+            return HTTPResponse(status_code=304, headers={"ETag": etag_result.data, "Cache-Control": "private, no-cache"})
+    
     result = await service_schema.get_schema_with_cells(schema_id, current_user_id)
     
+    if not result.success:
+        http_exception(result, 500)
+    
+    etag = service_schema.build_schema_etag(result.data["schema"], result.data["version"])
+    return FastJSONResponse(Response(data=result.data, success=True), headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+
+@router.get("/{schema_id}/cells", response_model=Response)
+async def get_schema_cells_page(
+    schema_id: str,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    current_user_id: str = Depends(get_current_user_id)):
+    """Paginated cells of a schema, tables first and links last, so clients can render progressively."""
+    result = await service_schema.get_schema_cells_page(schema_id, current_user_id, offset, limit)
+    
+    if not result.success:
+        http_exception(result, 500)
+    
+    return Response(data=result.data, success=True)
+
+@router.get("/{schema_id}/export")
+async def export_schema(schema_id: str, current_user_id: str = Depends(get_current_user_id)):
+    """One schema and its cells as NDJSON, streamed straight from the database cursor."""
+    result = await service_export.prepare_schema_export(schema_id, current_user_id)
+    
+    if not result.success:
+        http_exception(result, 404)
+    
+    return StreamingResponse(
+        service_export.stream_export(current_user_id, result.data),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="schema-{schema_id}.ndjson"'}
+    )
+
+@router.get("/{schema_id}/versions", response_model=Response)
+async def list_schema_versions(
+    schema_id: str,
+    limit: Optional[int] = None,
+    before: Optional[int] = None,
+    current_user_id: str = Depends(get_current_user_id)):
+    """Version history of a schema, newest first. Use next_before as 'before' to get the next page."""
+    result = await service_schema.service_versions.list_versions(schema_id, current_user_id, limit, before)
+    
     if not result.success:
         http_exception(result, 500)
     
     return Response(data=result.data, success=True)
 
+@router.get("/{schema_id}/versions/{version}", response_model=Response)
+async def get_schema_version(schema_id: str, version: int, current_user_id: str = Depends(get_current_user_id)):
+    """Cells of the schema as they were in the given version."""
+    result = await service_schema.service_versions.get_version(schema_id, version, current_user_id)
+    
+    if not result.success:
+        http_exception(result, 404)
+    
+    return Response(data=result.data, success=True)
+
+@router.post("/{schema_id}/versions/{version}/restore", response_model=Response)
+async def restore_schema_version(schema_id: str, version: int, current_user_id: str = Depends(get_current_user_id)):
+    """Makes the given version the current state of the schema (recorded as a new version)."""
+    result = await service_websocket.restore_version(schema_id, version, current_user_id)
+    
+    if not result.success:
+        if isinstance(result.data, dict) and result.data.get("conflict"):
+            http_exception(result, 409)
+        http_exception(result, 400)
+    
+    return Response(data=result.data, success=True)
 
 @router.get("/{schema_id}/collaborative", response_model=Response)
 async def get_schema_by_users(schema_id: str, current_user_id: str = Depends(get_current_user_id)):
@@ -76,6 +208,21 @@ async def create_schema(schema_data: CreateSchema, current_user_id: str = Depend
     return Response(data=result.data, success=True)
 
 
+@router.post("/{schema_id}/fork", response_model=Response, status_code=201)
+async def fork_schema(schema_id: str, fork_data: Optional[ForkSchema] = None, current_user_id: str = Depends(get_current_user_id)):
+    """Duplicates the schema server-side (cells cloned in MongoDB, thumbnail copied in the storage)."""
+    result = await service_websocket.fork_schema(schema_id, current_user_id, fork_data.title if fork_data else None)
+    
+    if not result.success:
+        if result.data == "Schema não encontrado":
+            http_exception(result, 404)
+        if isinstance(result.data, str) and result.data.startswith("Acesso negado"):
+            http_exception(result, 403)
+        http_exception(result, 500)
+    
+    return Response(data=result.data, status_code=201, success=True)
+
+
 @router.patch("", response_model=Response)
 async def vinculate_schema(schema_data: VinculateSchema, current_user_id: str = Depends(get_current_user_id)):
     """Vinculate a user to a schema by email."""
@@ -95,6 +242,8 @@ async def update_schema(
     schema_id: str = Form(...),
     cells: str = Form(...),  # JSON string of cells data
     display_picture: Optional[UploadFile] = File(None),
+    version: Optional[int] = Form(None),  # versão das células lida pelo cliente (compare-and-swap)
+    defer_image: bool = Form(False),  # envia a imagem em segundo plano (image_job_id na resposta)
     current_user_id: str = Depends(get_current_user_id)):
     try:
         logger.info(f"Starting schema update for schema_id: {schema_id}, user_id: {current_user_id}")
@@ -108,19 +257,23 @@ async def update_schema(
         logger.info(f"Successfully parsed {len(cells_data)} cells")
         
         # Create UpdateSchema object manually since we're using Form data
-        update_data = UpdateSchemaData(schema_id, cells_data)
+        update_data = UpdateSchemaData(schema_id, cells_data, expected_version=version)
         
         # Call service with display_picture parameter
         logger.info("Calling service update_schema method...")
-        result = await service_schema.update_schema(update_data, current_user_id, display_picture)
+        result = await service_schema.update_schema(update_data, current_user_id, display_picture, defer_image=defer_image)
         
         if not result.success:
             logger.error(f"Service returned error: {result.data}")
+            if isinstance(result.data, dict) and result.data.get("conflict"):
+                http_exception(result, 409)
             http_exception(result, 400)
         
         logger.info("Schema update completed successfully")
         return Response(data=result.data, success=True)
         
+    except HTTPException:
+        raise
     except json.JSONDecodeError as e:
         logger.error(f"JSON decode error: {str(e)}")
         raise HTTPException(status_code=400, detail="Formato JSON inválido para o campo 'cells'")
@@ -139,7 +292,8 @@ async def update_schema_title(schema_id: str, schema_title: UpdateSchemaTitle, c
 
 @router.delete("/{schema_id}", response_model=Response)
 async def delete_schema(schema_id: str, current_user_id: str = Depends(get_current_user_id)):
-    result = await service_schema.delete_schema(schema_id, current_user_id)
+    # pela sala em tempo real: fecha a sessão aberta antes de apagar o schema
+    result = await service_websocket.delete_schema(schema_id, current_user_id)
     
     if not result.success:
         http_exception(result, 404)
@@ -1,3 +1,4 @@
+import asyncio
 import socketio
 import logging
 
@@ -7,6 +8,9 @@ from app.services.module_schema.service_schema import ServiceSchema
 from app.services.module_websocket.service_websocket import ServiceWebsocket
 from app.services.module_websocket.service_lock import ServiceLock
 from app.services.module_websocket.service_cursor import ServiceCursor
+from app.services.module_websocket.service_viewport import Rect, ServiceViewport, is_valid_rect
+from app.services.module_websocket.service_room_queue import ServiceRoomQueue
+from app.services.module_jobs.service_jobs import ServiceJobs
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +18,7 @@ service_schema = ServiceSchema()
 service_websocket = ServiceWebsocket(service_schema=service_schema)
 service_lock = ServiceLock()
 service_cursor = ServiceCursor()
+service_viewport = ServiceViewport()
 user_sid_schemaId: dict[str, str] = {}
 user_sid_userId: dict[str, str] = {}
 
@@ -27,6 +32,88 @@ sio = socketio.AsyncServer(
     cors_allowed_origins=origins
 )
 
+async def __emit_to_interested(event_name: str, payload: dict, schema_id: str, sid: str, region: Rect | None):
+    """Envia atualizações de alta frequência apenas para as sessões cuja viewport intersecta a região."""
+    recipients = service_viewport.recipients(schema_id, region, skip_sid=sid) if region else None
+    
+    if recipients is None:
+        await sio.emit(event_name, payload, room=schema_id, skip_sid=sid)
+        return
+    
+    for recipient_sid in recipients:
+        await sio.emit(event_name, payload, to=recipient_sid)
+
+def __update_spatial_index(schema_id: str, data: BaseElement) -> Rect | None:
+    """Atualiza o índice de posições das tabelas e retorna a região afetada (None = mudança estrutural)."""
+    if isinstance(data, MoveTable):
+        return service_viewport.update_table(schema_id, data.id, data.position.x, data.position.y)
+    
+    if isinstance(data, UpdateTable):
+        return service_viewport.table_bounds(schema_id, data.id)
+    
+    if isinstance(data, CreateTable):
+        service_viewport.update_table(
+            schema_id, data.id, data.position.x, data.position.y, data.size.width, data.size.height
+        )
+    elif isinstance(data, DeleteTable):
+        service_viewport.remove_table(schema_id, data.id)
+    
+    return None
+
+async def __process_operation(schema_id: str, operation: tuple[str, str, str, BaseElement]):
+    """Consumidor da fila da sala: aplica a operação no estado em memória e faz o broadcast, em ordem."""
+    sid, user_id, event_name, data = operation
+    
+    result = await service_websocket.manipulate_received_data(data, schema_id, user_id)
+    
+    if not result.applied:
+        # a operação perdeu para uma versão mais nova: devolve a versão vencedora para quem enviou
+        logger.info(f"Discarding stale '{event_name}' for element {result.element_id} in schema '{schema_id}'")
+        await sio.emit("receive_rejected_element", result.model_dump(), to=sid)
+        return
+    
+    region = __update_spatial_index(schema_id, data)
+    
+    logger.info(f"Broadcasting event '{event_name}' to schema room '{schema_id}'")
+    
+    await __emit_to_interested(event_name, data.model_dump(), schema_id, sid, region)
+    
+    if result.deleted_links:
+        logger.info(f"Broadcasting {len(result.deleted_links)} cascaded link deletions to schema room '{schema_id}'")
+        await sio.emit(
+            "receive_deleted_elements",
+            {"ids": result.deleted_links},
+            room=schema_id
+        )
+
+room_queue = ServiceRoomQueue(handler=__process_operation)
+
+async def __resync_room(schema_id: str):
+    """A sala foi recarregada do banco: reindexa as posições e pede aos clientes que recarreguem o diagrama."""
+    service_viewport.index_cells(schema_id, service_websocket.pending_updates[schema_id].cells)
+    await sio.emit("schema_resync", {"schema_id": schema_id}, room=schema_id)
+
+service_websocket.on_resync = __resync_room
+
+async def __close_deleted_room(schema_id: str):
+    """O schema foi excluído: avisa a sala e desconecta as sessões abertas nele."""
+    await sio.emit("schema_deleted", {"schema_id": schema_id}, room=schema_id)
+    
+    for sid in [sid for sid, room in user_sid_schemaId.items() if room == schema_id]:
+        await sio.disconnect(sid)
+
+service_websocket.on_room_closed = __close_deleted_room
+
+async def __notify_save_failed(schema_id: str, error: str):
+    """O salvamento do schema desistiu depois de várias falhas: avisa a sala (as alterações seguem no journal do servidor)."""
+    await sio.emit(
+        "schema_save_failed",
+        {"schema_id": schema_id, "message": "Não foi possível salvar as alterações; uma nova tentativa será feita na próxima edição"},
+        room=schema_id
+    )
+
+service_websocket.on_save_failed = __notify_save_failed
+
 async def __salvamento_agendado(sid, event_name: str, data: BaseElement):
     schema_id = user_sid_schemaId.get(sid)
     user_id = user_sid_userId.get(sid)
@@ -35,17 +122,37 @@ async def __salvamento_agendado(sid, event_name: str, data: BaseElement):
         logger.warning(f"Invalid context - schema_id: {schema_id}, user_id: {user_id}")
         return
     
-    await service_websocket.manipulate_received_data(data, schema_id, user_id)
-    
-    logger.info(f"Broadcasting event '{event_name}' to schema room '{schema_id}'")
+    try:
+        depth = room_queue.enqueue(schema_id, (sid, user_id, event_name, data))
+    except asyncio.QueueFull:
+        logger.warning(f"Room queue full for schema '{schema_id}', dropping '{event_name}' from {sid}")
+        await sio.emit("backpressure", {"depth": room_queue.depth(schema_id), "dropped": True}, to=sid)
+        return
     
-    await sio.emit(
-        event_name,
-        data.model_dump(),
-        room=schema_id,
-        skip_sid=sid
-    )
+    if depth >= room_queue.BACKPRESSURE_THRESHOLD:
+        await sio.emit("backpressure", {"depth": depth, "dropped": False}, to=sid)
+
 
+async def __send_cells_in_chunks(sid, schema_id: str, chunk_size):
+    """
+    Entrega as células em lotes (tabelas primeiro, links por último) para renderização progressiva.
+    O socket já está na sala, então operações recebidas durante a entrega também chegam ao cliente,
+    que deve aplicá-las após o evento 'cells_complete'.
+    """
+    chunk_size = service_schema.normalize_page_size(chunk_size)
+    total = 0
+    
+    for index, chunk in enumerate(service_websocket.iter_cell_chunks(schema_id, chunk_size)):
+        await sio.emit("cells_chunk", {"index": index, "cells": chunk}, to=sid)
+        total += len(chunk)
+    
+    await sio.emit("cells_complete", {"total": total}, to=sid)
+
+async def __notify_job_finished(user_id: str | None, job: dict):
+    if user_id:
+        await sio.emit("job_finished", job, room=f"user:{user_id}")
+
+ServiceJobs.on_finished = __notify_job_finished
 
 @sio.event
 async def connect(sid, environ, auth):
@@ -54,12 +161,25 @@ async def connect(sid, environ, auth):
 
     user_id: str = get_current_user_WS(token)["id"]
     
+    if not await service_websocket.initialie_cells(schema_id, user_id):
+        logger.warning(f"User {user_id} has no access to schema {schema_id} (sid: {sid}). Connection refused")
+        return False
+    
     user_sid_schemaId[sid] = schema_id
     user_sid_userId[sid] = user_id
 
     await sio.enter_room(sid, schema_id)
+    # sala do usuário: avisos que não dependem do schema aberto (ex.: job_finished)
+    await sio.enter_room(sid, f"user:{user_id}")
     
-    await service_websocket.initialie_cells(schema_id, user_id)
+    service_viewport.register_session(schema_id, sid)
+    service_viewport.index_cells(schema_id, service_websocket.pending_updates[schema_id].cells)
+    
+    await sio.emit("clock_sync", {"clock": service_websocket.get_clock(schema_id)}, to=sid)
+    
+    if auth.get("chunked"):
+        # em segundo plano para que o connect seja confirmado antes do primeiro lote
+        sio.start_background_task(__send_cells_in_chunks, sid, schema_id, auth.get("chunk_size"))
 
     logger.info(f"User {user_id} connected to schema {schema_id} (sid: {sid}). Socket joined room '{schema_id}'")
 
@@ -83,6 +203,7 @@ async def disconnect(sid):
                 )
         
         service_cursor.remove_user_all_cursors(user_id, schema_id)
+        service_viewport.remove_session(schema_id, sid)
         
         await sio.emit(
             "cursor_leave",
@@ -95,6 +216,12 @@ async def disconnect(sid):
     user_sid_schemaId.pop(sid, None)
     user_sid_userId.pop(sid, None)
     logger.info(f"User {user_id} disconnected from schema {schema_id} (sid: {sid})")
+    
+    if schema_id and schema_id not in user_sid_schemaId.values():
+        await room_queue.close(schema_id)
+        # alguém pode ter entrado na sala enquanto a fila era drenada
+        if schema_id not in user_sid_schemaId.values():
+            service_websocket.leave_room(schema_id)
 
 
 @sio.event
@@ -242,12 +369,27 @@ async def cursor_move(sid, data: dict):
     
     cursor_data = service_cursor.update_cursor(user_id, user_name, x, y, color, schema_id)
     
-    await sio.emit(
-        "cursor_update",
-        cursor_data,
-        room=schema_id,
-        skip_sid=sid
-    )
+    await __emit_to_interested("cursor_update", cursor_data, schema_id, sid, (x, y, 0, 0))
+
+@sio.event
+async def viewport_update(sid, data: dict):
+    schema_id = user_sid_schemaId.get(sid)
+    rect = tuple(data.get(field) for field in ("x", "y", "width", "height")) if isinstance(data, dict) else ()
+    
+    if not schema_id or not is_valid_rect(rect):
+        logger.warning(f"Invalid viewport update request from sid {sid}: {data!r}")
+        await sio.emit("viewport_rejected", {"message": "x, y, width e height devem ser números finitos"}, to=sid)
+        return
+    
+    logger.debug(f"Viewport update for sid {sid} in schema {schema_id}: {rect}")
+    
+    entered = service_viewport.update_viewport(schema_id, sid, *rect)
+    updates = service_websocket.pending_updates.get(schema_id)
+    if entered and updates is not None:
+        # as atualizações dessas tabelas podem ter sido filtradas enquanto estavam fora da viewport
+        entered_ids = set(entered)
+        elements = [item for item in updates.cells if item.get("id") in entered_ids]
+        await sio.emit("receive_viewport_elements", {"elements": elements}, to=sid)
 
 @sio.event
 async def cursor_leave(sid, data: dict):
@@ -1,4 +1,7 @@
-from fastapi import Depends, HTTPException, status
+import os
+import hmac
+from typing import Optional
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.core.jwt import decode_access_token
 
@@ -25,4 +28,13 @@ def get_token_decoded(token: str):
     return result.data
 
 def get_current_user_id(current_user: dict = Depends(get_current_user)) -> str:
-    return current_user["id"]
\ No newline at end of file
+    return current_user["id"]
+
+def require_metrics_token(x_metrics_token: Optional[str] = Header(None)) -> None:
+    """Endpoints internos (ex.: /metrics): exigem o token de METRICS_TOKEN no header X-Metrics-Token."""
+    expected = os.getenv("METRICS_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Endpoint desabilitado: METRICS_TOKEN não configurado")
+    
+    if not x_metrics_token or not hmac.compare_digest(x_metrics_token.encode(), expected.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso negado")
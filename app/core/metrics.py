@@ -0,0 +1,12 @@
+from typing import Callable
+
+# Provedores de métricas em processo: nome -> função que devolve um dict serializável
+_providers: dict[str, Callable[[], dict]] = {}
+
+
+def register_metrics(name: str, provider: Callable[[], dict]) -> None:
+    _providers[name] = provider
+
+
+def collect_metrics() -> dict:
+    return {name: provider() for name, provider in _providers.items()}
@@ -0,0 +1,93 @@
+import os
+import json
+import inspect
+import functools
+from typing import Any, Callable, Optional
+
+from fastapi.routing import APIRoute
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from starlette.middleware.gzip import GZipMiddleware
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # optional dependency
+    BrotliMiddleware = None
+
+# Respostas menores que isso não são comprimidas (o ganho não paga a CPU nem os headers)
+COMPRESSION_MINIMUM_SIZE = int(os.getenv('COMPRESSION_MINIMUM_SIZE', '1024'))
+GZIP_COMPRESS_LEVEL = int(os.getenv('GZIP_COMPRESS_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '4'))
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    """Serializa para JSON (orjson quando instalado); tipos desconhecidos (ObjectId, UUID...) viram string."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse serializada uma única vez pelo encoder rápido.
+
+    Aceita diretamente o modelo Response: os campos são lidos sem revalidar nem copiar o data.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            content = dict(content)
+        return dumps(content)
+
+
+def _wrap_endpoint(endpoint: Callable, status_code: Optional[int]) -> Callable:
+    if not inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        result = await endpoint(*args, **kwargs)
+        if isinstance(result, BaseModel):
+            # devolver uma Response pronta faz o FastAPI pular a validação do response_model e o jsonable_encoder
+            return FastJSONResponse(result, status_code=status_code or 200)
+        return result
+
+    return wrapper
+
+
+class FastResponseRoute(APIRoute):
+    """
+    Rota cujos modelos retornados são serializados direto pelo FastJSONResponse.
+
+    O response_model continua valendo para a documentação OpenAPI. Endpoints que precisam de
+    headers próprios devem retornar o FastJSONResponse já montado.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _wrap_endpoint(endpoint, kwargs.get("status_code")), **kwargs)
+
+
+def add_compression(app) -> None:
+    """Comprime respostas a partir de COMPRESSION_MINIMUM_SIZE: brotli quando disponível e aceito, senão gzip."""
+    if BrotliMiddleware is not None:
+        app.add_middleware(
+            BrotliMiddleware,
+            quality=BROTLI_QUALITY,
+            minimum_size=COMPRESSION_MINIMUM_SIZE,
+            gzip_fallback=True,
+        )
+    else:
+        app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE, compresslevel=GZIP_COMPRESS_LEVEL)
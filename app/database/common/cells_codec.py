@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import zlib
+import asyncio
+import logging
+from typing import Any
+
+from bson import Binary
+
+from app.core.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+# Storage encoding of the cells documents: raw (nested BSON), zlib or zstd
+CELLS_STORAGE_ENCODING = (os.getenv('CELLS_STORAGE_ENCODING') or 'raw').strip().lower()
+COMPRESSION_LEVEL = int(os.getenv('CELLS_COMPRESSION_LEVEL', '6'))
+# The *_async helpers compress/decompress in a worker thread from these sizes on, so large
+# diagrams don't stall the event loop (and the websocket rooms); small ones stay inline
+OFFLOAD_MIN_CELLS = int(os.getenv('CELLS_CODEC_OFFLOAD_MIN_CELLS', '200'))
+OFFLOAD_MIN_BYTES = int(os.getenv('CELLS_CODEC_OFFLOAD_MIN_BYTES', str(32 * 1024)))
+
+# Fields written by the compressed encodings (removed when a document goes back to raw)
+ENCODED_FIELDS = ("encoding", "dictionary", "cells_blob")
+
+# Preset dictionaries built from typical ColaBD/JointJS cells. The id is stored in each
+# document, so a new dictionary must be added under a new id, never replace an existing one.
+_DICTIONARY_SAMPLE = [
+    {
+        "type": "standard.Rectangle",
+        "position": {"x": 100, "y": 100},
+        "size": {"width": 180, "height": 120},
+        "angle": 0,
+        "id": "00000000-0000-0000-0000-000000000000",
+        "z": 1,
+        "attrs": {
+            "body": {"fill": "#ffffff", "stroke": "#000000", "strokeWidth": 1, "rx": 4, "ry": 4},
+            "label": {"text": "tabela", "fontSize": 14, "fontWeight": "bold", "fill": "#333333",
+                      "refX": "50%", "refY": 12, "textAnchor": "middle", "textVerticalAnchor": "top"},
+            "rows": {"0": {"name": {"text": "id", "fontSize": 12, "fill": "#333333"},
+                           "type": {"text": "INTEGER", "fontSize": 12, "fill": "#666666"},
+                           "meta": {"pk": True, "fk": False}},
+                     "1": {"name": {"text": "nome", "fontSize": 12, "fill": "#333333"},
+                           "type": {"text": "VARCHAR(255)", "fontSize": 12, "fill": "#666666"},
+                           "meta": {"pk": False, "fk": False}}},
+        },
+    },
+    {
+        "type": "standard.Link",
+        "source": {"id": "00000000-0000-0000-0000-000000000000"},
+        "target": {"id": "00000000-0000-0000-0000-000000000000"},
+        "id": "00000000-0000-0000-0000-000000000000",
+        "z": 2,
+        "labels": [{"attrs": {"text": {"text": "1:N", "fontSize": 12, "fontWeight": "normal", "fill": "#333333"},
+                              "rect": {"fill": "#ffffff", "stroke": "#000000", "strokeWidth": 1, "rx": 3, "ry": 3}},
+                    "position": 0.5}],
+        "attrs": {"line": {"stroke": "#333333", "strokeWidth": 2,
+                           "sourceMarker": {"type": "path", "d": "M 0 0"},
+                           "targetMarker": {"type": "path", "d": "M 10 -5 0 0 10 5 z"}},
+                  "connection": {"stroke": "#333333"}, "marker_source": None, "marker_target": None},
+    },
+]
+_DICTIONARIES = {
+    "colabd-v1": json.dumps(_DICTIONARY_SAMPLE, separators=(",", ":")).encode("utf-8"),
+}
+CURRENT_DICTIONARY = "colabd-v1"
+
+_stats = {
+    "encoded": 0,
+    "decoded": 0,
+    "raw_bytes": 0,
+    "stored_bytes": 0,
+    "encode_seconds": 0.0,
+    "decode_seconds": 0.0,
+}
+
+
+def _serialize(cells: list[dict[str, Any]]) -> bytes:
+    return json.dumps(cells, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _resolve_encoding() -> str:
+    if CELLS_STORAGE_ENCODING == "zstd" and zstandard is None:
+        logger.warning("CELLS_STORAGE_ENCODING=zstd but the zstandard package is not installed, using zlib")
+        return "zlib"
+    if CELLS_STORAGE_ENCODING not in ("raw", "zlib", "zstd"):
+        logger.warning(f"Unknown CELLS_STORAGE_ENCODING '{CELLS_STORAGE_ENCODING}', using raw")
+        return "raw"
+    return CELLS_STORAGE_ENCODING
+
+
+def encode_cells(cells: list[dict[str, Any]]) -> dict[str, Any]:
+    """Returns the document fields that store the cells with the configured encoding."""
+    encoding = _resolve_encoding()
+    if encoding == "raw":
+        return {"cells": cells}
+
+    start = time.perf_counter()
+    payload = _serialize(cells)
+    dictionary = _DICTIONARIES[CURRENT_DICTIONARY]
+
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(
+            level=COMPRESSION_LEVEL,
+            dict_data=zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+        )
+        blob = compressor.compress(payload)
+    else:
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=dictionary)
+        blob = compressor.compress(payload) + compressor.flush()
+
+    _stats["encoded"] += 1
+    _stats["raw_bytes"] += len(payload)
+    _stats["stored_bytes"] += len(blob)
+    _stats["encode_seconds"] += time.perf_counter() - start
+
+    return {
+        "encoding": encoding,
+        "dictionary": CURRENT_DICTIONARY,
+        "cells_blob": Binary(blob),
+        "cells_count": len(cells),
+    }
+
+
+def is_encoded(document: dict[str, Any]) -> bool:
+    return document.get("encoding") in ("zlib", "zstd")
+
+
+def decode_cells(document: dict[str, Any]) -> list[dict[str, Any]]:
+    """Returns the cells of a stored document, whatever its encoding."""
+    if not is_encoded(document):
+        return document.get("cells") or []
+
+    start = time.perf_counter()
+    dictionary = _DICTIONARIES[document.get("dictionary") or CURRENT_DICTIONARY]
+    blob = bytes(document["cells_blob"])
+
+    if document["encoding"] == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Documento comprimido com zstd, mas o pacote zstandard não está instalado")
+        decompressor = zstandard.ZstdDecompressor(
+            dict_data=zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+        )
+        payload = decompressor.decompressobj().decompress(blob)
+    else:
+        decompressor = zlib.decompressobj(zdict=dictionary)
+        payload = decompressor.decompress(blob) + decompressor.flush()
+
+    cells = json.loads(payload)
+
+    _stats["decoded"] += 1
+    _stats["decode_seconds"] += time.perf_counter() - start
+    return cells
+
+
+def decode_document(document: dict[str, Any]) -> dict[str, Any]:
+    """Replaces the encoded fields of a document by the plain 'cells' list."""
+    if is_encoded(document):
+        document["cells"] = decode_cells(document)
+        for field in ENCODED_FIELDS:
+            document.pop(field, None)
+    return document
+
+
+async def encode_cells_async(cells: list[dict[str, Any]]) -> dict[str, Any]:
+    """encode_cells, in a worker thread for large cell lists."""
+    if _resolve_encoding() != "raw" and len(cells) >= OFFLOAD_MIN_CELLS:
+        return await asyncio.to_thread(encode_cells, cells)
+    return encode_cells(cells)
+
+
+async def decode_cells_async(document: dict[str, Any]) -> list[dict[str, Any]]:
+    """decode_cells, in a worker thread for large compressed blobs."""
+    if is_encoded(document) and len(document.get("cells_blob") or b"") >= OFFLOAD_MIN_BYTES:
+        return await asyncio.to_thread(decode_cells, document)
+    return decode_cells(document)
+
+
+async def decode_document_async(document: dict[str, Any]) -> dict[str, Any]:
+    """decode_document, in a worker thread for large compressed blobs."""
+    if is_encoded(document) and len(document.get("cells_blob") or b"") >= OFFLOAD_MIN_BYTES:
+        return await asyncio.to_thread(decode_document, document)
+    return decode_document(document)
+
+
+def codec_stats() -> dict:
+    return {
+        "encoding": _resolve_encoding(),
+        "encoded": _stats["encoded"],
+        "decoded": _stats["decoded"],
+        "raw_bytes": _stats["raw_bytes"],
+        "stored_bytes": _stats["stored_bytes"],
+        "compression_ratio": round(_stats["raw_bytes"] / _stats["stored_bytes"], 2) if _stats["stored_bytes"] else None,
+        "avg_encode_ms": round(_stats["encode_seconds"] * 1000 / _stats["encoded"], 3) if _stats["encoded"] else None,
+        "avg_decode_ms": round(_stats["decode_seconds"] * 1000 / _stats["decoded"], 3) if _stats["decoded"] else None,
+    }
+
+
+register_metrics("cells_codec", codec_stats)
@@ -1,19 +1,29 @@
 import os
+import hashlib
 import logging
-from typing import Optional
-from pymongo import MongoClient
-from pymongo.database import Database
-from pymongo.collection import Collection
-from supabase import create_client, Client
+import httpx
+from typing import Dict, Optional
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.asynchronous.collection import AsyncCollection
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
+from storage3 import AsyncStorageClient
+from app.core.metrics import register_metrics
 
 logger = logging.getLogger(__name__)
 
 
 class DatabaseManager:
     _instance = None
-    _mongo_client: Optional[MongoClient] = None
-    _mongo_database: Optional[Database] = None
-    _supabase_client: Optional[Client] = None
+    _mongo_client: Optional[AsyncMongoClient] = None
+    _mongo_database: Optional[AsyncDatabase] = None
+    _supabase_client: Optional[AsyncClient] = None
+    _supabase_http_client: Optional[httpx.AsyncClient] = None
+    # Clientes de storage por credencial; cada um tem seu pool HTTP, pois o storage3 fixa a base_url no cliente
+    _storage_clients: Dict[str, AsyncStorageClient] = {}
+    _storage_http_clients: Dict[str, httpx.AsyncClient] = {}
+    # Contadores de requisições e conexões novas por pool HTTP (reuso de keep-alive)
+    _http_stats: Dict[str, Dict[str, int]] = {}
 
     def __new__(cls):
         if cls._instance is None:
@@ -30,8 +40,9 @@ class DatabaseManager:
             connection_string = os.getenv('MONGODB_CONNECTION_STRING', 'mongodb://localhost:27017')
             database_name = os.getenv('MONGODB_DATABASE_NAME', 'colabd')
             
-            self._mongo_client = MongoClient(connection_string)
+            self._mongo_client = AsyncMongoClient(connection_string)
             self._mongo_database = self._mongo_client[database_name]
+            await self._ensure_mongo_indexes()
 
             logger.info(f"MongoDB connected successfully to database: {database_name}")
             
@@ -39,6 +50,14 @@ class DatabaseManager:
             logger.error(f"Failed to connect to MongoDB: {str(e)}")
             raise e
 
+    async def _ensure_mongo_indexes(self):
+        # histórico de versões: listagem e materialização por (schema_id, version)
+        await self._mongo_database["schema_versions"].create_index(
+            [("schema_id", ASCENDING), ("version", DESCENDING)], unique=True
+        )
+        # documentos de células por schema (exclusão em cascata)
+        await self._mongo_database["models"].create_index([("schema_id", ASCENDING)])
+
     async def _initialize_supabase(self):
         try:
             connection_url = (os.getenv('CONNECTION_POSTGRES_SUPABASE') or '').strip()
@@ -47,28 +66,94 @@ class DatabaseManager:
             if not connection_url or not secret_key:
                 raise ValueError("Supabase connection URL and secret key must be set in environment variables")
             
-            self._supabase_client = create_client(connection_url, secret_key)
+            # Pool HTTP compartilhado (keep-alive) por todas as consultas PostgREST do worker
+            self._supabase_http_client = self._build_http_client("postgrest")
+            
+            self._supabase_client = await acreate_client(
+                connection_url,
+                secret_key,
+                options=AsyncClientOptions(httpx_client=self._supabase_http_client)
+            )
             logger.info("Supabase client initialized successfully")
             
+            bucket_key = (os.getenv('SECRET_SUPABASE_BUCKET') or '').strip()
+            if bucket_key:
+                self.get_storage_client(bucket_key)
+                logger.info("Supabase storage client initialized successfully")
+            
         except Exception as e:
             logger.error(f"Failed to initialize Supabase client: {str(e)}")
             raise e
 
-    def get_mongo_client(self) -> MongoClient:
+    def _build_http_client(self, name: str) -> httpx.AsyncClient:
+        max_connections = int(os.getenv('SUPABASE_MAX_CONNECTIONS', '20'))
+        stats = self._http_stats.setdefault(name, {"requests": 0, "new_connections": 0})
+        
+        async def trace(event_name: str, info: dict):
+            if event_name in ("http11.send_request_headers.started", "http2.send_request_headers.started"):
+                stats["requests"] += 1
+            elif event_name == "connection.connect_tcp.complete":
+                stats["new_connections"] += 1
+        
+        async def attach_trace(request: httpx.Request):
+            request.extensions["trace"] = trace
+        
+        return httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(float(os.getenv('SUPABASE_TIMEOUT_SECONDS', '10'))),
+            follow_redirects=True,
+            http2=True,
+            event_hooks={"request": [attach_trace]}
+        )
+
+    def get_storage_client(self, key: Optional[str] = None) -> AsyncStorageClient:
+        """Cliente de storage reutilizável para a credencial (padrão: SECRET_SUPABASE_BUCKET)."""
+        key = (key or os.getenv('SECRET_SUPABASE_BUCKET') or '').strip()
+        if not key:
+            raise RuntimeError("SECRET_SUPABASE_BUCKET environment variable not found")
+        
+        # a credencial não vai para as métricas nem para os logs, só um prefixo do hash
+        credential_id = hashlib.sha256(key.encode()).hexdigest()[:12]
+        if credential_id not in self._storage_clients:
+            connection_url = (os.getenv('CONNECTION_POSTGRES_SUPABASE') or '').strip().rstrip('/')
+            if not connection_url:
+                raise RuntimeError("CONNECTION_POSTGRES_SUPABASE environment variable not found")
+            
+            http_client = self._build_http_client(f"storage:{credential_id}")
+            self._storage_http_clients[credential_id] = http_client
+            self._storage_clients[credential_id] = AsyncStorageClient(
+                f"{connection_url}/storage/v1/",
+                {"apiKey": key, "Authorization": f"Bearer {key}"},
+                http_client=http_client
+            )
+        
+        return self._storage_clients[credential_id]
+
+    def http_pool_stats(self) -> dict:
+        return {
+            name: {
+                **stats,
+                "reused": max(stats["requests"] - stats["new_connections"], 0),
+                "reuse_ratio": round(1 - stats["new_connections"] / stats["requests"], 4) if stats["requests"] else None
+            }
+            for name, stats in self._http_stats.items()
+        }
+
+    def get_mongo_client(self) -> AsyncMongoClient:
         if self._mongo_client is None:
             raise RuntimeError("MongoDB client not initialized. Call initialize() first.")
         return self._mongo_client
 
-    def get_mongo_database(self) -> Database:
+    def get_mongo_database(self) -> AsyncDatabase:
         if self._mongo_database is None:
             raise RuntimeError("MongoDB database not initialized. Call initialize() first.")
         return self._mongo_database
 
-    def get_mongo_collection(self, collection_name: str) -> Collection:
+    def get_mongo_collection(self, collection_name: str) -> AsyncCollection:
         database = self.get_mongo_database()
         return database[collection_name]
 
-    def get_supabase_client(self) -> Client:
+    def get_supabase_client(self) -> AsyncClient:
         if self._supabase_client is None:
             raise RuntimeError("Supabase client not initialized. Call initialize() first.")
         return self._supabase_client
@@ -79,15 +164,24 @@ class DatabaseManager:
 
     async def close_connections(self):
         if self._mongo_client:
-            self._mongo_client.close()
+            await self._mongo_client.close()
             self._mongo_client = None
             self._mongo_database = None
             logger.info("MongoDB connection closed")
         
-        # Supabase client doesn't need explicit closing
+        if self._supabase_http_client:
+            await self._supabase_http_client.aclose()
+            self._supabase_http_client = None
+        
+        for http_client in self._storage_http_clients.values():
+            await http_client.aclose()
+        self._storage_http_clients.clear()
+        self._storage_clients.clear()
+        
         self._supabase_client = None
         logger.info("Database connections closed successfully")
 
 
 # Global database manager instance
-db_manager = DatabaseManager()
\ No newline at end of file
+db_manager = DatabaseManager()
+register_metrics("supabase_http", db_manager.http_pool_stats)
\ No newline at end of file
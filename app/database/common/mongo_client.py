@@ -1,16 +1,16 @@
-from pymongo import MongoClient
-from pymongo.database import Database
-from pymongo.collection import Collection
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.asynchronous.collection import AsyncCollection
 from app.database.common.database_manager import db_manager
 
 
-def get_mongo_client() -> MongoClient:
+def get_mongo_client() -> AsyncMongoClient:
     return db_manager.get_mongo_client()
 
 
-def get_database() -> Database:
+def get_database() -> AsyncDatabase:
     return db_manager.get_mongo_database()
 
 
-def get_collection(collection_name: str) -> Collection:
+def get_collection(collection_name: str) -> AsyncCollection:
     return db_manager.get_mongo_collection(collection_name)
\ No newline at end of file
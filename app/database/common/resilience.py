@@ -0,0 +1,198 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, TypeVar
+
+import httpx
+from postgrest.exceptions import APIError
+from storage3.exceptions import StorageApiError
+from pymongo.errors import AutoReconnect, ConnectionFailure, ExecutionTimeout, OperationFailure, ServerSelectionTimeoutError
+
+from app.core.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MAX_ATTEMPTS = int(os.getenv('RESILIENCE_MAX_ATTEMPTS', '3'))
+BASE_DELAY_SECONDS = float(os.getenv('RESILIENCE_BASE_DELAY_SECONDS', '0.1'))
+MAX_DELAY_SECONDS = float(os.getenv('RESILIENCE_MAX_DELAY_SECONDS', '2'))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+BREAKER_RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', '30'))
+
+# Status HTTP e códigos do Postgres/PostgREST que indicam falha transitória
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RETRYABLE_PG_CODE_PREFIXES = ("08", "53", "57P", "40001", "40P01", "PGRST00")
+
+
+class CircuitOpenError(Exception):
+    """Chamada recusada sem tentar o backend, pois o circuito está aberto."""
+
+
+def _is_unsent(exc: BaseException) -> bool:
+    """Erros em que a requisição certamente não chegou ao backend (seguro repetir até escritas)."""
+    return isinstance(exc, (ServerSelectionTimeoutError, httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Falhas de rede/disponibilidade do backend; erros de validação, permissão ou dados não entram aqui."""
+    if _is_unsent(exc):
+        return True
+
+    if isinstance(exc, (AutoReconnect, ConnectionFailure, ExecutionTimeout)):
+        return True
+
+    if isinstance(exc, OperationFailure):
+        return exc.has_error_label("RetryableWriteError") or exc.has_error_label("TransientTransactionError")
+
+    if isinstance(exc, httpx.TransportError):
+        return True
+
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS
+
+    if isinstance(exc, StorageApiError):
+        return str(exc.status).isdigit() and int(exc.status) in RETRYABLE_STATUS
+
+    if isinstance(exc, APIError):
+        code = exc.code
+        if isinstance(code, int) or (isinstance(code, str) and code.isdigit() and len(code) == 3):
+            return int(code) in RETRYABLE_STATUS
+        return isinstance(code, str) and code.startswith(RETRYABLE_PG_CODE_PREFIXES)
+
+    return False
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por backend.
+
+    Após BREAKER_FAILURE_THRESHOLD falhas transitórias seguidas o circuito abre e as chamadas
+    falham na hora; depois de BREAKER_RESET_SECONDS uma única chamada de teste (half-open)
+    decide se ele fecha de novo ou volta a abrir.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def before_call(self) -> None:
+        if self.state == "closed":
+            return
+
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = "half_open"
+            self._probe_in_flight = False
+
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return
+
+        self.rejected += 1
+        raise CircuitOpenError(f"Serviço '{self.name}' indisponível no momento, tente novamente em instantes")
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info(f"Circuit '{self.name}' closed")
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.warning(f"Circuit '{self.name}' opened after {self.consecutive_failures} consecutive failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def cancel_probe(self) -> None:
+        """A chamada de teste foi cancelada antes de terminar: libera a vaga para a próxima."""
+        self._probe_in_flight = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failures": self.failures,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(backend: str) -> CircuitBreaker:
+    if backend not in _breakers:
+        _breakers[backend] = CircuitBreaker(backend)
+    return _breakers[backend]
+
+
+def backoff_delay(attempt: int) -> float:
+    """Backoff exponencial com full jitter para a tentativa (1 = primeira repetição)."""
+    return random.uniform(0, min(MAX_DELAY_SECONDS, BASE_DELAY_SECONDS * 2 ** (attempt - 1)))
+
+
+async def resilient_call(backend: str, operation: Callable[[], Awaitable[T]], idempotent: bool = True) -> T:
+    """
+    Executa a chamada ao backend com retry e circuit breaker.
+
+    Só falhas transitórias são repetidas e contam para o circuito. Escritas não idempotentes
+    (idempotent=False) só são repetidas quando a requisição certamente não foi enviada.
+    As demais exceções são propagadas para o tratamento normal do repositório.
+    """
+    breaker = get_breaker(backend)
+    attempt = 0
+
+    while True:
+        breaker.before_call()
+        attempt += 1
+
+        try:
+            result = await operation()
+        except asyncio.CancelledError:
+            breaker.cancel_probe()
+            raise
+        except Exception as e:
+            if not is_transient(e):
+                # o backend respondeu (erro de dados/validação): conta como saudável
+                breaker.record_success()
+                raise
+
+            breaker.record_failure()
+            can_retry = idempotent or _is_unsent(e)
+            if not can_retry or attempt >= MAX_ATTEMPTS or breaker.state == "open":
+                raise
+
+            breaker.retries += 1
+            delay = backoff_delay(attempt)
+            logger.warning(f"Transient {backend} error ({type(e).__name__}: {e}), retry {attempt}/{MAX_ATTEMPTS - 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        breaker.record_success()
+        return result
+
+
+def resilience_stats() -> dict:
+    return {name: breaker.stats() for name, breaker in _breakers.items()}
+
+
+register_metrics("resilience", resilience_stats)
@@ -0,0 +1,56 @@
+import os
+import sqlite3
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteDatabase:
+    """
+    Arquivo SQLite local acessado por uma única thread dedicada.
+
+    A conexão é aberta na primeira chamada (WAL, autocommit) e as instruções de schema
+    rodam nessa hora. Como todas as chamadas passam pela mesma thread, as escritas ficam
+    em ordem e o event loop não bloqueia no disco.
+    """
+
+    def __init__(self, path: str, schema: Sequence[str], name: str, synchronous: str = "NORMAL"):
+        self.path = path
+        self.schema = schema
+        self.name = name
+        self.synchronous = synchronous
+        self._connection: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+    def connection(self) -> sqlite3.Connection:
+        """Conexão aberta; só deve ser usada dentro de funções executadas por run()."""
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(f"PRAGMA synchronous={self.synchronous}")
+            for statement in self.schema:
+                connection.execute(statement)
+            self._connection = connection
+            logger.info(f"SQLite {self.name} opened at {self.path}")
+
+        return self._connection
+
+    async def run(self, function: Callable[..., Any], *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, function, *args)
+
+    def _close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def close(self) -> None:
+        await self.run(self._close)
+        logger.info(f"SQLite {self.name} closed")
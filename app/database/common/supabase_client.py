@@ -1,10 +1,15 @@
-from supabase import Client
+from supabase import AsyncClient
+from storage3 import AsyncStorageClient
 from app.database.common.database_manager import db_manager
 
 
-def get_supabase_client() -> Client:
+def get_supabase_client() -> AsyncClient:
     return db_manager.get_supabase_client()
 
 
 def get_supabase_table(table_name: str):
-    return db_manager.get_supabase_table(table_name)
\ No newline at end of file
+    return db_manager.get_supabase_table(table_name)
+
+
+def get_storage_client() -> AsyncStorageClient:
+    return db_manager.get_storage_client()
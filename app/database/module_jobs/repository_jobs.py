@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import logging
+from typing import Any, Optional
+from app.database.common.sqlite_database import SQLiteDatabase
+from app.models.dto.compartilhado.response import Response
+
+logger = logging.getLogger(__name__)
+
+JOBS_PATH = os.getenv('JOBS_DB_PATH', 'data/jobs.sqlite3')
+
+JOB_COLUMNS = ("id", "kind", "user_id", "payload", "status", "attempts", "max_attempts",
+               "result", "error", "run_after", "created_at", "updated_at", "owner", "lease_until")
+
+
+class RepositoryJobs:
+    """
+    Fila persistente (SQLite) dos jobs em segundo plano.
+
+    Status: queued -> running -> succeeded | failed (ou de volta a queued para nova tentativa).
+    Um job running pertence a quem o pegou (owner) até lease_until; o dono renova o lease
+    enquanto o job roda, e um lease vencido (processo caiu) deixa o job livre para outro worker,
+    inclusive de outro processo usando o mesmo arquivo. Como no journal, todas as chamadas ao SQLite rodam numa única thread dedicada (SQLiteDatabase).
+    """
+
+    _database = SQLiteDatabase(
+        JOBS_PATH,
+        (
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, "
+            "kind TEXT NOT NULL, "
+            "user_id TEXT, "
+            "payload TEXT NOT NULL, "
+            "status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "max_attempts INTEGER NOT NULL, "
+            "result TEXT, "
+            "error TEXT, "
+            "run_after REAL NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "updated_at REAL NOT NULL, "
+            "owner TEXT, "
+            "lease_until REAL)",
+            "CREATE INDEX IF NOT EXISTS jobs_status_run_after ON jobs (status, run_after)",
+        ),
+        name="jobs",
+    )
+
+    def __init__(self):
+        pass
+
+    def _get_connection(self):
+        return self._database.connection()
+
+    async def _run(self, function, *args):
+        return await self._database.run(function, *args)
+
+    @staticmethod
+    def _to_dict(row) -> dict[str, Any]:
+        job = dict(zip(JOB_COLUMNS, row))
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def _enqueue(self, job_id: str, kind: str, user_id: Optional[str], payload: dict[str, Any], max_attempts: int) -> None:
+        now = time.time()
+        self._get_connection().execute(
+            "INSERT INTO jobs (id, kind, user_id, payload, status, attempts, max_attempts, run_after, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, 'queued', 0, ?, ?, ?, ?)",
+            (job_id, kind, user_id, json.dumps(payload, default=str), max_attempts, now, now, now)
+        )
+
+    async def enqueue(self, job_id: str, kind: str, user_id: Optional[str], payload: dict[str, Any], max_attempts: int) -> Response:
+        try:
+            await self._run(self._enqueue, job_id, kind, user_id, payload, max_attempts)
+            return Response(data=job_id, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while enqueuing job: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    def _claim_next(self, owner: str, lease_seconds: float) -> Optional[dict[str, Any]]:
+        now = time.time()
+        # um único UPDATE ... RETURNING: o SQLite trava o arquivo para escrita durante a instrução,
+        # então dois processos nunca pegam o mesmo job (a condição é repetida fora do SELECT)
+        ready = "((status = 'queued' AND run_after <= ?) OR (status = 'running' AND lease_until < ?))"
+        row = self._get_connection().execute(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, owner = ?, lease_until = ?, updated_at = ? "
+            f"WHERE id = (SELECT id FROM jobs WHERE {ready} ORDER BY run_after LIMIT 1) AND {ready} "
+            f"RETURNING {', '.join(JOB_COLUMNS)}",
+            (owner, now + lease_seconds, now, now, now, now, now)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    async def claim_next(self, owner: str, lease_seconds: float) -> Response:
+        """
+        Marca como running (dono owner, lease de lease_seconds) e devolve o próximo job pronto
+        para rodar, ou None. Jobs running com lease vencido também contam como prontos.
+        """
+        try:
+            job = await self._run(self._claim_next, owner, lease_seconds)
+            return Response(data=job, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while claiming job: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    def _extend_lease(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        now = time.time()
+        return self._get_connection().execute(
+            "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND status = 'running' AND owner = ?",
+            (now + lease_seconds, now, job_id, owner)
+        ).rowcount > 0
+
+    async def extend_lease(self, job_id: str, owner: str, lease_seconds: float) -> Response:
+        """Renova o lease do job; data é False quando owner não é mais o dono (lease vencido e job repassado)."""
+        try:
+            extended = await self._run(self._extend_lease, job_id, owner, lease_seconds)
+            return Response(data=extended, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while extending job lease: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    def _finish(self, job_id: str, owner: str, status: str, result: Any, error: Optional[str], run_after: Optional[float]) -> bool:
+        now = time.time()
+        return self._get_connection().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, run_after = COALESCE(?, run_after), "
+            "owner = NULL, lease_until = NULL, updated_at = ? WHERE id = ? AND status = 'running' AND owner = ?",
+            (status, json.dumps(result, default=str) if result is not None else None, error, run_after, now, job_id, owner)
+        ).rowcount > 0
+
+    # mark_succeeded/mark_failed só valem para o dono atual: data é False quando o lease
+    # venceu e o job já foi pego por outro worker, que decide o resultado
+
+    async def mark_succeeded(self, job_id: str, owner: str, result: Any) -> Response:
+        try:
+            finished = await self._run(self._finish, job_id, owner, "succeeded", result, None, None)
+            return Response(data=finished, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while finishing job: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def mark_failed(self, job_id: str, owner: str, error: str, retry_at: Optional[float] = None) -> Response:
+        """Falha definitiva, ou volta para a fila a partir de retry_at quando informado."""
+        try:
+            status = "queued" if retry_at is not None else "failed"
+            finished = await self._run(self._finish, job_id, owner, status, None, error, retry_at)
+            return Response(data=finished, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while failing job: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    def _get(self, job_id: str) -> Optional[dict[str, Any]]:
+        row = self._get_connection().execute(
+            f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    async def get_job(self, job_id: str) -> Response:
+        try:
+            job = await self._run(self._get, job_id)
+            return Response(data=job, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while getting job: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    def _count_pending(self) -> int:
+        return self._get_connection().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+        ).fetchone()[0]
+
+    async def count_pending(self) -> Response:
+        try:
+            pending = await self._run(self._count_pending)
+            return Response(data=pending, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while counting jobs: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    def _recover(self, finished_before: float) -> int:
+        connection = self._get_connection()
+        now = time.time()
+        # só jobs com lease vencido (dono caiu); os de outros processos vivos continuam com eles
+        recovered = connection.execute(
+            "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL, updated_at = ? "
+            "WHERE status = 'running' AND (lease_until IS NULL OR lease_until < ?)", (now, now)
+        ).rowcount
+        connection.execute(
+            "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?", (finished_before,)
+        )
+        return recovered
+
+    async def recover(self, finished_before: float) -> Response:
+        """Recoloca na fila os jobs com lease vencido e apaga os concluídos antes de finished_before."""
+        try:
+            recovered = await self._run(self._recover, finished_before)
+            return Response(data=recovered, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while recovering jobs: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def close(self) -> None:
+        await self._database.close()
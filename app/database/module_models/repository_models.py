@@ -2,6 +2,8 @@ from typing import Optional, Any
 from bson import ObjectId
 from pymongo.errors import PyMongoError
 from app.database.common.mongo_client import get_collection
+from app.database.common.cells_codec import decode_document_async
+from app.database.common.resilience import resilient_call
 from app.models.dto.compartilhado.response import Response
 import logging
 
@@ -15,13 +17,13 @@ class RepositoryModels:
 
     async def create(self, model_data: dict[str, Any]) -> Response:
         try:
-            result = self.collection.insert_one(model_data)
+            result = await resilient_call("mongo", lambda: self.collection.insert_one(model_data), idempotent=False)
             
             if not result.inserted_id:
                 raise Exception("Erro ao criar modelo")
             
             # Return the created document with its ID
-            created_model = self.collection.find_one({"_id": result.inserted_id})
+            created_model = await resilient_call("mongo", lambda: self.collection.find_one({"_id": result.inserted_id}))
             created_model["_id"] = str(created_model["_id"])  # Convert ObjectId to string
             
             return Response(data=created_model, success=True)
@@ -36,12 +38,13 @@ class RepositoryModels:
     async def find_by_id(self, model_id: str) -> Response:
         try:
             object_id = ObjectId(model_id)
-            model = self.collection.find_one({"_id": object_id})
+            model = await resilient_call("mongo", lambda: self.collection.find_one({"_id": object_id}))
             
             if not model:
                 raise Exception("Modelo não encontrado")
             
             model["_id"] = str(model["_id"])
+            await decode_document_async(model)
             
             return Response(data=model, success=True)
             
@@ -51,18 +54,22 @@ class RepositoryModels:
 
     async def find_all(self, limit: Optional[int] = None, skip: Optional[int] = None) -> Response:
         try:
-            cursor = self.collection.find()
-            
-            if skip:
-                cursor = cursor.skip(skip)
-            if limit:
-                cursor = cursor.limit(limit)
-            
-            models = list(cursor)
+            def find_models():
+                cursor = self.collection.find()
+                
+                if skip:
+                    cursor = cursor.skip(skip)
+                if limit:
+                    cursor = cursor.limit(limit)
+                
+                return cursor.to_list()
+            
+            models = await resilient_call("mongo", find_models)
             
             # Convert ObjectIds to strings
             for model in models:
                 model["_id"] = str(model["_id"])
+                await decode_document_async(model)
             
             return Response(data=models, success=True)
             
@@ -74,10 +81,10 @@ class RepositoryModels:
         try:
             object_id = ObjectId(model_id)
             
-            result = self.collection.update_one(
+            result = await resilient_call("mongo", lambda: self.collection.update_one(
                 {"_id": object_id},
                 {"$set": update_data}
-            )
+            ))
             
             if result.matched_count == 0:
                 raise Exception("Modelo não encontrado")
@@ -86,7 +93,7 @@ class RepositoryModels:
                 raise Exception("Nenhuma alteração foi feita")
             
             # Return the updated document
-            updated_model = self.collection.find_one({"_id": object_id})
+            updated_model = await resilient_call("mongo", lambda: self.collection.find_one({"_id": object_id}))
             updated_model["_id"] = str(updated_model["_id"])
             
             return Response(data=updated_model, success=True)
@@ -99,7 +106,7 @@ class RepositoryModels:
         try:
             object_id = ObjectId(model_id)
             
-            result = self.collection.delete_one({"_id": object_id})
+            result = await resilient_call("mongo", lambda: self.collection.delete_one({"_id": object_id}))
             
             if result.deleted_count == 0:
                 raise Exception("Modelo não encontrado")
@@ -112,16 +119,20 @@ class RepositoryModels:
 
     async def find_by_criteria(self, criteria: dict[str, Any], limit: Optional[int] = None) -> Response:
         try:
-            cursor = self.collection.find(criteria)
-            
-            if limit:
-                cursor = cursor.limit(limit)
+            def find_models():
+                cursor = self.collection.find(criteria)
+                
+                if limit:
+                    cursor = cursor.limit(limit)
+                
+                return cursor.to_list()
             
-            models = list(cursor)
+            models = await resilient_call("mongo", find_models)
             
             # Convert ObjectIds to strings
             for model in models:
                 model["_id"] = str(model["_id"])
+                await decode_document_async(model)
             
             return Response(data=models, success=True)
             
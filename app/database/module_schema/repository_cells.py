@@ -1,8 +1,11 @@
-from typing import Any
+from typing import Any, AsyncIterator, Optional
 from bson import ObjectId
+from pymongo import ReturnDocument
 from pymongo.errors import PyMongoError
-from pymongo.collection import Collection
+from pymongo.asynchronous.collection import AsyncCollection
 from app.database.common.mongo_client import get_collection
+from app.database.common.cells_codec import ENCODED_FIELDS, decode_cells_async, decode_document_async, encode_cells_async, is_encoded
+from app.database.common.resilience import resilient_call
 from app.models.dto.compartilhado.response import Response
 from app.models.entities.module_schema.cells_model import CellsModel
 import logging
@@ -14,9 +17,9 @@ logger = logging.getLogger(__name__)
 class RepositoryCells:
 
     def __init__(self):
-        self.collection: Collection = None
+        self.collection: AsyncCollection = None
 
-    def _get_collection(self) -> Collection:
+    def _get_collection(self) -> AsyncCollection:
         if self.collection is None:
             self.collection = get_collection('models')  # Changed from 'cells' to 'models'
         return self.collection
@@ -26,9 +29,10 @@ class RepositoryCells:
             # Create cells model with timestamps
             cells_model = CellsModel(**cells_data)
             cells_dict = cells_model.dict()
+            cells_dict.update(await encode_cells_async(cells_dict.pop("cells")))
             
             collection = self._get_collection()
-            result = collection.insert_one(cells_dict)
+            result = await resilient_call("mongo", lambda: collection.insert_one(cells_dict), idempotent=False)
             
             if not result.inserted_id:
                 raise Exception("Erro ao salvar células no MongoDB")
@@ -48,13 +52,15 @@ class RepositoryCells:
             object_id = ObjectId(cells_id)
             
             collection = self._get_collection()
-            cells_doc = collection.find_one({"_id": object_id})
+            cells_doc = await resilient_call("mongo", lambda: collection.find_one({"_id": object_id}))
             
             if not cells_doc:
                 raise Exception("Células não encontradas")
             
             # Convert ObjectId to string
             cells_doc["_id"] = str(cells_doc["_id"])
+            cells_doc.setdefault("version", 0)
+            await decode_document_async(cells_doc)
             
             return Response(data=cells_doc, success=True)
             
@@ -62,27 +68,231 @@ class RepositoryCells:
             logger.error(f"Error while getting cells by ID: {str(e)}")
             return Response(data=str(e), success=False)
 
-    async def update_cells_by_id(self, cells_id: str, cells_data: dict[str, Any]) -> Response:
+    async def get_cells_version(self, cells_id: str) -> Response:
+        """Apenas a versão do documento de células (leitura projetada, sem trafegar as células)."""
         try:
             object_id = ObjectId(cells_id)
             
-            # Add updated timestamp
-            update_data = {
-                **cells_data,
-                "updated_at": datetime.now()
-            }
+            collection = self._get_collection()
+            cells_doc = await resilient_call("mongo", lambda: collection.find_one({"_id": object_id}, {"version": 1}))
+            
+            if not cells_doc:
+                raise Exception("Células não encontradas")
+            
+            return Response(data=cells_doc.get("version", 0), success=True)
+            
+        except Exception as e:
+            logger.error(f"Error while getting cells version: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def get_cells_page(self, cells_id: str, offset: int, limit: int) -> Response:
+        """
+        Returns a slice of the cells ordered with tables first and links last, plus the total count.
+        Compressed documents can't be sliced by the server, so they are decoded and sliced here.
+        """
+        try:
+            object_id = ObjectId(cells_id)
+            
+            collection = self._get_collection()
+            pipeline = [
+                {"$match": {"_id": object_id}},
+                {"$project": {
+                    "_id": 0,
+                    "encoding": 1,
+                    "dictionary": 1,
+                    "cells_blob": 1,
+                    "ordered": {"$concatArrays": [
+                        {"$filter": {"input": {"$ifNull": ["$cells", []]}, "cond": {"$ne": ["$$this.type", "standard.Link"]}}},
+                        {"$filter": {"input": {"$ifNull": ["$cells", []]}, "cond": {"$eq": ["$$this.type", "standard.Link"]}}}
+                    ]}
+                }},
+                {"$project": {
+                    "encoding": 1,
+                    "dictionary": 1,
+                    "cells_blob": 1,
+                    "total": {"$size": "$ordered"},
+                    "cells": {"$slice": ["$ordered", offset, limit]}
+                }}
+            ]
+            async def read_page():
+                cursor = await collection.aggregate(pipeline)
+                return await anext(cursor, None)
+            
+            page = await resilient_call("mongo", read_page)
+            
+            if not page:
+                raise Exception("Células não encontradas")
             
+            if is_encoded(page):
+                cells = await decode_cells_async(page)
+                ordered = [cell for cell in cells if cell.get("type") != "standard.Link"]
+                ordered += [cell for cell in cells if cell.get("type") == "standard.Link"]
+                return Response(data={"total": len(ordered), "cells": ordered[offset:offset + limit]}, success=True)
+            
+            return Response(data={"total": page["total"], "cells": page["cells"]}, success=True)
+            
+        except Exception as e:
+            logger.error(f"Error while getting cells page: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def clone_cells(self, cells_id: str, schema_id: str) -> Response:
+        """
+        Copies a cells document inside MongoDB ($merge into the same collection), so the
+        cells never travel through the API. The copy belongs to schema_id and starts at version 0.
+        """
+        try:
+            new_id = ObjectId()
             collection = self._get_collection()
-            result = collection.update_one(
-                {"_id": object_id},
-                {"$set": update_data}
-            )
             
-            if result.matched_count == 0:
+            pipeline = [
+                {"$match": {"_id": ObjectId(cells_id)}},
+                {"$set": {
+                    "_id": new_id,
+                    "schema_id": schema_id,
+                    "version": 0,
+                    "created_at": "$$NOW",
+                    "updated_at": "$$NOW"
+                }},
+                {"$merge": {"into": collection.name, "whenMatched": "replace", "whenNotMatched": "insert"}}
+            ]
+            
+            async def clone():
+                cursor = await collection.aggregate(pipeline)
+                await cursor.to_list(None)
+            
+            # new_id fixo e whenMatched replace: repetir o $merge depois de uma falha de rede não gera uma segunda cópia
+            await resilient_call("mongo", clone)
+            
+            cloned = await resilient_call("mongo", lambda: collection.find_one({"_id": new_id}, {"_id": 1}))
+            if not cloned:
                 raise Exception("Células não encontradas")
             
-            return Response(data="Células atualizadas com sucesso", success=True)
+            return Response(data=str(new_id), success=True)
+            
+        except Exception as e:
+            logger.error(f"Error while cloning cells: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def delete_cells_by_schema(self, schema_id: str, cells_id: Optional[str] = None) -> Response:
+        """
+        Deletes every cells document of the schema in one delete_many. cells_id covers
+        documents written before they carried schema_id.
+        """
+        try:
+            query: dict[str, Any] = {"schema_id": schema_id}
+            if cells_id:
+                query = {"$or": [query, {"_id": ObjectId(cells_id)}]}
+            
+            collection = self._get_collection()
+            result = await resilient_call("mongo", lambda: collection.delete_many(query))
+            
+            return Response(data=result.deleted_count, success=True)
+            
+        except Exception as e:
+            logger.error(f"Error while deleting cells of schema: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def stream_cells(self, cells_id: str, batch_size: int = 500) -> AsyncIterator[tuple[int, Optional[dict[str, Any]]]]:
+        """
+        Yields (version, cell) one cell at a time from a server-side cursor, so memory doesn't grow
+        with the size of the schema. A document without cells yields a single (version, None).
+        Compressed documents can't be unwound by the server and are decoded here as a whole.
+
+        Unlike the other methods, errors are raised (the caller is already streaming).
+        """
+        object_id = ObjectId(cells_id)
+        
+        collection = self._get_collection()
+        pipeline = [
+            {"$match": {"_id": object_id}},
+            {"$project": {
+                "_id": 0,
+                "version": {"$ifNull": ["$version", 0]},
+                "encoding": 1,
+                "dictionary": 1,
+                "cells_blob": 1,
+                "cells": 1
+            }},
+            {"$unwind": {"path": "$cells", "preserveNullAndEmptyArrays": True}}
+        ]
+        # só a abertura do cursor é repetida em falhas transitórias; no meio do stream o erro sobe
+        cursor = await resilient_call("mongo", lambda: collection.aggregate(pipeline, batchSize=batch_size))
+        
+        found = False
+        async with cursor:
+            async for row in cursor:
+                found = True
+                
+                if is_encoded(row):
+                    cells = await decode_cells_async(row)
+                    for cell in cells:
+                        yield row["version"], cell
+                    if not cells:
+                        yield row["version"], None
+                    continue
+                
+                yield row["version"], row.get("cells")
+        
+        if not found:
+            raise Exception("Células não encontradas")
+
+    async def update_cells_by_id(self, cells_id: str, cells_data: dict[str, Any], expected_version: Optional[int] = None) -> Response:
+        """
+        Updates the cells document in place and increments its version.
+        When expected_version is given the write only happens if the stored version
+        still matches (compare-and-swap); otherwise data carries conflict=True.
+        """
+        try:
+            object_id = ObjectId(cells_id)
+            
+            query: dict[str, Any] = {"_id": object_id}
+            if expected_version is not None:
+                if expected_version == 0:
+                    # documentos anteriores ao versionamento não têm o campo
+                    query["$or"] = [{"version": 0}, {"version": {"$exists": False}}]
+                else:
+                    query["version"] = expected_version
+            
+            update_data = dict(cells_data)
+            encoded = await encode_cells_async(update_data.pop("cells", []))
+            update_data.update(encoded)
+            
+            # Add updated timestamp
+            update_data["updated_at"] = datetime.now()
+            
+            # remove the representation left by the previous encoding
+            if "cells" in encoded:
+                unset_fields = {field: "" for field in (*ENCODED_FIELDS, "cells_count")}
+            else:
+                unset_fields = {"cells": ""}
+            
+            collection = self._get_collection()
+            # não idempotente ($inc): só é repetido se a requisição não chegou ao servidor
+            updated_doc = await resilient_call("mongo", lambda: collection.find_one_and_update(
+                query,
+                {"$set": update_data, "$unset": unset_fields, "$inc": {"version": 1}},
+                projection={"version": 1},
+                return_document=ReturnDocument.AFTER
+            ), idempotent=False)
+            
+            if updated_doc is None:
+                current_doc = await resilient_call("mongo", lambda: collection.find_one({"_id": object_id}, {"version": 1}))
+                if not current_doc:
+                    raise Exception("Células não encontradas")
+                
+                current_version = current_doc.get("version", 0)
+                logger.warning(f"Version conflict on cells {cells_id}: expected {expected_version}, found {current_version}")
+                return Response(
+                    data={
+                        "conflict": True,
+                        "current_version": current_version,
+                        "message": "Conflito de versão: as células foram alteradas por outra sessão"
+                    },
+                    success=False
+                )
+            
+            return Response(data={"cells_id": cells_id, "version": updated_doc["version"]}, success=True)
             
         except Exception as e:
             logger.error(f"Error while updating cells: {str(e)}")
-            return Response(data=str(e), success=False) 
\ No newline at end of file
+            return Response(data=str(e), success=False)
@@ -1,19 +1,34 @@
 from app.models.dto.compartilhado.response import Response
-from app.database.common.supabase_client import get_supabase_client
-from supabase import Client
-from fastapi import UploadFile
-from supabase import create_client
+from app.database.common.supabase_client import get_storage_client, get_supabase_client
+from app.database.common.resilience import resilient_call
+from supabase import AsyncClient
 from app.database.common.supabase_public_url import build_public_url
+from app.core.cache import TTLCache
+from app.core.metrics import register_metrics
+from typing import Optional
 import logging
 import os
 
 logger = logging.getLogger(__name__)
 
 class RepositorySchema:
+    # Cache de pertencimento (user_id, schema_id) -> bool, compartilhado por todas as instâncias
+    _membership_cache = TTLCache(
+        max_size=int(os.getenv('MEMBERSHIP_CACHE_SIZE', '10000')),
+        ttl_seconds=float(os.getenv('MEMBERSHIP_CACHE_TTL_SECONDS', '60'))
+    )
+    # Negativas expiram antes, pois vinculações feitas em outro worker não invalidam este cache
+    MEMBERSHIP_NEGATIVE_TTL_SECONDS = 5
+    # Cache read-through das linhas da tabela schema (schema_id -> row)
+    _schema_cache = TTLCache(
+        max_size=int(os.getenv('SCHEMA_CACHE_SIZE', '2048')),
+        ttl_seconds=float(os.getenv('SCHEMA_CACHE_TTL_SECONDS', '10'))
+    )
+
     def __init__(self):
-        self.supabase: Client = None
+        self.supabase: AsyncClient = None
     
-    def _get_supabase_client(self) -> Client:
+    def _get_supabase_client(self) -> AsyncClient:
         if self.supabase is None:
             self.supabase = get_supabase_client()
         return self.supabase
@@ -21,7 +36,7 @@ class RepositorySchema:
     async def get_all(self) -> Response:
         try:
             supabase = self._get_supabase_client()
-            data_supabase = supabase.table("user_schema").select("*").execute()
+            data_supabase = await resilient_call("supabase", supabase.table("user_schema").select("*").execute)
             
             return Response(data=data_supabase.data, success=True)
         
@@ -31,11 +46,12 @@ class RepositorySchema:
     async def create(self, schema_data: dict) -> Response:
         try:
             supabase = self._get_supabase_client()
-            data_supabase = supabase.table("user_schema").insert(schema_data).execute()
+            data_supabase = await resilient_call("supabase", supabase.table("user_schema").insert(schema_data).execute, idempotent=False)
             
             if not data_supabase.data:
                 raise Exception("Erro ao criar associação schema-usuário")
             
+            self._membership_cache.set((schema_data["user_id"], schema_data["schema_id"]), True)
             return Response(data=data_supabase.data[0], success=True)
         
         except Exception as e:
@@ -44,17 +60,45 @@ class RepositorySchema:
     async def get_by_user_id(self, user_id: str) -> Response:
         try:
             supabase = self._get_supabase_client()
-            data_supabase = supabase.table("user_schema").select("*").eq("user_id", user_id).execute()
+            data_supabase = await resilient_call("supabase", supabase.table("user_schema").select("*").eq("user_id", user_id).execute)
             
             return Response(data=data_supabase.data, success=True)
         
         except Exception as e:
             return Response(data=str(e), success=False)
 
+    async def is_member(self, user_id: str, schema_id: str) -> Response:
+        cached = self._membership_cache.get((user_id, schema_id))
+        if cached is not None:
+            return Response(data=cached, success=True)
+        
+        try:
+            supabase = self._get_supabase_client()
+            data_supabase = await resilient_call("supabase", (
+                supabase.table("user_schema")
+                .select("id")
+                .eq("user_id", user_id)
+                .eq("schema_id", schema_id)
+                .limit(1)
+                .execute
+            ))
+            
+            is_member = bool(data_supabase.data)
+            self._membership_cache.set(
+                (user_id, schema_id),
+                is_member,
+                None if is_member else self.MEMBERSHIP_NEGATIVE_TTL_SECONDS
+            )
+            
+            return Response(data=is_member, success=True)
+        
+        except Exception as e:
+            return Response(data=str(e), success=False)
+
     async def get_by_schema_id(self, schema_id: str) -> Response:
         try:
             supabase = self._get_supabase_client()
-            data_supabase = supabase.table("user_schema").select("*").eq("schema_id", schema_id).execute()
+            data_supabase = await resilient_call("supabase", supabase.table("user_schema").select("*").eq("schema_id", schema_id).execute)
             
             return Response(data=data_supabase.data, success=True)
         
@@ -64,7 +108,7 @@ class RepositorySchema:
     async def create_schema(self, schema_data: dict) -> Response:
         try:
             supabase = self._get_supabase_client()
-            data_supabase = supabase.table("schema").insert(schema_data).execute()
+            data_supabase = await resilient_call("supabase", supabase.table("schema").insert(schema_data).execute, idempotent=False)
             
             if not data_supabase.data:
                 raise Exception("Erro ao criar schema")
@@ -77,11 +121,12 @@ class RepositorySchema:
     async def create_user_schema(self, user_schema_data: dict) -> Response:
         try:
             supabase = self._get_supabase_client()
-            data_supabase = supabase.table("user_schema").insert(user_schema_data).execute()
+            data_supabase = await resilient_call("supabase", supabase.table("user_schema").insert(user_schema_data).execute, idempotent=False)
             
             if not data_supabase.data:
                 raise Exception("Erro ao criar associação schema-usuário")
             
+            self._membership_cache.set((user_schema_data["user_id"], user_schema_data["schema_id"]), True)
             return Response(data=data_supabase.data[0], success=True)
         
         except Exception as e:
@@ -90,10 +135,12 @@ class RepositorySchema:
     async def update_schema_database_model(self, schema_id: str, database_model_id: str) -> Response:
         try:
             supabase = self._get_supabase_client()
-            data_supabase = supabase.table("schema").update({
+            data_supabase = await resilient_call("supabase", supabase.table("schema").update({
                 "database_model": database_model_id,
                 "updated_at": "now()"
-            }).eq("id", schema_id).execute()
+            }).eq("id", schema_id).execute)
+            
+            self._refresh_schema_cache(schema_id, data_supabase)
             
             if not data_supabase.data:
                 raise Exception("Erro ao atualizar schema com database_model")
@@ -101,6 +148,7 @@ class RepositorySchema:
             return Response(data=data_supabase.data[0], success=True)
         
         except Exception as e:
+            self._schema_cache.invalidate(schema_id)
             error_message = str(e)
             if "invalid input syntax for type uuid" in error_message:
                 return Response(
@@ -110,15 +158,27 @@ class RepositorySchema:
                 )
             return Response(data=str(e), success=False)
 
+    def _refresh_schema_cache(self, schema_id: str, data_supabase) -> None:
+        """Write-through após alterações: guarda a linha devolvida ou invalida a entrada."""
+        if data_supabase.data:
+            self._schema_cache.set(schema_id, data_supabase.data[0])
+        else:
+            self._schema_cache.invalidate(schema_id)
+
     async def get_schema_by_id(self, schema_id: str) -> Response:
+        cached = self._schema_cache.get(schema_id)
+        if cached is not None:
+            return Response(data=dict(cached), success=True)
+        
         try:
             supabase = self._get_supabase_client()
-            data_supabase = supabase.table("schema").select("*").eq("id", schema_id).execute()
+            data_supabase = await resilient_call("supabase", supabase.table("schema").select("*").eq("id", schema_id).execute)
             
             if not data_supabase.data:
                 raise Exception("Schema não encontrado")
             
-            return Response(data=data_supabase.data[0], success=True)
+            self._schema_cache.set(schema_id, data_supabase.data[0])
+            return Response(data=dict(data_supabase.data[0]), success=True)
         
         except Exception as e:
             return Response(data=str(e), success=False)
@@ -131,7 +191,7 @@ class RepositorySchema:
             supabase = self._get_supabase_client()
             
             # Use 'in' filter for batch query
-            data_supabase = supabase.table("schema").select("*").in_("id", schema_ids).execute()
+            data_supabase = await resilient_call("supabase", supabase.table("schema").select("*").in_("id", schema_ids).execute)
             
             return Response(data=data_supabase.data or [], success=True)
         
@@ -142,12 +202,12 @@ class RepositorySchema:
         try:
             supabase = self._get_supabase_client()
 
-            data_supabase = (
+            data_supabase = await resilient_call("supabase", (
                 supabase.table("user_schema")
                 .select("schema_id, schema:schema_id(*)")
                 .eq("user_id", user_id)
-                .execute()
-            )
+                .execute
+            ))
 
             user_schemas = data_supabase.data or []
 
@@ -157,58 +217,79 @@ class RepositorySchema:
             logger.error(f"Repo: Error getting schemas by user id: {str(e)}")
             return Response(data=str(e), success=False)
 
-    async def upload_schema_image(self, schema_id: str, image_file: UploadFile) -> Response:
-        try:           
-            logger.info(f"Repository: Starting image upload for schema {schema_id}")
-            logger.info(f"Repository: Image file - name: {image_file.filename}, type: {image_file.content_type}, size: {image_file.size}")
-            
-            # Use bucket-specific key for storage operations (strip to avoid hidden newlines)
-            connection_url = (os.getenv('CONNECTION_POSTGRES_SUPABASE') or '').strip()
-            bucket_key = (os.getenv('SECRET_SUPABASE_BUCKET') or '').strip()
-            
-            if not bucket_key:
-                logger.error("SECRET_SUPABASE_BUCKET environment variable not found")
-                return Response(data="Configuração de bucket não encontrada", success=False)
-            
-            logger.info("Repository: Using bucket-specific key for upload")
-            supabase = create_client(connection_url, bucket_key)
-            
-            # Validate file size (limit to 10MB)
-            if image_file.size and image_file.size > 10 * 1024 * 1024:
-                return Response(data="Arquivo muito grande. Máximo permitido: 10MB", success=False)
-            
-            # Read file content
-            logger.info("Repository: Reading file content...")
-            file_content = await image_file.read()
-            logger.info(f"Repository: File content read successfully, size: {len(file_content)} bytes")
-            
-            # Reset file pointer for potential future reads
-            await image_file.seek(0)
-            
-            # Determine file extension based on content type
-            extension = "png"
-            if image_file.content_type:
-                if "jpeg" in image_file.content_type or "jpg" in image_file.content_type:
-                    extension = "jpg"
-                elif "gif" in image_file.content_type:
-                    extension = "gif"
-                elif "webp" in image_file.content_type:
-                    extension = "webp"
-            
-            # Upload to schemas-storage bucket with schema_id as filename
-            file_path = f"{schema_id}.{extension}"
-            logger.info(f"Repository: Uploading to path: {file_path}")
-            
-            upload_response = supabase.storage.from_("schemas-storage").upload(
-                path=file_path,
-                file=file_content,
-                file_options={
-                    "content-type": image_file.content_type or "image/png",
-                    "upsert": "true"  # String instead of boolean - Supabase expects string
-                }
+    async def get_schemas_page_by_user_id(self, user_id: str, fields: list[str], limit: int,
+                                          after: Optional[tuple[str, str]] = None, with_count: bool = False,
+                                          order_by: str = "updated_at") -> Response:
+        """
+        Uma página dos schemas do usuário, em ordem decrescente de (order_by, id).
+
+        Args:
+            fields: colunas da tabela schema a retornar
+            after: (order_by, id) do último schema da página anterior
+            order_by: updated_at (listagem) ou created_at (imutável, para percorrer todos os schemas)
+            with_count: também conta o total de schemas do usuário
+
+        Returns:
+            {"rows": [...], "total": int ou None}
+        """
+        try:
+            supabase = self._get_supabase_client()
+
+            # inner join: o filtro por user_id é aplicado no banco e só as colunas pedidas voltam
+            query = (
+                supabase.table("schema")
+                .select(f"{','.join(fields)}, user_schema!inner(user_id)", count="exact" if with_count else None)
+                .eq("user_schema.user_id", user_id)
             )
+
+            if after:
+                order_value, schema_id = after
+                query = query.or_(
+                    f'{order_by}.lt."{order_value}",and({order_by}.eq."{order_value}",id.lt."{schema_id}")'
+                )
+
+            data_supabase = await resilient_call("supabase", (
+                query
+                .order(order_by, desc=True)
+                .order("id", desc=True)
+                .limit(limit)
+                .execute
+            ))
+
+            rows = data_supabase.data or []
+            for row in rows:
+                row.pop("user_schema", None)
+
+            return Response(data={"rows": rows, "total": data_supabase.count}, success=True)
+
+        except Exception as e:
+            logger.error(f"Repo: Error getting schemas page by user id: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def upload_schema_image(self, file_path: str, source_path: str, content_type: str) -> Response:
+        """
+        Sends the image file at source_path to the schemas-storage bucket.
+        The file is streamed from disk in the multipart body instead of being loaded into memory.
+        """
+        try:
+            logger.info(f"Repository: Uploading image to path: {file_path}")
+            
+            # Reused storage client (bucket-specific key), created at startup by the DatabaseManager
+            storage = get_storage_client()
             
-            logger.info(f"Repository: Upload response received: {type(upload_response)}")
+            async def upload():
+                # reaberto a cada tentativa, pois uma tentativa que falhou já consumiu o arquivo
+                with open(source_path, "rb") as image_file:
+                    return await storage.from_("schemas-storage").upload(
+                        path=file_path,
+                        file=image_file,
+                        file_options={
+                            "content-type": content_type,
+                            "upsert": "true"  # String instead of boolean - Supabase expects string
+                        }
+                    )
+            
+            upload_response = await resilient_call("storage", upload)
             
             # Check for errors in different response formats
             if hasattr(upload_response, 'error') and upload_response.error:
@@ -227,17 +308,41 @@ class RepositorySchema:
             logger.error(f"Repository: Upload failed with exception: {str(e)}")
             return Response(data=str(e), success=False)
 
-    async def get_schema_image_signed_url(self, schema_id: str) -> Response:
+    async def copy_schema_image(self, from_path: str, to_path: str) -> Response:
+        """Copies an object inside the schemas-storage bucket (no download/upload through the API)."""
         try:
-            # Use bucket-specific key for storage operations (strip to avoid hidden newlines)
-            connection_url = (os.getenv('CONNECTION_POSTGRES_SUPABASE') or '').strip()
-            bucket_key = (os.getenv('SECRET_SUPABASE_BUCKET') or '').strip()
+            storage = get_storage_client()
+            # a cópia falha se o destino já existe: remove antes, para a operação poder ser repetida
+            await resilient_call("storage", lambda: storage.from_("schemas-storage").remove([to_path]))
+            copied = await resilient_call("storage", lambda: storage.from_("schemas-storage").copy(from_path, to_path))
+            
+            if isinstance(copied, dict) and copied.get("error"):
+                raise Exception(f"Erro ao copiar a imagem: {copied['error']}")
             
-            if not bucket_key:
-                logger.error("SECRET_SUPABASE_BUCKET environment variable not found")
-                return Response(data="Configuração de bucket não encontrada", success=False)
+            return Response(data=to_path, success=True)
+        
+        except Exception as e:
+            logger.error(f"Repository: Error copying schema image: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def remove_schema_images(self, paths: list[str]) -> Response:
+        """Removes objects from the schemas-storage bucket; paths that don't exist are ignored by the storage."""
+        try:
+            if not paths:
+                return Response(data=[], success=True)
             
-            supabase = create_client(connection_url, bucket_key)
+            storage = get_storage_client()
+            removed = await resilient_call("storage", lambda: storage.from_("schemas-storage").remove(paths))
+            
+            return Response(data=removed, success=True)
+        
+        except Exception as e:
+            logger.error(f"Repository: Error removing schema images: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def get_schema_image_signed_url(self, schema_id: str) -> Response:
+        try:
+            storage = get_storage_client()
             
             # Try most common extensions first for speed
             extensions = ["png", "jpg"]  # Only try most common extensions for speed
@@ -247,10 +352,10 @@ class RepositorySchema:
                 
                 try:
                     # Generate signed URL valid for 1 hour (3600 seconds)
-                    signed_url_response = supabase.storage.from_("schemas-storage").create_signed_url(
+                    signed_url_response = await resilient_call("storage", lambda: storage.from_("schemas-storage").create_signed_url(
                         path=file_path,
                         expires_in=3600
-                    )
+                    ))
                     
                     # Check if request was successful
                     if hasattr(signed_url_response, 'error') and signed_url_response.error:
@@ -285,13 +390,51 @@ class RepositorySchema:
             logger.error(f"Repository: Error getting signed URL: {str(e)}")
             return Response(data=str(e), success=False)
 
+    async def create_schema_images_signed_urls(self, paths: list[str], expires_in: int) -> Response:
+        """Signs many schema images in a single storage call; missing files come back with 'error' set."""
+        try:
+            if not paths:
+                return Response(data=[], success=True)
+            
+            storage = get_storage_client()
+            signed_urls = await resilient_call(
+                "storage", lambda: storage.from_("schemas-storage").create_signed_urls(paths, expires_in)
+            )
+            
+            return Response(data=signed_urls, success=True)
+        
+        except Exception as e:
+            logger.error(f"Repository: Error signing schema images: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def touch_schema(self, schema_id: str) -> Response:
+        """Bumps updated_at (listing order and keyset cursor) after the cells were saved in place."""
+        try:
+            supabase = self._get_supabase_client()
+            data_supabase = await resilient_call("supabase", supabase.table("schema").update({
+                "updated_at": "now()"
+            }).eq("id", schema_id).execute)
+            
+            self._refresh_schema_cache(schema_id, data_supabase)
+            
+            if not data_supabase.data:
+                raise Exception("Erro ao atualizar updated_at do schema")
+            
+            return Response(data=data_supabase.data[0], success=True)
+        
+        except Exception as e:
+            self._schema_cache.invalidate(schema_id)
+            return Response(data=str(e), success=False)
+
     async def update_schema_display_picture(self, schema_id: str, display_picture_url: str) -> Response:
         try:
             supabase = self._get_supabase_client()
-            data_supabase = supabase.table("schema").update({
+            data_supabase = await resilient_call("supabase", supabase.table("schema").update({
                 "display_picture": display_picture_url,
                 "updated_at": "now()"
-            }).eq("id", schema_id).execute()
+            }).eq("id", schema_id).execute)
+            
+            self._refresh_schema_cache(schema_id, data_supabase)
             
             if not data_supabase.data:
                 raise Exception("Erro ao atualizar display_picture do schema")
@@ -299,12 +442,16 @@ class RepositorySchema:
             return Response(data=data_supabase.data[0], success=True)
         
         except Exception as e:
+            self._schema_cache.invalidate(schema_id)
             return Response(data=str(e), success=False)
     
     async def delete_schema(self, schema_id: str) -> Response:
         try:
             supabase = self._get_supabase_client()
-            data_supabase = supabase.table("schema").delete().eq("id", schema_id).execute()
+            data_supabase = await resilient_call("supabase", supabase.table("schema").delete().eq("id", schema_id).execute)
+            
+            self._membership_cache.invalidate_where(lambda key: key[1] == schema_id)
+            self._schema_cache.invalidate(schema_id)
             
             if not data_supabase.data:
                 raise Exception("Erro ao excluir o schema")
@@ -314,13 +461,28 @@ class RepositorySchema:
         except Exception as e:
             return Response(data=str(e), success=False)
         
+    async def delete_user_schemas(self, schema_id: str) -> Response:
+        """Removes every membership of the schema (no-op when the foreign key already cascaded)."""
+        try:
+            supabase = self._get_supabase_client()
+            data_supabase = await resilient_call("supabase", supabase.table("user_schema").delete().eq("schema_id", schema_id).execute)
+            
+            self._membership_cache.invalidate_where(lambda key: key[1] == schema_id)
+            
+            return Response(data=len(data_supabase.data or []), success=True)
+            
+        except Exception as e:
+            return Response(data=str(e), success=False)
+        
     async def update_schema_title(self, schema_id: str, new_title: str) -> Response:
         try:
             supabase = self._get_supabase_client()
-            data_supabase = supabase.table("schema").update({
+            data_supabase = await resilient_call("supabase", supabase.table("schema").update({
                 "title": new_title,
                 "updated_at": "now()"
-            }).eq("id", schema_id).execute()
+            }).eq("id", schema_id).execute)
+            
+            self._refresh_schema_cache(schema_id, data_supabase)
             
             if not data_supabase.data:
                 raise Exception("Erro ao atualizar nome do schema")
@@ -328,13 +490,18 @@ class RepositorySchema:
             return Response(data=data_supabase.data[0], success=True)
         
         except Exception as e:
+            self._schema_cache.invalidate(schema_id)
             return Response(data=str(e), success=False)
 
     async def get_users_by_schema(self, schema_id: str):
         try:
             supabase = self._get_supabase_client()
-            data = supabase.from_('user_schema').select('id, user_id, user(id, name, email)').eq("schema_id", schema_id).execute()
+            data = await resilient_call("supabase", supabase.from_('user_schema').select('id, user_id, user(id, name, email)').eq("schema_id", schema_id).execute)
             return Response(data=data.data or [], success=True)
 
         except Exception as e:
-            return Response(data=str(e), success=False)
\ No newline at end of file
+            return Response(data=str(e), success=False)
+
+
+register_metrics("membership_cache", RepositorySchema._membership_cache.stats)
+register_metrics("schema_cache", RepositorySchema._schema_cache.stats)
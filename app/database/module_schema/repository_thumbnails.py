@@ -0,0 +1,56 @@
+from typing import Any
+from datetime import datetime
+from pymongo.asynchronous.collection import AsyncCollection
+from app.database.common.mongo_client import get_collection
+from app.database.common.resilience import resilient_call
+from app.models.dto.compartilhado.response import Response
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RepositoryThumbnails:
+    """Hash do conteúdo da miniatura de cada schema (_id = schema_id), usado para pular uploads repetidos."""
+
+    def __init__(self):
+        self.collection: AsyncCollection = None
+
+    def _get_collection(self) -> AsyncCollection:
+        if self.collection is None:
+            self.collection = get_collection('thumbnails')
+        return self.collection
+
+    async def get_thumbnail(self, schema_id: str) -> Response:
+        """Registro da miniatura atual do schema, ou None quando ainda não há."""
+        try:
+            collection = self._get_collection()
+            thumbnail = await resilient_call("mongo", lambda: collection.find_one({"_id": schema_id}))
+
+            return Response(data=thumbnail, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while getting thumbnail: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def save_thumbnail(self, schema_id: str, thumbnail_data: dict[str, Any]) -> Response:
+        try:
+            collection = self._get_collection()
+            document = {**thumbnail_data, "updated_at": datetime.now()}
+            await resilient_call("mongo", lambda: collection.replace_one({"_id": schema_id}, document, upsert=True))
+
+            return Response(data=schema_id, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while saving thumbnail: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def delete_thumbnail(self, schema_id: str) -> Response:
+        try:
+            collection = self._get_collection()
+            result = await resilient_call("mongo", lambda: collection.delete_one({"_id": schema_id}))
+
+            return Response(data=result.deleted_count, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while deleting thumbnail: {str(e)}")
+            return Response(data=str(e), success=False)
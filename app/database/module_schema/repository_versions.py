@@ -0,0 +1,116 @@
+from typing import Any, Optional
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from pymongo.asynchronous.collection import AsyncCollection
+from app.database.common.mongo_client import get_collection
+from app.database.common.cells_codec import decode_document_async
+from app.database.common.resilience import resilient_call
+from app.models.dto.compartilhado.response import Response
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Campos devolvidos na listagem do histórico (sem o conteúdo das células/deltas)
+SUMMARY_PROJECTION = {"_id": 0, "version": 1, "kind": 1, "keyframe": 1, "cells_version": 1, "changes": 1, "user_id": 1, "created_at": 1}
+
+
+class RepositoryVersions:
+
+    def __init__(self):
+        self.collection: AsyncCollection = None
+
+    def _get_collection(self) -> AsyncCollection:
+        if self.collection is None:
+            self.collection = get_collection('schema_versions')
+        return self.collection
+
+    async def create_version(self, version_data: dict[str, Any]) -> Response:
+        try:
+            collection = self._get_collection()
+            result = await resilient_call("mongo", lambda: collection.insert_one(dict(version_data)), idempotent=False)
+
+            if not result.inserted_id:
+                raise Exception("Erro ao salvar versão no MongoDB")
+
+            return Response(data=version_data["version"], success=True)
+
+        except DuplicateKeyError:
+            # outra sessão gravou a mesma versão primeiro
+            logger.warning(f"Version {version_data.get('version')} of schema {version_data.get('schema_id')} already exists")
+            return Response(data={"conflict": True, "version": version_data.get("version")}, success=False)
+        except PyMongoError as e:
+            logger.error(f"MongoDB error while creating version: {str(e)}")
+            return Response(data=f"Erro de banco de dados: {str(e)}", success=False)
+        except Exception as e:
+            logger.error(f"Error while creating version: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def delete_versions(self, schema_id: str) -> Response:
+        """Deletes the whole history of a schema."""
+        try:
+            collection = self._get_collection()
+            result = await resilient_call("mongo", lambda: collection.delete_many({"schema_id": schema_id}))
+
+            return Response(data=result.deleted_count, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while deleting versions: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def get_latest_version(self, schema_id: str) -> Response:
+        """Returns the summary of the newest version of a schema, or None when it has no history."""
+        try:
+            collection = self._get_collection()
+            latest = await resilient_call("mongo", lambda: collection.find_one(
+                {"schema_id": schema_id},
+                SUMMARY_PROJECTION,
+                sort=[("version", DESCENDING)]
+            ))
+
+            return Response(data=latest, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while getting latest version: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def list_versions(self, schema_id: str, limit: int, before: Optional[int] = None) -> Response:
+        """Lists version summaries, newest first."""
+        try:
+            query: dict[str, Any] = {"schema_id": schema_id}
+            if before is not None:
+                query["version"] = {"$lt": before}
+
+            collection = self._get_collection()
+            versions = await resilient_call(
+                "mongo", lambda: collection.find(query, SUMMARY_PROJECTION).sort("version", DESCENDING).limit(limit).to_list()
+            )
+
+            return Response(data=versions, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while listing versions: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def get_version_chain(self, schema_id: str, version: int) -> Response:
+        """Returns the keyframe of a version followed by every delta up to it, in order."""
+        try:
+            collection = self._get_collection()
+            target = await resilient_call("mongo", lambda: collection.find_one({"schema_id": schema_id, "version": version}, {"keyframe": 1}))
+
+            if not target:
+                raise Exception("Versão não encontrada")
+
+            entries = await resilient_call("mongo", lambda: collection.find(
+                {"schema_id": schema_id, "version": {"$gte": target["keyframe"], "$lte": version}},
+                {"_id": 0}
+            ).sort("version", ASCENDING).to_list())
+            chain = [await decode_document_async(entry) for entry in entries]
+
+            if not chain or chain[0].get("kind") != "keyframe":
+                raise Exception("Histórico corrompido: keyframe da versão não encontrado")
+
+            return Response(data=chain, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while getting version chain: {str(e)}")
+            return Response(data=str(e), success=False)
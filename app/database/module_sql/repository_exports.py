@@ -0,0 +1,61 @@
+from app.models.dto.compartilhado.response import Response
+from app.database.common.supabase_client import get_storage_client
+from app.database.common.resilience import resilient_call
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RepositoryExports:
+    """Scripts SQL gerados, guardados no bucket privado exports."""
+
+    BUCKET = "exports"
+
+    def __init__(self):
+        pass
+
+    async def upload_sql(self, file_path: str, sql_code: str) -> Response:
+        try:
+            # Reused storage client for the bucket-specific key (private bucket / RLS)
+            storage = get_storage_client()
+            upload_resp = await resilient_call("storage", lambda: storage.from_(self.BUCKET).upload(
+                path=file_path,
+                file=sql_code.encode("utf-8"),
+                file_options={
+                    "content-type": "application/sql",
+                    "upsert": "true",
+                },
+            ))
+
+            if hasattr(upload_resp, "error") and upload_resp.error:
+                raise Exception(f"Erro no upload do SQL: {upload_resp.error}")
+            if isinstance(upload_resp, dict) and upload_resp.get("error"):
+                raise Exception(f"Erro no upload do SQL: {upload_resp['error']}")
+
+            return Response(data=file_path, success=True)
+
+        except Exception as e:
+            logger.error(f"Repository: Error uploading SQL export: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def create_signed_url(self, file_path: str, expires_in: int) -> Response:
+        try:
+            storage = get_storage_client()
+            signed = await resilient_call("storage", lambda: storage.from_(self.BUCKET).create_signed_url(path=file_path, expires_in=expires_in))
+
+            if hasattr(signed, "error") and signed.error:
+                raise Exception(f"Erro ao gerar signed URL: {signed.error}")
+            if isinstance(signed, dict) and signed.get("error"):
+                raise Exception(f"Erro ao gerar signed URL: {signed['error']}")
+
+            signed_url = None
+            if isinstance(signed, dict):
+                signed_url = signed.get("signedURL") or signed.get("signed_url") or signed.get("url")
+            if not signed_url:
+                raise Exception("Não foi possível obter signed URL")
+
+            return Response(data=signed_url, success=True)
+
+        except Exception as e:
+            logger.error(f"Repository: Error signing SQL export: {str(e)}")
+            return Response(data=str(e), success=False)
@@ -1,15 +1,16 @@
 from app.models.dto.compartilhado.response import Response
 from app.database.common.supabase_client import get_supabase_client
-from supabase import Client
+from app.database.common.resilience import resilient_call
+from supabase import AsyncClient
 
 # import logging
 # logging.basicConfig(level=logging.DEBUG)
 
 class RepositoryUser:
   def __init__(self):
-    self.supabase: Client = None
+    self.supabase: AsyncClient = None
   
-  def _get_supabase_client(self) -> Client:
+  def _get_supabase_client(self) -> AsyncClient:
     if self.supabase is None:
       self.supabase = get_supabase_client()
     return self.supabase
@@ -17,7 +18,7 @@ class RepositoryUser:
   async def create(self, user_received: dict) -> str:
     try:
       supabase = self._get_supabase_client()
-      data_supabase = supabase.table("user").insert(user_received).execute()
+      data_supabase = await resilient_call("supabase", supabase.table("user").insert(user_received).execute, idempotent=False)
       
       if not data_supabase.data:
         raise Exception("Erro ao criar usuário")
@@ -30,7 +31,7 @@ class RepositoryUser:
   async def selectOne(self, user_received) -> dict:
     try: 
       supabase = self._get_supabase_client()
-      data_supabase = supabase.table('user').select('*').eq("email", user_received.email).limit(1).execute()
+      data_supabase = await resilient_call("supabase", supabase.table('user').select('*').eq("email", user_received.email).limit(1).execute)
       
       if not data_supabase.data:
         raise Exception("Senha ou E-mail incorretos")
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import logging
+from typing import Any, Optional
+from app.database.common.sqlite_database import SQLiteDatabase
+from app.models.dto.compartilhado.response import Response
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_PATH = os.getenv('WAL_JOURNAL_PATH', 'data/journal.sqlite3')
+# NORMAL sobrevive à queda do processo; FULL também à queda de energia, com fsync a cada operação
+JOURNAL_SYNCHRONOUS = (os.getenv('WAL_JOURNAL_SYNCHRONOUS') or 'NORMAL').upper()
+
+
+class RepositoryJournal:
+    """
+    Journal local (SQLite, append-only) das operações de colaboração ainda não salvas no banco.
+
+    Todas as chamadas ao SQLite rodam numa única thread dedicada (SQLiteDatabase).
+    """
+
+    _database = SQLiteDatabase(
+        JOURNAL_PATH,
+        (
+            "CREATE TABLE IF NOT EXISTS ops ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "schema_id TEXT NOT NULL, "
+            "user_id TEXT NOT NULL, "
+            "op_type TEXT NOT NULL, "
+            "payload TEXT NOT NULL, "
+            "created_at REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS ops_schema_seq ON ops (schema_id, seq)",
+        ),
+        name="journal",
+        synchronous=JOURNAL_SYNCHRONOUS,
+    )
+
+    def __init__(self):
+        pass
+
+    def _get_connection(self):
+        return self._database.connection()
+
+    async def _run(self, function, *args):
+        return await self._database.run(function, *args)
+
+    def _append(self, schema_id: str, user_id: str, op_type: str, payload: dict[str, Any]) -> int:
+        cursor = self._get_connection().execute(
+            "INSERT INTO ops (schema_id, user_id, op_type, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+            (schema_id, user_id, op_type, json.dumps(payload, default=str), time.time())
+        )
+        return cursor.lastrowid
+
+    async def append(self, schema_id: str, user_id: str, op_type: str, payload: dict[str, Any]) -> Response:
+        """Grava a operação no journal e retorna o seq atribuído."""
+        try:
+            seq = await self._run(self._append, schema_id, user_id, op_type, payload)
+            return Response(data=seq, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while appending to journal: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    def _truncate(self, schema_id: str, up_to_seq: int) -> int:
+        cursor = self._get_connection().execute(
+            "DELETE FROM ops WHERE schema_id = ? AND seq <= ?", (schema_id, up_to_seq)
+        )
+        return cursor.rowcount
+
+    async def truncate(self, schema_id: str, up_to_seq: int) -> Response:
+        """Remove as operações do schema já persistidas no banco (seq <= up_to_seq)."""
+        try:
+            deleted = await self._run(self._truncate, schema_id, up_to_seq)
+            return Response(data=deleted, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while truncating journal: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    def _purge(self, schema_id: str) -> int:
+        cursor = self._get_connection().execute("DELETE FROM ops WHERE schema_id = ?", (schema_id,))
+        return cursor.rowcount
+
+    async def purge(self, schema_id: str) -> Response:
+        """Descarta todas as operações do schema (schema excluído)."""
+        try:
+            deleted = await self._run(self._purge, schema_id)
+            return Response(data=deleted, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while purging journal: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    def _pending(self, schema_id: Optional[str]) -> list[dict[str, Any]]:
+        if schema_id is None:
+            rows = self._get_connection().execute(
+                "SELECT seq, schema_id, user_id, op_type, payload FROM ops ORDER BY seq"
+            ).fetchall()
+        else:
+            rows = self._get_connection().execute(
+                "SELECT seq, schema_id, user_id, op_type, payload FROM ops WHERE schema_id = ? ORDER BY seq", (schema_id,)
+            ).fetchall()
+        return [
+            {"seq": seq, "schema_id": schema_id, "user_id": user_id, "op_type": op_type, "payload": json.loads(payload)}
+            for seq, schema_id, user_id, op_type, payload in rows
+        ]
+
+    async def get_pending_ops(self, schema_id: Optional[str] = None) -> Response:
+        """Operações ainda não drenadas (todas, ou só as do schema), na ordem em que foram gravadas."""
+        try:
+            ops = await self._run(self._pending, schema_id)
+            return Response(data=ops, success=True)
+
+        except Exception as e:
+            logger.error(f"Error while reading journal: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def close(self) -> None:
+        await self._database.close()
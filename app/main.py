@@ -7,8 +7,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.controllers.module_auth.controller_auth import router as user_route
 from app.controllers.module_schema.controller_schema import router as schema_route
 from app.controllers.module_sql.controller_sql import router as sql_route
-from app.controllers.module_websocket.controller_websocket import sio 
+from app.controllers.module_metrics.controller_metrics import router as metrics_route
+from app.controllers.module_jobs.controller_jobs import router as jobs_route, service_jobs
+from app.controllers.module_websocket.controller_websocket import sio, service_websocket
 from app.database.common.database_manager import db_manager
+from app.core.responses import FastJSONResponse, add_compression
 
 import logging
 import socketio
@@ -21,6 +24,7 @@ app = FastAPI(
   title="ColaBD API",
   description="API para o desenvolvimento do ColaBD",
   version="1.0.0",
+  default_response_class=FastJSONResponse,
 )
 
 socket_app = socketio.ASGIApp(sio, app)
@@ -38,22 +42,32 @@ app.add_middleware(
   allow_headers=["*"],
 )
 
+add_compression(app)
+
 # ---- Endpoints da aplicação ----
 app.include_router(user_route)
 app.include_router(schema_route)
 app.include_router(sql_route)
+app.include_router(metrics_route)
+app.include_router(jobs_route)
 # --------------------------------
 
 @app.on_event("startup")
 async def iniciandoAPP():
   logger.info("Iniciando Aplicação...")
   await db_manager.initialize()
+  # edições que ficaram só no journal local (processo encerrado antes do salvamento)
+  await service_websocket.replay_journal()
+  # jobs em segundo plano (inclusive os que ficaram na fila quando o processo parou)
+  await service_jobs.start()
   logger.info("Aplicação iniciada com sucesso!")
 
 @app.on_event("shutdown")
 async def encerrandoAPP():
   logger.info("Encerrando Aplicação...")
+  await service_jobs.stop()
   await db_manager.close_connections()
+  await service_websocket.repo_journal.close()
   logger.info("Aplicação encerrada com sucesso!")
 
 @app.get('/', include_in_schema=False)
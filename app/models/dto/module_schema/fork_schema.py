@@ -0,0 +1,7 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+class ForkSchema(BaseModel):
+    """DTO for duplicating a schema."""
+    title: Optional[str] = None
@@ -1,9 +1,11 @@
 from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Any
+from typing import Any, Optional
 
 
 class CellsModel(BaseModel):
     cells: list[dict[str, Any]]
+    schema_id: Optional[str] = None  # schema dono do documento (exclusão em cascata)
+    version: int = 0  # incrementado a cada atualização in-place (compare-and-swap)
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now) 
\ No newline at end of file
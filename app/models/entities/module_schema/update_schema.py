@@ -1,6 +1,8 @@
-from typing import Any
+from typing import Any, Optional
 
 class UpdateSchemaData:
-    def __init__(self, schema_id: str, cells: list[dict[str, Any]]):
+    def __init__(self, schema_id: str, cells: list[dict[str, Any]], expected_version: Optional[int] = None):
         self.schema_id = schema_id
-        self.cells = cells
\ No newline at end of file
+        self.cells = cells
+        # versão do documento de células que o chamador leu por último (None = sobrescreve sem checar)
+        self.expected_version = expected_version
\ No newline at end of file
@@ -4,6 +4,9 @@ from datetime import datetime, timedelta
 
 class BaseElement(BaseModel):
     id: str
+    # Carimbo lógico (relógio de Lamport + id do cliente) usado no last-writer-wins
+    clock: Optional[int] = None
+    client_id: Optional[str] = None
     class Config: #classe própria do pydntic que permite configurar o comportamento do modelo
         extra = "ignore"  # Ignora campos extras não definidos no modelo
 class Position(BaseModel):
@@ -96,6 +99,33 @@ class LinkTable(BaseElement):
 class SchemaUpdates(BaseModel):
     cells: list[dict[str, Any]] = Field(default_factory=list)
     task: Any | None = None
+    saving: Any | None = None  # task do salvamento em voo (não é cancelada por novos agendamentos)
+    version: Optional[int] = None  # versão do documento de células no Mongo usada no compare-and-swap
+    # Relógio de Lamport do schema e último carimbo (clock, client_id) aplicado por elemento
+    clock: int = 0
+    versions: dict[str, tuple[int, str]] = Field(default_factory=dict)
+    # Índice de adjacência: id da tabela -> ids dos links incidentes, e link -> (source, target)
+    adjacency: dict[str, set[str]] = Field(default_factory=dict)
+    link_ends: dict[str, tuple[Optional[str], Optional[str]]] = Field(default_factory=dict)
+    # Último seq gravado no journal local e salvamentos seguidos que falharam (backoff do retry)
+    journal_seq: Optional[int] = None
+    save_failures: int = 0
+    # Operações aplicadas desde o último salvamento confirmado (reaplicadas após um conflito de versão)
+    unsaved_ops: list[Any] = Field(default_factory=list)
+    # Vezes que unsaved_ops passou do limite e foi esvaziado: enquanto > 0, a reaplicação lê o journal
+    unsaved_overflow: int = 0
+    # Sala sem sessões conectadas: o estado em memória é descartado assim que tudo estiver salvo
+    idle: bool = False
+
+
+class OperationResult(BaseModel):
+    """Resultado da aplicação de uma operação no estado em memória do schema."""
+    applied: bool
+    element_id: str
+    clock: int
+    client_id: str
+    element: dict[str, Any] | None = None  # versão vencedora quando a operação é descartada
+    deleted_links: list[str] = Field(default_factory=list)  # links removidos em cascata
 
 
 class Lock(BaseModel):
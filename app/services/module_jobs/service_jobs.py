@@ -0,0 +1,241 @@
+import os
+import time
+import socket
+import uuid
+import random
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+from app.core.metrics import register_metrics
+from app.database.module_jobs.repository_jobs import RepositoryJobs
+from app.models.dto.compartilhado.response import Response
+
+logger = logging.getLogger(__name__)
+
+# Campos do job devolvidos ao cliente (o payload fica só no servidor)
+PUBLIC_FIELDS = ("id", "kind", "status", "attempts", "max_attempts", "result", "error", "created_at", "updated_at")
+
+
+def public_job(job: dict[str, Any]) -> dict[str, Any]:
+    return {field: job.get(field) for field in PUBLIC_FIELDS}
+
+
+class ServiceJobs:
+    """
+    Jobs em segundo plano: fila persistente em SQLite e um pool fixo de workers no processo.
+
+    Cada tipo de job tem um handler async (payload) -> Response, registrado com register().
+    Falhas são repetidas com backoff até max_attempts; depois da última, o on_failed do tipo
+    (opcional) libera o que o job deixou para trás. Cada job em execução tem um lease, renovado
+    enquanto o handler roda; se o processo cai, o job volta a ser pego (por este ou outro processo)
+    quando o lease vence, então os handlers devem ser idempotentes.
+    Estado compartilhado (handlers e workers) fica na classe, como nos demais serviços.
+    """
+
+    WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+    MAX_PENDING = int(os.getenv("JOBS_MAX_PENDING", "1000"))
+    JOB_TIMEOUT_SECONDS = float(os.getenv("JOBS_TIMEOUT_SECONDS", "300"))
+    RETRY_BASE_SECONDS = 2
+    RETRY_MAX_SECONDS = 300
+    # Sem aviso de novo job, os workers olham a fila neste intervalo (jobs aguardando retry)
+    POLL_SECONDS = 1
+    RETENTION_SECONDS = 7 * 24 * 3600
+    LEASE_SECONDS = float(os.getenv("JOBS_LEASE_SECONDS", "60"))
+    # renovado algumas vezes por lease, para um atraso do event loop não derrubar o dono
+    HEARTBEAT_SECONDS = LEASE_SECONDS / 3
+    # dono dos jobs pegos por este processo
+    OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    _handlers: dict[str, Callable[[dict[str, Any]], Awaitable[Response]]] = {}
+    _failure_handlers: dict[str, Callable[[dict[str, Any]], Awaitable[None]]] = {}
+    _workers: list[asyncio.Task] = []
+    _wakeup: Optional[asyncio.Event] = None
+    _counts = {"enqueued": 0, "succeeded": 0, "failed": 0, "retried": 0}
+    # callback async (user_id, job público) chamado quando um job termina (sucesso ou falha definitiva)
+    on_finished: Optional[Callable[[Optional[str], dict[str, Any]], Awaitable[None]]] = None
+
+    def __init__(self):
+        self.repo_jobs = RepositoryJobs()
+
+    def register(self, kind: str, handler: Callable[[dict[str, Any]], Awaitable[Response]],
+                 on_failed: Optional[Callable[[dict[str, Any]], Awaitable[None]]] = None) -> None:
+        ServiceJobs._handlers[kind] = handler
+        if on_failed is not None:
+            ServiceJobs._failure_handlers[kind] = on_failed
+
+    async def enqueue(self, kind: str, payload: dict[str, Any], user_id: Optional[str] = None, max_attempts: int = 3) -> Response:
+        """
+        Grava o job na fila e acorda os workers.
+
+        Returns:
+            {"job_id": str, "status": "queued"}; com a fila cheia, {"overloaded": True, ...}
+        """
+        if kind not in self._handlers:
+            return Response(data=f"Tipo de job desconhecido: {kind}", success=False)
+
+        pending_result = await self.repo_jobs.count_pending()
+        if not pending_result.success:
+            return pending_result
+
+        if pending_result.data >= self.MAX_PENDING:
+            logger.warning(f"Jobs queue full ({pending_result.data} pending), refusing {kind}")
+            return Response(data={"overloaded": True, "message": "Fila de processamento cheia, tente novamente em instantes"}, success=False)
+
+        job_id = str(uuid.uuid4())
+        enqueue_result = await self.repo_jobs.enqueue(job_id, kind, user_id, payload, max_attempts)
+        if not enqueue_result.success:
+            return enqueue_result
+
+        self._counts["enqueued"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+        return Response(data={"job_id": job_id, "status": "queued"}, success=True)
+
+    async def get_job(self, job_id: str, user_id: str) -> Response:
+        """Status do job; jobs de outro usuário são tratados como inexistentes."""
+        job_result = await self.repo_jobs.get_job(job_id)
+        if not job_result.success:
+            return job_result
+
+        job = job_result.data
+        if job is None or job["user_id"] != user_id:
+            return Response(data="Job não encontrado", success=False)
+
+        return Response(data=public_job(job), success=True)
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+
+        recover_result = await self.repo_jobs.recover(time.time() - self.RETENTION_SECONDS)
+        if recover_result.success and recover_result.data:
+            logger.info(f"Requeued {recover_result.data} jobs interrupted by the last shutdown")
+
+        ServiceJobs._wakeup = asyncio.Event()
+        ServiceJobs._workers = [asyncio.create_task(self.__worker(index)) for index in range(self.WORKERS)]
+        logger.info(f"Jobs workers started ({self.WORKERS})")
+
+    async def stop(self) -> None:
+        """Cancela os workers; jobs em andamento ficam como running e voltam para a fila quando o lease vence."""
+        workers = self._workers
+        ServiceJobs._workers = []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await self.repo_jobs.close()
+
+    async def __worker(self, index: int) -> None:
+        while True:
+            try:
+                claim_result = await self.repo_jobs.claim_next(self.OWNER, self.LEASE_SECONDS)
+                job = claim_result.data if claim_result.success else None
+
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                await self.__run(job)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Jobs worker {index} error: {str(e)}")
+                await asyncio.sleep(self.POLL_SECONDS)
+
+    async def __run(self, job: dict[str, Any]) -> None:
+        handler = self._handlers.get(job["kind"])
+        error = None
+        result = None
+
+        if handler is None:
+            error = f"Tipo de job desconhecido: {job['kind']}"
+        elif job["attempts"] > job["max_attempts"]:
+            # retomado depois de um lease vencido na última tentativa
+            error = "Job interrompido na última tentativa"
+        else:
+            heartbeat = asyncio.create_task(self.__heartbeat(job))
+            try:
+                handler_result = await asyncio.wait_for(handler(job["payload"]), self.JOB_TIMEOUT_SECONDS)
+                if handler_result.success:
+                    result = handler_result.data
+                else:
+                    error = str(handler_result.data)
+            except asyncio.TimeoutError:
+                error = f"Tempo limite de {self.JOB_TIMEOUT_SECONDS:.0f}s excedido"
+            except Exception as e:
+                error = str(e)
+            finally:
+                heartbeat.cancel()
+                await asyncio.gather(heartbeat, return_exceptions=True)
+
+        if error is None:
+            finish_result = await self.repo_jobs.mark_succeeded(job["id"], self.OWNER, result)
+            if self.__lost_lease(job, finish_result):
+                return
+            self._counts["succeeded"] += 1
+            await self.__notify(job, "succeeded", result, None)
+            return
+
+        if handler is not None and job["attempts"] < job["max_attempts"]:
+            delay = random.uniform(0, min(self.RETRY_MAX_SECONDS, self.RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1)))
+            logger.warning(f"Job {job['id']} ({job['kind']}) failed, retry {job['attempts']}/{job['max_attempts'] - 1} in {delay:.1f}s: {error}")
+            finish_result = await self.repo_jobs.mark_failed(job["id"], self.OWNER, error, retry_at=time.time() + delay)
+            if self.__lost_lease(job, finish_result):
+                return
+            self._counts["retried"] += 1
+            return
+
+        logger.error(f"Job {job['id']} ({job['kind']}) failed after {job['attempts']} attempts: {error}")
+        finish_result = await self.repo_jobs.mark_failed(job["id"], self.OWNER, error)
+        if self.__lost_lease(job, finish_result):
+            return
+        self._counts["failed"] += 1
+        
+        on_failed = self._failure_handlers.get(job["kind"])
+        if on_failed is not None:
+            try:
+                await on_failed(job["payload"])
+            except Exception as e:
+                logger.warning(f"Cleanup of failed job {job['id']} ({job['kind']}) failed: {str(e)}")
+        
+        await self.__notify(job, "failed", None, error)
+
+    async def __heartbeat(self, job: dict[str, Any]) -> None:
+        while True:
+            await asyncio.sleep(self.HEARTBEAT_SECONDS)
+            lease_result = await self.repo_jobs.extend_lease(job["id"], self.OWNER, self.LEASE_SECONDS)
+            if lease_result.success and not lease_result.data:
+                logger.warning(f"Job {job['id']} ({job['kind']}) lease lost, another worker took it over")
+                return
+
+    @staticmethod
+    def __lost_lease(job: dict[str, Any], finish_result: Response) -> bool:
+        # o lease venceu no meio da execução e outro worker pegou o job: o resultado é dele
+        if finish_result.success and not finish_result.data:
+            logger.warning(f"Job {job['id']} ({job['kind']}) finished after losing its lease, result discarded")
+            return True
+        return False
+
+    async def __notify(self, job: dict[str, Any], status: str, result: Any, error: Optional[str]) -> None:
+        # lido pela classe: pela instância a função viraria um método ligado
+        callback = ServiceJobs.on_finished
+        if callback is None:
+            return
+
+        try:
+            await callback(job["user_id"], public_job({**job, "status": status, "result": result, "error": error}))
+        except Exception as e:
+            logger.warning(f"Could not notify completion of job {job['id']}: {str(e)}")
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {**cls._counts, "workers": len(cls._workers), "kinds": sorted(cls._handlers)}
+
+
+register_metrics("jobs", ServiceJobs.stats)
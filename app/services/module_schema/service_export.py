@@ -0,0 +1,119 @@
+import os
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Optional
+
+from app.core.responses import dumps
+from app.database.module_schema.repository_cells import RepositoryCells
+from app.database.module_schema.repository_schema import RepositorySchema
+from app.models.dto.compartilhado.response import Response
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceExport:
+    """
+    Exportação NDJSON dos schemas: uma linha por registro, gerada direto dos cursores.
+
+    Linhas, na ordem:
+        {"type": "schema", "schema": {...}}
+        {"type": "cell", "schema_id": ..., "cell": {...}}            (uma por célula)
+        {"type": "schema_end", "schema_id": ..., "version": ..., "cells_count": ...}
+        {"type": "export_end", "schemas_count": ...}
+    Um erro no meio do stream gera {"type": "error", ...} e encerra a exportação,
+    então um arquivo sem export_end está incompleto.
+    """
+
+    # Schemas lidos por página da listagem e linhas acumuladas antes de cada envio
+    SCHEMAS_PAGE_SIZE = 100
+    CELLS_BATCH_SIZE = int(os.getenv("EXPORT_CELLS_BATCH_SIZE", "500"))
+    CHUNK_BYTES = 64 * 1024
+    SCHEMA_FIELDS = ["id", "title", "display_picture", "database_model", "created_at", "updated_at"]
+
+    def __init__(self):
+        self.repo_schema = RepositorySchema()
+        self.repo_cells = RepositoryCells()
+
+    async def prepare_schema_export(self, schema_id: str, user_id: str) -> Response:
+        """Verifica o acesso antes de abrir o stream (depois do primeiro byte não dá mais para responder 403)."""
+        schema_result, access_result = await asyncio.gather(
+            self.repo_schema.get_schema_by_id(schema_id),
+            self.repo_schema.is_member(user_id, schema_id)
+        )
+        if not schema_result.success:
+            return Response(data="Schema não encontrado", success=False)
+
+        if not access_result.success:
+            return Response(data="Erro ao verificar permissões do usuário", success=False)
+
+        if not access_result.data:
+            return Response(data="Acesso negado: você não tem permissão para acessar este schema", success=False)
+
+        return schema_result
+
+    async def __iter_user_schemas(self, user_id: str) -> AsyncIterator[dict[str, Any]]:
+        after = None
+        while True:
+            page_result = await self.repo_schema.get_schemas_page_by_user_id(
+                user_id, self.SCHEMA_FIELDS, self.SCHEMAS_PAGE_SIZE, after, order_by="created_at"
+            )
+            if not page_result.success:
+                raise Exception(f"Erro ao listar schemas: {page_result.data}")
+
+            rows = page_result.data["rows"]
+            for row in rows:
+                yield row
+
+            if len(rows) < self.SCHEMAS_PAGE_SIZE:
+                return
+            # created_at não muda: um schema editado durante a exportação não sai nem repete na paginação
+            after = (rows[-1]["created_at"], rows[-1]["id"])
+
+    async def __schema_lines(self, schema: dict[str, Any]) -> AsyncIterator[dict[str, Any]]:
+        schema_id = schema["id"]
+        yield {"type": "schema", "schema": schema}
+
+        version = None
+        cells_count = 0
+        if schema.get("database_model"):
+            async for version, cell in self.repo_cells.stream_cells(schema["database_model"], self.CELLS_BATCH_SIZE):
+                if cell is None:
+                    continue
+                cells_count += 1
+                yield {"type": "cell", "schema_id": schema_id, "cell": cell}
+
+        yield {"type": "schema_end", "schema_id": schema_id, "version": version, "cells_count": cells_count}
+
+    async def stream_export(self, user_id: str, schema: Optional[dict[str, Any]] = None) -> AsyncIterator[bytes]:
+        """
+        NDJSON de um schema (já verificado em prepare_schema_export) ou de todos os schemas do usuário.
+        As linhas são agrupadas em blocos de até CHUNK_BYTES por envio.
+        """
+        buffer = bytearray()
+        schemas_count = 0
+        current_schema_id = None
+
+        try:
+            schemas = self.__single(schema) if schema is not None else self.__iter_user_schemas(user_id)
+            async for schema_row in schemas:
+                current_schema_id = schema_row["id"]
+                async for line in self.__schema_lines(schema_row):
+                    buffer += dumps(line)
+                    buffer += b"\n"
+                    if len(buffer) >= self.CHUNK_BYTES:
+                        yield bytes(buffer)
+                        buffer.clear()
+                schemas_count += 1
+
+            buffer += dumps({"type": "export_end", "schemas_count": schemas_count}) + b"\n"
+
+        except Exception as e:
+            logger.error(f"Service: Export interrupted for user {user_id} (schema {current_schema_id}): {str(e)}")
+            buffer += dumps({"type": "error", "schema_id": current_schema_id, "message": str(e)}) + b"\n"
+
+        if buffer:
+            yield bytes(buffer)
+
+    @staticmethod
+    async def __single(schema: dict[str, Any]) -> AsyncIterator[dict[str, Any]]:
+        yield schema
@@ -1,21 +1,40 @@
+import os
+import json
 import uuid
+import base64
+import hashlib
 import asyncio
 import logging
+from typing import Optional
 from app.database.module_schema.repository_schema import RepositorySchema
 from app.database.module_schema.repository_cells import RepositoryCells
 from app.database.module_user.repository_user import RepositoryUser
 from app.models.dto.compartilhado.response import Response
+from app.models.entities.module_schema.update_schema import UpdateSchemaData
+from app.services.module_schema.service_versions import ServiceVersions
+from app.services.module_schema.service_thumbnail import ServiceThumbnail
+from app.services.module_jobs.service_jobs import ServiceJobs
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 
 class ServiceSchema:
+    # Tamanho dos lotes de células entregues na hidratação (REST paginado e socket)
+    CELLS_PAGE_SIZE = int(os.getenv("HYDRATION_CHUNK_SIZE", "500"))
+    MAX_CELLS_PAGE_SIZE = 5000
+    # Listagem paginada dos schemas do usuário (GET /schemas)
+    SCHEMAS_PAGE_SIZE = int(os.getenv("SCHEMAS_PAGE_SIZE", "50"))
+    MAX_SCHEMAS_PAGE_SIZE = 200
+    SCHEMA_LIST_FIELDS = ("id", "title", "display_picture", "database_model", "created_at", "updated_at")
     
     def __init__(self):
         self.repo_schema = RepositorySchema()
         self.repo_cells = RepositoryCells()
         self.repo_user = RepositoryUser()
+        self.service_versions = ServiceVersions()
+        self.service_thumbnail = ServiceThumbnail()
+        self.service_jobs = ServiceJobs()
     
     async def get_all_schemas(self) -> Response:
         try:
@@ -62,7 +81,81 @@ class ServiceSchema:
         except Exception as e:
             return Response(data=str(e), success=False)
 
-    async def get_schemas_by_user(self, user_id: str) -> Response:
+    @staticmethod
+    def encode_schemas_cursor(schema: dict) -> str:
+        raw = json.dumps([schema["updated_at"], schema["id"]]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def decode_schemas_cursor(cursor: str) -> tuple[str, str]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            updated_at, schema_id = json.loads(raw)
+            uuid.UUID(schema_id)
+        except Exception:
+            raise ValueError("Cursor inválido")
+        
+        if not isinstance(updated_at, str) or '"' in updated_at:
+            raise ValueError("Cursor inválido")
+        return updated_at, schema_id
+
+    def parse_schema_list_fields(self, fields: Optional[str], with_thumbnails: bool) -> list[str]:
+        requested = [field.strip() for field in fields.split(",") if field.strip()] if fields else list(self.SCHEMA_LIST_FIELDS)
+        
+        unknown = [field for field in requested if field not in self.SCHEMA_LIST_FIELDS]
+        if unknown:
+            raise ValueError(f"Campos inválidos: {', '.join(unknown)}")
+        
+        # id e updated_at formam o cursor; display_picture é necessário para as miniaturas
+        required = ["id", "updated_at"] + (["display_picture"] if with_thumbnails else [])
+        return list(dict.fromkeys(required + requested))
+
+    async def get_schemas_page(self, user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None,
+                               fields: Optional[str] = None, with_count: bool = False, with_thumbnails: bool = False) -> Response:
+        """
+        Página dos schemas do usuário ordenada por updated_at (mais recentes primeiro).
+
+        Returns:
+            {"items": [{"schema_id", "schema"}], "next_cursor": str ou None, "total": int ou None}
+            Parâmetros inválidos retornam {"invalid_request": True, "message": ...}.
+        """
+        try:
+            try:
+                after = self.decode_schemas_cursor(cursor) if cursor else None
+                columns = self.parse_schema_list_fields(fields, with_thumbnails)
+            except ValueError as e:
+                return Response(data={"invalid_request": True, "message": str(e)}, success=False)
+            
+            limit = min(max(limit or self.SCHEMAS_PAGE_SIZE, 1), self.MAX_SCHEMAS_PAGE_SIZE)
+            
+            # um registro a mais indica se existe próxima página sem precisar de count
+            page_result = await self.repo_schema.get_schemas_page_by_user_id(user_id, columns, limit + 1, after, with_count)
+            if not page_result.success:
+                return page_result
+            
+            rows = page_result.data["rows"]
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            
+            if with_thumbnails and rows:
+                thumbnails_result = await self.service_thumbnail.get_thumbnail_urls(rows)
+                if thumbnails_result.success:
+                    for row in rows:
+                        row["signed_image_url"] = thumbnails_result.data.get(row["id"])
+                else:
+                    logger.warning(f"Service: Schemas listed without thumbnails: {thumbnails_result.data}")
+            
+            return Response(data={
+                "items": [{"schema_id": row["id"], "schema": row} for row in rows],
+                "next_cursor": self.encode_schemas_cursor(rows[-1]) if has_more else None,
+                "total": page_result.data["total"],
+            }, success=True)
+            
+        except Exception as e:
+            logger.error(f"Service: Error in get_schemas_page: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def get_schemas_by_user(self, user_id: str, with_thumbnails: bool = False) -> Response:
         try:
             logger.info(f"Service: Getting schemas for user {user_id}")
 
@@ -72,6 +165,17 @@ class ServiceSchema:
                 return result
 
             schema_details_list = result.data or []
+
+            if with_thumbnails:
+                # uma única chamada em lote ao storage para todas as miniaturas que não estão em cache
+                schemas = [item["schema"] for item in schema_details_list if item.get("schema")]
+                thumbnails_result = await self.service_thumbnail.get_thumbnail_urls(schemas)
+                
+                if thumbnails_result.success:
+                    for schema in schemas:
+                        schema["signed_image_url"] = thumbnails_result.data.get(schema["id"])
+                else:
+                    logger.warning(f"Service: Schemas listed without thumbnails: {thumbnails_result.data}")
             logger.info(f"Service: Returning {len(schema_details_list)} schema details")
 
             return Response(data=schema_details_list, success=True)
@@ -96,69 +200,151 @@ class ServiceSchema:
     #     return schema_data
     
     #refatorar essa tripa
-    async def update_schema(self, update_schema_data, current_user_id: str, display_picture=None) -> Response:
+    async def update_schema(self, update_schema_data, current_user_id: str, display_picture=None, defer_image: bool = False) -> Response:
         try:
             logger.info(f"Service: Starting update_schema for schema_id: {update_schema_data.schema_id}")
             schema_id = update_schema_data.schema_id
-            cells_data = {"cells": update_schema_data.cells}
+            cells_data = {"cells": update_schema_data.cells, "schema_id": schema_id}
 
-            logger.info("Service: Step 1 - Verifying schema exists")
-            schema_result = await self.repo_schema.get_schema_by_id(schema_id)
+            # Steps 1 and 2 are independent lookups: run them concurrently
+            logger.info("Service: Steps 1 and 2 - Verifying schema exists and user permissions")
+            schema_result, access_result = await asyncio.gather(
+                self.repo_schema.get_schema_by_id(schema_id),
+                self.repo_schema.is_member(current_user_id, schema_id)
+            )
+            
             if not schema_result.success:
                 logger.error(f"Service: Schema not found: {schema_result.data}")
                 return Response(data="Schema não encontrado", success=False)
             logger.info("Service: Schema found successfully")
             
-            logger.info("Service: Step 2 - Verifying user permissions")
-            user_schemas_result = await self.repo_schema.get_by_user_id(current_user_id)
-            if not user_schemas_result.success:
-                logger.error(f"Service: Error checking user permissions: {user_schemas_result.data}")
+            if not access_result.success:
+                logger.error(f"Service: Error checking user permissions: {access_result.data}")
                 return Response(data="Erro ao verificar permissões do usuário", success=False)
 
-            user_schema_ids = [us["schema_id"] for us in user_schemas_result.data]
-            if schema_id not in user_schema_ids:
+            if not access_result.data:
                 logger.error(f"Service: User {current_user_id} does not have access to schema {schema_id}")
                 return Response(data="Acesso negado: você não tem permissão para atualizar este schema", success=False)
             logger.info("Service: User permissions verified")
 
+            database_model_id = schema_result.data.get("database_model")
+
+            # Steps 3 and 4 (image upload and cells write) are independent as well
+            logger.info("Service: Steps 3 and 4 - Uploading image (if any) and saving cells to MongoDB")
+            if database_model_id:
+                # the current cells document is updated in place, guarded by its version
+                cells_write = self.repo_cells.update_cells_by_id(
+                    database_model_id, cells_data, update_schema_data.expected_version
+                )
+            else:
+                cells_write = self.repo_cells.create_cells(cells_data)
+            
+            pending_writes = [cells_write]
+            if display_picture and defer_image:
+                # só o hash e a cópia local ficam no caminho da requisição; o envio ao storage vira um job
+                pending_writes.append(self.service_thumbnail.spool_image(schema_id, display_picture))
+            elif display_picture:
+                pending_writes.append(self.service_thumbnail.store_image(schema_id, display_picture))
+            else:
+                logger.info("Service: No image provided, skipping upload")
+            
+            cells_result, *upload_results = await asyncio.gather(*pending_writes)
+
             image_uploaded = False
-            if display_picture:
-                logger.info("Service: Step 3 - Processing image upload")
-                upload_result = await self.repo_schema.upload_schema_image(schema_id, display_picture)
-                if not upload_result.success:
-                    logger.error(f"Service: Image upload failed: {upload_result.data}")
-                    return Response(data=f"Erro no upload da imagem: {upload_result.data}", success=False)
+            image_job_id = None
+            # as células já foram gravadas junto com o upload: uma falha na imagem não interrompe
+            # o salvamento (ponteiro, updated_at e histórico) e volta como image_error
+            image_error = None
+            if upload_results and not upload_results[0].success:
+                logger.error(f"Service: Image upload failed: {upload_results[0].data}")
+                image_error = f"Erro no upload da imagem: {upload_results[0].data}"
+            elif upload_results:
+                upload_result = upload_results[0]
                 logger.info("Service: Image uploaded successfully")
                 image_uploaded = True
-            else:
-                logger.info("Service: No image provided, skipping upload")
+                image_unchanged = upload_result.data.get("skipped", False)
+                
+                if defer_image and not image_unchanged:
+                    job_result = await self.service_jobs.enqueue(
+                        "publish_schema_image", {"schema_id": schema_id, "image": upload_result.data}, current_user_id
+                    )
+                    if job_result.success:
+                        image_job_id = job_result.data["job_id"]
+                    else:
+                        # fila indisponível: envia agora, como no caminho síncrono
+                        logger.warning(f"Service: Could not queue image of schema {schema_id}, publishing inline: {job_result.data}")
+                        publish_result = await self.service_thumbnail.publish_image(schema_id, upload_result.data)
+                        if not publish_result.success:
+                            logger.error(f"Service: Image upload failed: {publish_result.data}")
+                            image_uploaded = False
+                            image_error = f"Erro no upload da imagem: {publish_result.data}"
+                
+                # guarda o caminho real da imagem para as miniaturas não precisarem adivinhar a extensão
+                image_path = upload_result.data["file_path"]
+                if image_error is None and image_job_id is None and schema_result.data.get("display_picture") != image_path:
+                    picture_result = await self.repo_schema.update_schema_display_picture(schema_id, image_path)
+                    if not picture_result.success:
+                        logger.warning(f"Service: Could not store image path for schema {schema_id}: {picture_result.data}")
+
+            if database_model_id and not cells_result.success and cells_result.data == "Células não encontradas":
+                # database_model aponta para um documento inexistente: cria um novo e reaponta o schema
+                logger.warning(f"Service: Cells document {database_model_id} not found, creating a new one")
+                database_model_id = None
+                cells_result = await self.repo_cells.create_cells(cells_data)
 
-            logger.info("Service: Step 4 - Saving cells to MongoDB")
-            cells_result = await self.repo_cells.create_cells(cells_data)
             if not cells_result.success:
+                if isinstance(cells_result.data, dict) and cells_result.data.get("conflict"):
+                    logger.warning(f"Service: Version conflict saving schema {schema_id}: {cells_result.data}")
+                    return cells_result
+                
                 logger.error(f"Service: Error saving cells: {cells_result.data}")
                 return Response(data=f"Erro ao salvar células: {cells_result.data}", success=False)
-            logger.info(f"Service: Cells saved successfully with ID: {cells_result.data}")
             
-            # Step 5: Update schema with the MongoDB document ID as database_model
-            logger.info("Service: Step 5 - Updating schema database_model")
-            database_model_id = cells_result.data  
-            update_result = await self.repo_schema.update_schema_database_model(schema_id, database_model_id)
+            if database_model_id:
+                version = cells_result.data["version"]
+                logger.info(f"Service: Cells {database_model_id} updated in place (version {version}), schema pointer unchanged")
+                
+                # o ponteiro não muda, mas updated_at ordena a listagem (mais recentes primeiro)
+                touch_result = await self.repo_schema.touch_schema(schema_id)
+                if not touch_result.success:
+                    logger.warning(f"Service: Could not update updated_at of schema {schema_id}: {touch_result.data}")
+            else:
+                logger.info(f"Service: Cells saved successfully with ID: {cells_result.data}")
+                
+                # Step 5: Update schema with the MongoDB document ID as database_model
+                logger.info("Service: Step 5 - Updating schema database_model")
+                database_model_id = cells_result.data
+                version = 0
+                update_result = await self.repo_schema.update_schema_database_model(schema_id, database_model_id)
+                
+                if not update_result.success:
+                    logger.error(f"Service: Error updating schema: {update_result.data}")
+                    return Response(data=f"Erro ao atualizar schema: {update_result.data}", success=False)
+                logger.info("Service: Schema updated successfully")
             
-            if not update_result.success:
-                logger.error(f"Service: Error updating schema: {update_result.data}")
-                return Response(data=f"Erro ao atualizar schema: {update_result.data}", success=False)
-            logger.info("Service: Schema updated successfully")
+            # Step 6: Record the saved cells in the version history (a failure here doesn't undo the save)
+            history_result = await self.service_versions.record(schema_id, update_schema_data.cells, version, current_user_id)
+            if not history_result.success:
+                logger.warning(f"Service: Could not record version history for schema {schema_id}: {history_result.data}")
             
             response_data = {
                 "schema_id": schema_id,
                 "database_model": database_model_id,
+                "version": version,
+                "history_version": history_result.data if history_result.success else None,
                 "cells_count": len(update_schema_data.cells),
                 "message": "Schema atualizado com sucesso"
             }
             
-            if image_uploaded:
+            if image_error:
+                response_data["image_uploaded"] = False
+                response_data["image_error"] = image_error
+                response_data["message"] += ", mas a imagem não foi enviada"
+            elif image_uploaded:
                 response_data["image_uploaded"] = True
+                response_data["image_unchanged"] = image_unchanged
+                if image_job_id:
+                    response_data["image_job_id"] = image_job_id
                 response_data["message"] += " com imagem"
             
             logger.info(f"Service: update_schema completed successfully: {response_data}")
@@ -168,25 +354,102 @@ class ServiceSchema:
             logger.error(f"Service: Unexpected error in update_schema: {str(e)}")
             return Response(data=str(e), success=False)
 
+    async def run_publish_image_job(self, payload: dict) -> Response:
+        """Handler do job publish_schema_image: envia a imagem preparada no PUT e aponta o display_picture."""
+        schema_id = payload["schema_id"]
+        image = payload["image"]
+        
+        publish_result = await self.service_thumbnail.publish_pending_image(schema_id, image)
+        if not publish_result.success:
+            return publish_result
+        
+        schema_result = await self.repo_schema.get_schema_by_id(schema_id)
+        if not schema_result.success:
+            # schema excluído enquanto o job esperava na fila
+            return Response(data={"file_path": image["file_path"], "schema_deleted": True}, success=True)
+        
+        if schema_result.data.get("display_picture") != image["file_path"]:
+            picture_result = await self.repo_schema.update_schema_display_picture(schema_id, image["file_path"])
+            if not picture_result.success:
+                return picture_result
+        
+        return Response(data={"schema_id": schema_id, "file_path": image["file_path"]}, success=True)
+
+    async def discard_publish_image_job(self, payload: dict) -> None:
+        """Falha definitiva do job publish_schema_image: a cópia local da imagem não será mais usada."""
+        await self.service_thumbnail.discard_pending_image(payload["image"])
+
+    @staticmethod
+    def build_schema_etag(schema: dict, cells_version: Optional[int]) -> str:
+        """ETag forte do GET /schemas/{id}: muda quando a linha do schema ou a versão das células muda."""
+        key = json.dumps([schema["id"], schema.get("updated_at"), schema.get("database_model"), cells_version], default=str)
+        return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+    async def get_schema_etag(self, schema_id: str, current_user_id: str, live_version: Optional[int] = None) -> Response:
+        """
+        ETag atual do schema sem ler as células.
+
+        A versão das células vem da sala ativa (live_version) quando houver; senão de uma
+        leitura projetada da versão no Mongo.
+        """
+        try:
+            schema_result, access_result = await asyncio.gather(
+                self.repo_schema.get_schema_by_id(schema_id),
+                self.has_access(schema_id, current_user_id)
+            )
+            if not schema_result.success:
+                return Response(data="Schema não encontrado", success=False)
+            
+            if not access_result.success:
+                return access_result
+            
+            if not access_result.data:
+                return Response(data="Acesso negado: você não tem permissão para acessar este schema", success=False)
+            
+            schema_data = schema_result.data
+            cells_version = None
+            if schema_data.get("database_model"):
+                if live_version is not None:
+                    cells_version = live_version
+                else:
+                    version_result = await self.repo_cells.get_cells_version(schema_data["database_model"])
+                    if version_result.success:
+                        cells_version = version_result.data
+            
+            return Response(data=self.build_schema_etag(schema_data, cells_version), success=True)
+            
+        except Exception as e:
+            return Response(data=str(e), success=False)
+
     async def get_schema_with_cells(self, schema_id: str, current_user_id: str) -> Response:
         try:
+            # a permissão é verificada em paralelo com a busca do schema e a leitura das células,
+            # que depende apenas do database_model; nada é devolvido antes da permissão ser confirmada
+            access_task = asyncio.create_task(self.repo_schema.is_member(current_user_id, schema_id))
+            
             schema_result = await self.repo_schema.get_schema_by_id(schema_id)
             if not schema_result.success:
+                access_task.cancel()
                 return Response(data="Schema não encontrado", success=False)
             
             schema_data = schema_result.data
 
-            user_schemas_result = await self.repo_schema.get_by_user_id(current_user_id)
-            if not user_schemas_result.success:
-                return Response(data="Erro ao verificar permissões do usuário", success=False)
+            cells_task = None
+            if schema_data.get("database_model"):
+                cells_task = asyncio.create_task(self.repo_cells.get_cells_by_id(schema_data["database_model"]))
 
-            user_schema_ids = [us["schema_id"] for us in user_schemas_result.data]
-            if schema_id not in user_schema_ids:
+            access_result = await access_task
+            if not access_result.success or not access_result.data:
+                if cells_task:
+                    cells_task.cancel()
+                
+                if not access_result.success:
+                    return Response(data="Erro ao verificar permissões do usuário", success=False)
                 return Response(data="Acesso negado: você não tem permissão para acessar este schema", success=False)
 
             cells_data = None
-            if schema_data.get("database_model"):
-                cells_result = await self.repo_cells.get_cells_by_id(schema_data["database_model"])
+            if cells_task:
+                cells_result = await cells_task
                 if cells_result.success:
                     cells_data = cells_result.data
             
@@ -194,7 +457,8 @@ class ServiceSchema:
                 "schema": schema_data,
                 "cells": cells_data.get("cells", []) if cells_data else [],
                 "has_cells": cells_data is not None,
-                "database_model_id": schema_data.get("database_model")
+                "database_model_id": schema_data.get("database_model"),
+                "version": cells_data.get("version", 0) if cells_data else None
             }
             
             return Response(data=response_data, success=True)
@@ -202,34 +466,255 @@ class ServiceSchema:
         except Exception as e:
             return Response(data=str(e), success=False)
         
+    async def restore_version(self, schema_id: str, version: int, current_user_id: str) -> Response:
+        """Salva as células de uma versão do histórico como estado atual (gera uma nova versão)."""
+        try:
+            version_result = await self.service_versions.get_version(schema_id, version, current_user_id)
+            if not version_result.success:
+                return version_result
+            
+            update_result = await self.update_schema(
+                UpdateSchemaData(schema_id, version_result.data["cells"]), current_user_id
+            )
+            if not update_result.success:
+                return update_result
+            
+            return Response(data={**update_result.data, "restored_version": version}, success=True)
+            
+        except Exception as e:
+            return Response(data=str(e), success=False)
+        
+    async def fork_schema(self, schema_id: str, current_user_id: str, title: Optional[str] = None) -> Response:
+        """
+        Duplica o schema sem trafegar as células pela API: o documento de células é clonado
+        no MongoDB e a miniatura é copiada dentro do bucket. A cópia pertence só a quem a
+        criou e começa sem histórico de versões.
+        """
+        new_schema_id = str(uuid.uuid4())
+        try:
+            schema_result, access_result = await asyncio.gather(
+                self.repo_schema.get_schema_by_id(schema_id),
+                self.has_access(schema_id, current_user_id)
+            )
+            if not schema_result.success:
+                return Response(data="Schema não encontrado", success=False)
+            
+            if not access_result.success:
+                return access_result
+            
+            if not access_result.data:
+                return Response(data="Acesso negado: você não tem permissão para acessar este schema", success=False)
+            
+            source = schema_result.data
+            database_model_id = source.get("database_model")
+            
+            copies = [self.service_thumbnail.copy_image(schema_id, new_schema_id, source.get("display_picture"))]
+            if database_model_id:
+                copies.append(self.repo_cells.clone_cells(database_model_id, new_schema_id))
+            
+            image_result, *cells_results = await asyncio.gather(*copies)
+            
+            if cells_results and not cells_results[0].success and cells_results[0].data == "Células não encontradas":
+                # database_model aponta para um documento inexistente: a cópia começa sem células
+                logger.warning(f"Service: Cells document {database_model_id} not found, forking schema {schema_id} without cells")
+                cells_results = []
+            
+            for result in (image_result, *cells_results):
+                if not result.success:
+                    raise Exception(f"Erro ao copiar o schema: {result.data}")
+            
+            schema_dict = {
+                "id": new_schema_id,
+                "title": title or f"{source.get('title') or 'Schema'} (cópia)",
+                "display_picture": image_result.data or "",
+            }
+            if cells_results:
+                schema_dict["database_model"] = cells_results[0].data
+            
+            create_result = await self.repo_schema.create_schema(schema_dict)
+            if not create_result.success:
+                raise Exception(f"Failed to create schema: {create_result.data}")
+            
+            user_schema_result = await self.repo_schema.create_user_schema({
+                "id": str(uuid.uuid4()),
+                "user_id": current_user_id,
+                "schema_id": new_schema_id
+            })
+            if not user_schema_result.success:
+                await self.repo_schema.delete_schema(new_schema_id)
+                raise Exception(f"Failed to create user-schema association: {user_schema_result.data}")
+            
+            return Response(
+                data={
+                    "schema_id": new_schema_id,
+                    "forked_from": schema_id,
+                    "title": schema_dict["title"],
+                    "display_picture": schema_dict["display_picture"],
+                    "database_model_id": schema_dict.get("database_model")
+                },
+                success=True
+            )
+            
+        except Exception as e:
+            logger.error(f"Service: Error forking schema {schema_id}: {str(e)}")
+            # desfaz as cópias já feitas (células e imagem apontam para new_schema_id)
+            await asyncio.gather(
+                self.repo_cells.delete_cells_by_schema(new_schema_id),
+                self.service_thumbnail.delete_images(new_schema_id)
+            )
+            return Response(data=str(e), success=False)
+        
+    def normalize_page_size(self, page_size) -> int:
+        try:
+            page_size = int(page_size) if page_size else self.CELLS_PAGE_SIZE
+        except (TypeError, ValueError):
+            page_size = self.CELLS_PAGE_SIZE
+        
+        return min(max(page_size, 1), self.MAX_CELLS_PAGE_SIZE)
+
+    async def has_access(self, schema_id: str, user_id: str) -> Response:
+        access_result = await self.repo_schema.is_member(user_id, schema_id)
+        if not access_result.success:
+            return Response(data="Erro ao verificar permissões do usuário", success=False)
+        
+        return access_result
+
+    async def get_schema_cells_page(self, schema_id: str, current_user_id: str, offset: int = 0, limit=None) -> Response:
+        try:
+            limit = self.normalize_page_size(limit)
+            offset = max(offset, 0)
+            
+            schema_result, access_result = await asyncio.gather(
+                self.repo_schema.get_schema_by_id(schema_id),
+                self.has_access(schema_id, current_user_id)
+            )
+            if not schema_result.success:
+                return Response(data="Schema não encontrado", success=False)
+            
+            if not access_result.success:
+                return access_result
+            
+            if not access_result.data:
+                return Response(data="Acesso negado: você não tem permissão para acessar este schema", success=False)
+            
+            page = {"cells": [], "total": 0}
+            database_model = schema_result.data.get("database_model")
+            if database_model:
+                page_result = await self.repo_cells.get_cells_page(database_model, offset, limit)
+                if not page_result.success:
+                    return Response(data=f"Erro ao carregar células: {page_result.data}", success=False)
+                page = page_result.data
+            
+            next_offset = offset + len(page["cells"])
+            
+            return Response(
+                data={
+                    "cells": page["cells"],
+                    "offset": offset,
+                    "limit": limit,
+                    "total": page["total"],
+                    "next_offset": next_offset if next_offset < page["total"] else None
+                },
+                success=True
+            )
+            
+        except Exception as e:
+            return Response(data=str(e), success=False)
+        
     async def delete_schema(self, schema_id: str, current_user_id:str):
+        """
+        Exclui o schema: a linha do schema e os vínculos user_schema saem primeiro, então o
+        schema some das listagens na hora. Células e histórico no MongoDB e imagens no storage
+        são apagados pelo job purge_schema_data, que é repetido até concluir.
+        Repetir a exclusão de um schema já excluído devolve already_deleted.
+        """
         try:     
-            user_schemas_result = await self.repo_schema.get_by_user_id(current_user_id)
-            if not user_schemas_result.success:
-                logger.error(f"Service Error. checking permissions for: {user_schemas_result.data}")
+            access_result, schema_result = await asyncio.gather(
+                self.repo_schema.is_member(current_user_id, schema_id),
+                self.repo_schema.get_schema_by_id(schema_id)
+            )
+            if not access_result.success:
+                logger.error(f"Service Error. checking permissions for: {access_result.data}")
                 return Response(data="Erro ao verificar permissões do usuário", success=False)
-                  
-            schema_result = await self.repo_schema.get_schema_by_id(schema_id)
-            if not schema_result.success:
-                logger.error(f"Service: Schema not found: {schema_result.data}")
-                return Response(data="Schema não encontrado", success=False)
             
-            schema_result = await self.repo_schema.delete_schema(schema_id)
+            if not access_result.data:
+                return Response(data="Acesso negado: você não tem permissão para excluir este schema", success=False)
+                  
             if not schema_result.success:
+                # exclusão anterior interrompida depois de apagar a linha do schema: só restam os vínculos
+                logger.warning(f"Service: Schema {schema_id} already deleted, removing leftover memberships")
+                memberships_result = await self.repo_schema.delete_user_schemas(schema_id)
+                if not memberships_result.success:
+                    return Response(data="Erro ao excluir o schema", success=False)
+                return Response(data={"schema_id": schema_id, "already_deleted": True}, success=True)
+            
+            delete_result = await self.repo_schema.delete_schema(schema_id)
+            if not delete_result.success:
                 return Response(data="Erro ao excluir o schema", success=False)
             
-            return Response(data=schema_result, success=True)
+            memberships_result = await self.repo_schema.delete_user_schemas(schema_id)
+            if not memberships_result.success:
+                logger.warning(f"Service: Could not delete memberships of schema {schema_id}: {memberships_result.data}")
+            
+            payload = {"schema_id": schema_id, "database_model": schema_result.data.get("database_model")}
+            purge_job_id = None
+            job_result = await self.service_jobs.enqueue("purge_schema_data", payload, current_user_id, max_attempts=10)
+            if job_result.success:
+                purge_job_id = job_result.data["job_id"]
+            else:
+                # fila indisponível: apaga agora; o que falhar fica órfão, mas o schema já foi excluído
+                logger.warning(f"Service: Could not queue purge of schema {schema_id}, purging inline: {job_result.data}")
+                purge_result = await self.run_purge_schema_job(payload)
+                if not purge_result.success:
+                    logger.error(f"Service: Could not purge data of schema {schema_id}: {purge_result.data}")
+            
+            return Response(
+                data={
+                    "schema_id": schema_id,
+                    "deleted_memberships": memberships_result.data if memberships_result.success else None,
+                    "purge_job_id": purge_job_id
+                },
+                success=True
+            )
         except Exception as e:
             return Response(data=str(e), success=False)
+
+    async def run_purge_schema_job(self, payload: dict) -> Response:
+        """Handler do job purge_schema_data: apaga células, histórico e imagens de um schema já excluído (idempotente)."""
+        schema_id = payload["schema_id"]
+        
+        cells_result, versions_result, images_result = await asyncio.gather(
+            self.repo_cells.delete_cells_by_schema(schema_id, payload.get("database_model")),
+            self.service_versions.delete_history(schema_id),
+            self.service_thumbnail.delete_images(schema_id)
+        )
+        for step, result in (("cells", cells_result), ("versions", versions_result), ("images", images_result)):
+            if not result.success:
+                return Response(data=f"Erro ao apagar {step} do schema {schema_id}: {result.data}", success=False)
+        
+        return Response(
+            data={
+                "schema_id": schema_id,
+                "deleted_cells_documents": cells_result.data,
+                "deleted_versions": versions_result.data,
+                "deleted_images": images_result.data
+            },
+            success=True
+        )
         
     async def update_schema_title(self, schema_id: str, new_title: str, current_user_id: str) -> Response:
         try:
-            user_schemas_result = await self.repo_schema.get_by_user_id(current_user_id)
-            if not user_schemas_result.success:
-                logger.error(f"Service Error. checking permissions for: {user_schemas_result.data}")
+            access_result, schema_result = await asyncio.gather(
+                self.repo_schema.is_member(current_user_id, schema_id),
+                self.repo_schema.get_schema_by_id(schema_id)
+            )
+            if not access_result.success:
+                logger.error(f"Service Error. checking permissions for: {access_result.data}")
                 return Response(data="Erro ao verificar permissões do usuário", success=False)
             
-            schema_result = await self.repo_schema.get_schema_by_id(schema_id)
+            if not access_result.data:
+                return Response(data="Acesso negado: você não tem permissão para atualizar este schema", success=False)
+            
             if not schema_result.success:
                 logger.error(f"Service: Schema not found: {schema_result.data}")
                 return Response(data="Schema não encontrado", success=False)
@@ -248,12 +733,11 @@ class ServiceSchema:
             logger.info(f"Service: Vinculando usuário {user_email} ao schema {schema_id}")
             
             # Step 1: Verify if current user has access to this schema
-            user_schemas_result = await self.repo_schema.get_by_user_id(current_user_id)
-            if not user_schemas_result.success:
+            access_result = await self.repo_schema.is_member(current_user_id, schema_id)
+            if not access_result.success:
                 return Response(data="Erro ao verificar permissões do usuário", success=False)
             
-            user_schema_ids = [us["schema_id"] for us in user_schemas_result.data]
-            if schema_id not in user_schema_ids:
+            if not access_result.data:
                 return Response(data="Acesso negado: você não tem permissão para vincular usuários a este schema", success=False)
             
             # Step 2: Find user by email
@@ -273,11 +757,9 @@ class ServiceSchema:
             logger.info(f"Service: Usuário encontrado - ID: {user_id}, Email: {user_email}")
             
             # Step 3: Check if user is already linked to this schema
-            existing_link_result = await self.repo_schema.get_by_schema_id(schema_id)
-            if existing_link_result.success:
-                existing_user_ids = [link["user_id"] for link in existing_link_result.data]
-                if user_id in existing_user_ids:
-                    return Response(data="Usuário já está vinculado a este schema", success=False)
+            existing_link_result = await self.repo_schema.is_member(user_id, schema_id)
+            if existing_link_result.success and existing_link_result.data:
+                return Response(data="Usuário já está vinculado a este schema", success=False)
             
             # Step 4: Create user-schema association
             user_schema_dict = {
@@ -0,0 +1,407 @@
+import os
+import asyncio
+import hashlib
+import logging
+import tempfile
+from typing import Any, Optional
+
+from fastapi import UploadFile
+
+from app.core.cache import TTLCache
+from app.core.metrics import register_metrics
+from app.database.module_schema.repository_schema import RepositorySchema
+from app.database.module_schema.repository_thumbnails import RepositoryThumbnails
+from app.models.dto.compartilhado.response import Response
+
+try:
+    from PIL import Image
+except ImportError:  # optional dependency
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceThumbnail:
+    """
+    URLs assinadas das miniaturas dos schemas.
+
+    Guarda o caminho real da imagem de cada schema e a URL assinada de cada caminho
+    até pouco antes de expirar. Os caminhos que faltam são assinados numa única
+    chamada em lote ao storage, então uma listagem custa no máximo uma ida ao storage.
+    """
+
+    SIGNED_URL_EXPIRES_SECONDS = int(os.getenv("THUMBNAIL_URL_EXPIRES_SECONDS", "3600"))
+    # A URL sai do cache este tempo antes de expirar, para o cliente ainda conseguir usá-la
+    REFRESH_MARGIN_SECONDS = int(os.getenv("THUMBNAIL_URL_REFRESH_MARGIN_SECONDS", "300"))
+    # Schemas sem imagem são lembrados por pouco tempo (um upload em outro worker aparece logo)
+    NO_IMAGE_TTL_SECONDS = 60
+    CANDIDATE_EXTENSIONS = ("png", "jpg", "gif", "webp")
+
+    MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+    UPLOAD_CHUNK_BYTES = 64 * 1024
+    # Lado maior da miniatura; imagens maiores são reduzidas (quando o Pillow está instalado)
+    MAX_THUMBNAIL_PX = int(os.getenv("THUMBNAIL_MAX_PX", "512"))
+    PILLOW_FORMATS = {"png": "PNG", "jpg": "JPEG", "webp": "WEBP"}  # gif fica como está (animação)
+    # Uploads aguardando envio ficam aqui (fora do /tmp) para sobreviver a um restart com jobs na fila
+    SPOOL_DIR = os.getenv("THUMBNAIL_SPOOL_DIR", "data/thumbnails")
+
+    # Storage: {schema_id: path da imagem, ou "" quando o schema não tem imagem}
+    _paths = TTLCache(max_size=int(os.getenv("THUMBNAIL_CACHE_SIZE", "10000")), ttl_seconds=24 * 3600)
+
+    # Uploads de miniatura enviados ao storage e pulados por conteúdo igual
+    _upload_counts = {"sent": 0, "skipped": 0}
+
+    # Storage: {path: signed url}
+    _urls = TTLCache(max_size=int(os.getenv("THUMBNAIL_CACHE_SIZE", "10000")), ttl_seconds=3600)
+
+    def __init__(self):
+        self.repo_schema = RepositorySchema()
+        self.repo_thumbnails = RepositoryThumbnails()
+
+    def remember_image(self, schema_id: str, path: str) -> None:
+        """Registra o caminho da imagem recém-enviada do schema."""
+        self._paths.set(schema_id, path)
+
+    async def delete_images(self, schema_id: str) -> Response:
+        """Remove do storage, num único lote, todas as imagens possíveis do schema e o registro do hash."""
+        try:
+            stored_result = await self.repo_thumbnails.get_thumbnail(schema_id)
+            if not stored_result.success:
+                return stored_result
+            
+            paths = {f"{schema_id}.{extension}" for extension in self.CANDIDATE_EXTENSIONS}
+            if stored_result.data and stored_result.data.get("path"):
+                paths.add(stored_result.data["path"])
+            
+            remove_result = await self.repo_schema.remove_schema_images(sorted(paths))
+            if not remove_result.success:
+                return remove_result
+            
+            delete_result = await self.repo_thumbnails.delete_thumbnail(schema_id)
+            if not delete_result.success:
+                return delete_result
+            
+            self.forget_schema(schema_id)
+            return Response(data=len(remove_result.data or []), success=True)
+        
+        except Exception as e:
+            logger.error(f"Service: Error deleting images of schema {schema_id}: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def copy_image(self, schema_id: str, target_schema_id: str, display_picture: Optional[str] = None) -> Response:
+        """
+        Copia a miniatura de um schema para outro dentro do bucket, junto com o registro do hash.
+
+        Returns:
+            caminho da cópia, ou None quando o schema de origem não tem imagem
+        """
+        try:
+            stored_result = await self.repo_thumbnails.get_thumbnail(schema_id)
+            if not stored_result.success:
+                return stored_result
+            
+            stored = stored_result.data
+            source_path = (stored or {}).get("path") or display_picture
+            if not source_path:
+                return Response(data=None, success=True)
+            
+            extension = source_path.rsplit(".", 1)[-1]
+            file_path = f"{target_schema_id}.{extension}"
+            
+            copy_result = await self.repo_schema.copy_schema_image(source_path, file_path)
+            if not copy_result.success:
+                return copy_result
+            
+            if stored:
+                stored = {key: value for key, value in stored.items() if key not in ("_id", "updated_at")}
+                save_result = await self.repo_thumbnails.save_thumbnail(target_schema_id, {**stored, "path": file_path})
+                if not save_result.success:
+                    logger.warning(f"Service: Could not record thumbnail hash of schema {target_schema_id}: {save_result.data}")
+            
+            self.remember_image(target_schema_id, file_path)
+            return Response(data=file_path, success=True)
+        
+        except Exception as e:
+            logger.error(f"Service: Error copying image of schema {schema_id}: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    def forget_schema(self, schema_id: str) -> None:
+        path = self._paths.get(schema_id)
+        if path:
+            self._urls.invalidate(path)
+        self._paths.invalidate(schema_id)
+
+    @staticmethod
+    def image_extension(content_type: Optional[str]) -> str:
+        if content_type:
+            if "jpeg" in content_type or "jpg" in content_type:
+                return "jpg"
+            elif "gif" in content_type:
+                return "gif"
+            elif "webp" in content_type:
+                return "webp"
+        return "png"
+
+    def _spool(self, source) -> tuple[str, str, int]:
+        """Copia o upload para um arquivo temporário em blocos, calculando o sha256 no caminho."""
+        digest = hashlib.sha256()
+        size = 0
+        
+        os.makedirs(self.SPOOL_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile(prefix="thumbnail-", dir=self.SPOOL_DIR, delete=False) as spooled:
+            try:
+                while chunk := source.read(self.UPLOAD_CHUNK_BYTES):
+                    size += len(chunk)
+                    if size > self.MAX_UPLOAD_BYTES:
+                        raise ValueError("Arquivo muito grande. Máximo permitido: 10MB")
+                    digest.update(chunk)
+                    spooled.write(chunk)
+            except Exception:
+                os.unlink(spooled.name)
+                raise
+        
+        return spooled.name, digest.hexdigest(), size
+
+    def _downscale(self, path: str, extension: str) -> Optional[str]:
+        """Reduz a imagem para MAX_THUMBNAIL_PX no lado maior; None quando não precisa ou não dá."""
+        image_format = self.PILLOW_FORMATS.get(extension)
+        if Image is None or image_format is None:
+            return None
+        
+        with Image.open(path) as image:
+            if max(image.size) <= self.MAX_THUMBNAIL_PX:
+                return None
+            
+            image.thumbnail((self.MAX_THUMBNAIL_PX, self.MAX_THUMBNAIL_PX))
+            if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            
+            # no mesmo diretório do spool: o arquivo reduzido segue a configuração e a limpeza dele
+            os.makedirs(self.SPOOL_DIR, exist_ok=True)
+            with tempfile.NamedTemporaryFile(prefix="thumbnail-", suffix=f".{extension}", dir=self.SPOOL_DIR, delete=False) as output:
+                image.save(output, format=image_format, optimize=True)
+                return output.name
+
+    async def spool_image(self, schema_id: str, image_file: UploadFile) -> Response:
+        """
+        Lê o upload em blocos para um arquivo local (hash sha256 no caminho) e compara com o hash guardado.
+
+        Returns:
+            {"file_path", "sha256", "size", "content_type", "spooled_path", "previous_path", "skipped"};
+            com skipped=True o conteúdo é o mesmo já enviado e nada foi gravado em disco.
+        """
+        extension = self.image_extension(image_file.content_type)
+        file_path = f"{schema_id}.{extension}"
+        
+        try:
+            await image_file.seek(0)
+            (spooled_path, sha256, size), stored_result = await asyncio.gather(
+                asyncio.to_thread(self._spool, image_file.file),
+                self.repo_thumbnails.get_thumbnail(schema_id)
+            )
+            
+            stored = stored_result.data if stored_result.success else None
+            skipped = bool(stored and stored.get("sha256") == sha256 and stored.get("path") == file_path)
+            if skipped:
+                os.unlink(spooled_path)
+                spooled_path = None
+                self._upload_counts["skipped"] += 1
+                self.remember_image(schema_id, file_path)
+                logger.info(f"Service: Thumbnail of schema {schema_id} unchanged, upload skipped")
+            
+            return Response(data={
+                "file_path": file_path,
+                "sha256": sha256,
+                "size": size,
+                "content_type": image_file.content_type or "image/png",
+                "spooled_path": spooled_path,
+                "previous_path": stored.get("path") if stored else None,
+                "skipped": skipped,
+            }, success=True)
+        
+        except ValueError as e:
+            return Response(data=str(e), success=False)
+        except Exception as e:
+            logger.error(f"Service: Error reading thumbnail of schema {schema_id}: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def publish_image(self, schema_id: str, image: dict[str, Any], keep_on_failure: bool = False) -> Response:
+        """
+        Reduz (se preciso) e envia ao storage a imagem preparada por spool_image.
+        keep_on_failure mantém o arquivo local para uma nova tentativa (jobs em segundo plano).
+
+        Returns:
+            {"file_path": str, "skipped": False}
+        """
+        file_path = image["file_path"]
+        spooled_path = image["spooled_path"]
+        upload_path = None
+        succeeded = False
+        
+        try:
+            extension = file_path.rsplit(".", 1)[-1]
+            try:
+                upload_path = await asyncio.to_thread(self._downscale, spooled_path, extension)
+            except Exception as e:
+                logger.warning(f"Service: Could not downscale thumbnail of schema {schema_id}, sending original: {str(e)}")
+            
+            upload_result = await self.repo_schema.upload_schema_image(file_path, upload_path or spooled_path, image["content_type"])
+            if not upload_result.success:
+                return upload_result
+            self._upload_counts["sent"] += 1
+            
+            previous_path = image.get("previous_path")
+            if previous_path and previous_path != file_path:
+                # mudou a extensão: o arquivo antigo não é mais referenciado
+                remove_result = await self.repo_schema.remove_schema_images([previous_path])
+                if not remove_result.success:
+                    logger.warning(f"Service: Could not remove old thumbnail {previous_path}: {remove_result.data}")
+            
+            save_result = await self.repo_thumbnails.save_thumbnail(schema_id, {
+                "sha256": image["sha256"],
+                "path": file_path,
+                "source_size": image["size"],
+                "stored_size": os.path.getsize(upload_path or spooled_path),
+                "content_type": image["content_type"],
+            })
+            if not save_result.success:
+                logger.warning(f"Service: Could not record thumbnail hash of schema {schema_id}: {save_result.data}")
+            
+            # nova URL assinada, para o navegador não mostrar a imagem anterior do cache
+            self._urls.invalidate(file_path)
+            self.remember_image(schema_id, file_path)
+            succeeded = True
+            
+            return Response(data={"file_path": file_path, "skipped": False}, success=True)
+        
+        except Exception as e:
+            logger.error(f"Service: Error storing thumbnail of schema {schema_id}: {str(e)}")
+            return Response(data=str(e), success=False)
+        finally:
+            paths = [upload_path] + ([spooled_path] if succeeded or not keep_on_failure else [])
+            for path in paths:
+                if path:
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+
+    async def publish_pending_image(self, schema_id: str, image: dict[str, Any]) -> Response:
+        """
+        publish_image para jobs: o arquivo local é mantido entre tentativas. Se ele já não existe,
+        uma execução anterior concluiu o envio (o hash guardado confirma) ou a imagem foi perdida.
+        """
+        if not os.path.exists(image["spooled_path"]):
+            stored_result = await self.repo_thumbnails.get_thumbnail(schema_id)
+            stored = stored_result.data if stored_result.success else None
+            if stored and stored.get("sha256") == image["sha256"]:
+                return Response(data={"file_path": image["file_path"], "skipped": True}, success=True)
+            return Response(data="Arquivo da imagem não está mais disponível, envie a imagem novamente", success=False)
+        
+        return await self.publish_image(schema_id, image, keep_on_failure=True)
+
+    async def discard_pending_image(self, image: dict[str, Any]) -> None:
+        """Apaga o arquivo local de uma imagem que não será mais enviada (job falhou de vez)."""
+        spooled_path = image.get("spooled_path")
+        if not spooled_path:
+            return
+        
+        try:
+            os.unlink(spooled_path)
+        except FileNotFoundError:
+            pass
+
+    async def store_image(self, schema_id: str, image_file: UploadFile) -> Response:
+        """
+        Envia a miniatura do schema, a não ser que o conteúdo seja o mesmo já enviado.
+
+        Returns:
+            {"file_path": str, "skipped": bool}
+        """
+        spool_result = await self.spool_image(schema_id, image_file)
+        if not spool_result.success or spool_result.data["skipped"]:
+            return spool_result
+        
+        return await self.publish_image(schema_id, spool_result.data)
+
+    @staticmethod
+    def _stored_path(schema: dict[str, Any]) -> Optional[str]:
+        """display_picture guarda o caminho no bucket (valores antigos vazios ou URLs completas são ignorados)."""
+        display_picture = schema.get("display_picture") or ""
+        if not display_picture or display_picture.startswith("http"):
+            return None
+        return display_picture
+
+    async def get_thumbnail_urls(self, schemas: list[dict[str, Any]]) -> Response:
+        """
+        URLs assinadas das miniaturas para uma lista de linhas da tabela schema.
+
+        Returns:
+            {schema_id: url ou None}
+        """
+        try:
+            urls: dict[str, Optional[str]] = {}
+            to_sign: dict[str, list[str]] = {}  # path -> schema_ids
+            unknown: list[str] = []
+
+            for schema in schemas:
+                schema_id = schema["id"]
+                path = self._paths.get(schema_id)
+                if path is None:
+                    path = self._stored_path(schema)
+
+                if path == "":
+                    urls[schema_id] = None
+                    continue
+
+                if path is None:
+                    unknown.append(schema_id)
+                    continue
+
+                cached_url = self._urls.get(path)
+                if cached_url is not None:
+                    urls[schema_id] = cached_url
+                else:
+                    to_sign.setdefault(path, []).append(schema_id)
+
+            # schemas sem caminho conhecido: todas as extensões possíveis vão no mesmo lote
+            for schema_id in unknown:
+                for extension in self.CANDIDATE_EXTENSIONS:
+                    to_sign.setdefault(f"{schema_id}.{extension}", []).append(schema_id)
+
+            if to_sign:
+                signed_result = await self.repo_schema.create_schema_images_signed_urls(
+                    list(to_sign), self.SIGNED_URL_EXPIRES_SECONDS
+                )
+                if not signed_result.success:
+                    return Response(data=f"Erro ao assinar miniaturas: {signed_result.data}", success=False)
+
+                url_ttl = max(self.SIGNED_URL_EXPIRES_SECONDS - self.REFRESH_MARGIN_SECONDS, 0)
+                for item in signed_result.data:
+                    signed_url = item.get("signedURL") or item.get("signedUrl")
+                    if item.get("error") or not signed_url:
+                        continue
+
+                    self._urls.set(item["path"], signed_url, url_ttl)
+                    for schema_id in to_sign.get(item["path"], []):
+                        self._paths.set(schema_id, item["path"])
+                        urls[schema_id] = signed_url
+
+            for schema_id in unknown:
+                if schema_id not in urls:
+                    self._paths.set(schema_id, "", self.NO_IMAGE_TTL_SECONDS)
+                    urls[schema_id] = None
+
+            for schema in schemas:
+                urls.setdefault(schema["id"], None)
+
+            return Response(data=urls, success=True)
+
+        except Exception as e:
+            logger.error(f"Service: Error getting thumbnail urls: {str(e)}")
+            return Response(data=str(e), success=False)
+
+
+register_metrics("thumbnail_url_cache", ServiceThumbnail._urls.stats)
+register_metrics("thumbnail_path_cache", ServiceThumbnail._paths.stats)
+register_metrics("thumbnail_uploads", lambda: dict(ServiceThumbnail._upload_counts))
@@ -0,0 +1,233 @@
+import os
+import copy
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core.cache import TTLCache
+from app.core.metrics import register_metrics
+from app.database.common.cells_codec import encode_cells_async
+from app.database.module_schema.repository_schema import RepositorySchema
+from app.database.module_schema.repository_versions import RepositoryVersions
+from app.models.dto.compartilhado.response import Response
+
+logger = logging.getLogger(__name__)
+
+
+def diff_cells(previous: list[dict[str, Any]], current: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Delta between two cell lists: elements added or changed, ids removed and,
+    only when it can't be inferred, the new order of the ids.
+    """
+    previous_by_id = {cell["id"]: cell for cell in previous}
+    current_ids = [cell["id"] for cell in current]
+    current_set = set(current_ids)
+
+    upsert = [cell for cell in current if previous_by_id.get(cell["id"]) != cell]
+    remove = [cell_id for cell_id in previous_by_id if cell_id not in current_set]
+
+    removed = set(remove)
+    inferred_order = [cell["id"] for cell in previous if cell["id"] not in removed]
+    inferred_order += [cell_id for cell_id in current_ids if cell_id not in previous_by_id]
+
+    return {
+        "upsert": upsert,
+        "remove": remove,
+        "order": current_ids if inferred_order != current_ids else None
+    }
+
+
+def apply_delta(cells: list[dict[str, Any]], delta: dict[str, Any]) -> list[dict[str, Any]]:
+    """Inverse of diff_cells: applies a delta on top of the previous cell list."""
+    removed = set(delta.get("remove") or [])
+    by_id = {cell["id"]: cell for cell in cells if cell["id"] not in removed}
+    order = [cell["id"] for cell in cells if cell["id"] not in removed]
+
+    for cell in delta.get("upsert") or []:
+        if cell["id"] not in by_id:
+            order.append(cell["id"])
+        by_id[cell["id"]] = cell
+
+    if delta.get("order"):
+        order = delta["order"]
+
+    return [by_id[cell_id] for cell_id in order]
+
+
+class ServiceVersions:
+    """
+    Histórico de versões dos schemas.
+
+    Cada salvamento vira uma versão guardada como delta da anterior; a cada
+    KEYFRAME_INTERVAL versões é gravado um keyframe com as células completas,
+    então materializar uma versão lê no máximo um keyframe e KEYFRAME_INTERVAL deltas.
+    """
+
+    KEYFRAME_INTERVAL = int(os.getenv("SCHEMA_VERSIONS_KEYFRAME_INTERVAL", "20"))
+    MAX_PAGE_SIZE = 100
+
+    # última versão gravada por schema: {schema_id: (version, keyframe, cells)}
+    _last_snapshot = TTLCache(
+        max_size=int(os.getenv("SCHEMA_VERSIONS_CACHE_SIZE", "256")),
+        ttl_seconds=float(os.getenv("SCHEMA_VERSIONS_CACHE_TTL_SECONDS", "600"))
+    )
+
+    # serializa a gravação do histórico por schema dentro do worker; o lock sai do dicionário
+    # quando a última gravação que o usa termina, então só ficam os schemas sendo gravados
+    _locks: Dict[str, asyncio.Lock] = {}
+    _lock_users: Dict[str, int] = {}
+
+    def __init__(self):
+        self.repo_versions = RepositoryVersions()
+        self.repo_schema = RepositorySchema()
+
+    async def delete_history(self, schema_id: str) -> Response:
+        """Apaga todas as versões do schema e o que estiver em cache dele."""
+        self._last_snapshot.invalidate(schema_id)
+        return await self.repo_versions.delete_versions(schema_id)
+
+    async def __check_access(self, schema_id: str, user_id: str) -> Optional[Response]:
+        access_result = await self.repo_schema.is_member(user_id, schema_id)
+        if not access_result.success:
+            return Response(data="Erro ao verificar permissões do usuário", success=False)
+
+        if not access_result.data:
+            return Response(data="Acesso negado: você não tem permissão para acessar este schema", success=False)
+
+        return None
+
+    async def __latest_snapshot(self, schema_id: str) -> Optional[tuple[int, int, list[dict[str, Any]]]]:
+        snapshot = self._last_snapshot.get(schema_id)
+        if snapshot is not None:
+            return snapshot
+
+        latest_result = await self.repo_versions.get_latest_version(schema_id)
+        if not latest_result.success:
+            raise Exception(latest_result.data)
+
+        latest = latest_result.data
+        if latest is None:
+            return None
+
+        cells_result = await self.__materialize(schema_id, latest["version"])
+        if not cells_result.success:
+            raise Exception(cells_result.data)
+
+        return (latest["version"], latest["keyframe"], cells_result.data)
+
+    async def record(self, schema_id: str, cells: list[dict[str, Any]], cells_version: Optional[int], user_id: str) -> Response:
+        """Grava as células salvas como nova versão do histórico (delta ou keyframe)."""
+        # cópia profunda: a sala do websocket altera as células em memória enquanto o insert aguarda
+        cells = copy.deepcopy(cells)
+        lock = self._locks.setdefault(schema_id, asyncio.Lock())
+        self._lock_users[schema_id] = self._lock_users.get(schema_id, 0) + 1
+
+        try:
+            async with lock:
+                return await self.__record(schema_id, cells, cells_version, user_id)
+        finally:
+            self._lock_users[schema_id] -= 1
+            if not self._lock_users[schema_id]:
+                del self._lock_users[schema_id]
+                del self._locks[schema_id]
+
+    async def __record(self, schema_id: str, cells: list[dict[str, Any]], cells_version: Optional[int], user_id: str) -> Response:
+        try:
+            snapshot = await self.__latest_snapshot(schema_id)
+
+            version_data: dict[str, Any] = {
+                "schema_id": schema_id,
+                "cells_version": cells_version,
+                "user_id": user_id,
+                "created_at": datetime.now()
+            }
+
+            if snapshot is None:
+                version, keyframe = 0, 0
+                version_data.update(kind="keyframe", changes=len(cells), **(await encode_cells_async(cells)))
+            else:
+                last_version, last_keyframe, last_cells = snapshot
+                delta = diff_cells(last_cells, cells)
+                changes = len(delta["upsert"]) + len(delta["remove"])
+
+                if not changes and delta["order"] is None:
+                    return Response(data=last_version, success=True)
+
+                version = last_version + 1
+                if version - last_keyframe >= self.KEYFRAME_INTERVAL:
+                    keyframe = version
+                    version_data.update(kind="keyframe", changes=changes, **(await encode_cells_async(cells)))
+                else:
+                    keyframe = last_keyframe
+                    version_data.update(kind="delta", changes=changes, delta=delta)
+
+            version_data.update(version=version, keyframe=keyframe)
+            result = await self.repo_versions.create_version(version_data)
+
+            if not result.success:
+                # o histórico mudou fora deste worker: a próxima gravação relê do banco
+                self._last_snapshot.invalidate(schema_id)
+                return result
+
+            self._last_snapshot.set(schema_id, (version, keyframe, cells))
+            return Response(data=version, success=True)
+
+        except Exception as e:
+            self._last_snapshot.invalidate(schema_id)
+            logger.error(f"Service: Error recording version of schema {schema_id}: {str(e)}")
+            return Response(data=str(e), success=False)
+
+    async def __materialize(self, schema_id: str, version: int) -> Response:
+        chain_result = await self.repo_versions.get_version_chain(schema_id, version)
+        if not chain_result.success:
+            return chain_result
+
+        keyframe, *deltas = chain_result.data
+        cells = keyframe.get("cells") or []
+        for entry in deltas:
+            cells = apply_delta(cells, entry["delta"]) if entry["kind"] == "delta" else entry.get("cells") or []
+
+        return Response(data=cells, success=True)
+
+    async def list_versions(self, schema_id: str, user_id: str, limit=None, before: Optional[int] = None) -> Response:
+        try:
+            denied = await self.__check_access(schema_id, user_id)
+            if denied:
+                return denied
+
+            limit = min(max(int(limit or self.MAX_PAGE_SIZE), 1), self.MAX_PAGE_SIZE)
+            versions_result = await self.repo_versions.list_versions(schema_id, limit, before)
+            if not versions_result.success:
+                return Response(data=f"Erro ao listar versões: {versions_result.data}", success=False)
+
+            versions = versions_result.data
+            return Response(
+                data={
+                    "versions": versions,
+                    "next_before": versions[-1]["version"] if len(versions) == limit else None
+                },
+                success=True
+            )
+
+        except Exception as e:
+            return Response(data=str(e), success=False)
+
+    async def get_version(self, schema_id: str, version: int, user_id: str) -> Response:
+        """Materializa as células de uma versão: keyframe + deltas até ela."""
+        try:
+            denied = await self.__check_access(schema_id, user_id)
+            if denied:
+                return denied
+
+            cells_result = await self.__materialize(schema_id, version)
+            if not cells_result.success:
+                return Response(data=f"Erro ao carregar versão: {cells_result.data}", success=False)
+
+            return Response(data={"schema_id": schema_id, "version": version, "cells": cells_result.data}, success=True)
+
+        except Exception as e:
+            return Response(data=str(e), success=False)
+
+
+register_metrics("versions_snapshot_cache", ServiceVersions._last_snapshot.stats)
@@ -0,0 +1,111 @@
+import os
+import json
+import uuid
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.database.module_sql.repository_exports import RepositoryExports
+from app.models.dto.compartilhado.response import Response
+
+logger = logging.getLogger(__name__)
+
+BASE_PROMPT = """
+Você é um assistente especializado em modelagem de banco de dados.
+Sua tarefa é gerar um script SQL válido a partir de um esquema de tabelas fornecido em formato JSON.
+Respeite sempre o SGBD especificado (ex: PostgreSQL, MySQL, Oracle).
+O resultado deve ser devolvido em JSON estruturado no seguinte formato:
+{
+  "sql_code": "CREATE TABLE ..."
+}
+Certifique-se de:
+1. Definir corretamente chaves primárias e estrangeiras.
+2. Usar os tipos de dados compatíveis com o SGBD informado.
+3. Incluir constraints (NOT NULL, UNIQUE, DEFAULT) quando fizer sentido.
+4. Gerar o SQL pronto para execução direta no banco.
+"""
+
+
+def _build_groq_prompt(base_prompt: str, schema: str, sgbd: str) -> str:
+    schema_str = schema if isinstance(schema, str) else str(schema)
+    return f"{base_prompt.strip()}\n\n[SCHEMA_JSON]:\n{schema_str}\n\n[SGBD]: {sgbd.strip()}"
+
+
+class ServiceSql:
+    """Geração do script SQL de um schema pelo Groq, publicado no bucket exports com URL assinada."""
+
+    SIGNED_URL_EXPIRES_SECONDS = 3600
+    GROQ_TIMEOUT_SECONDS = float(os.getenv("GROQ_TIMEOUT_SECONDS", "120"))
+
+    # Cliente async compartilhado (pool de conexões reaproveitado entre as gerações)
+    _groq_client = None
+
+    def __init__(self):
+        self.repo_exports = RepositoryExports()
+
+    def _get_groq_client(self, api_key: str):
+        if ServiceSql._groq_client is None:
+            from groq import AsyncGroq  # imported lazily in case not installed in some envs
+
+            # Provide explicit httpx client to avoid SDK constructing one with unsupported 'proxies' kwarg
+            ServiceSql._groq_client = AsyncGroq(
+                api_key=api_key,
+                http_client=httpx.AsyncClient(timeout=self.GROQ_TIMEOUT_SECONDS)
+            )
+        return ServiceSql._groq_client
+
+    async def generate_sql(self, schema_data: str, sgbd: str) -> Response:
+        """
+        Returns:
+            {"url": signed url para download do .sql}; falhas trazem status_code 500 ou 502 (resposta inválida do Groq)
+        """
+        try:
+            groq_api_key = os.getenv("GROQ_API_KEY")
+            if not groq_api_key:
+                return Response(data="GROQ_API_KEY não configurada", status_code=500, success=False)
+
+            prompt = _build_groq_prompt(BASE_PROMPT, schema_data, sgbd)
+            client = self._get_groq_client(groq_api_key)
+
+            completion = await client.chat.completions.create(
+                model=os.getenv("GROQ_MODEL", "openai/gpt-oss-20b"),
+                messages=[
+                    {"role": "system", "content": "Você é um assistente que responde apenas em JSON válido."},
+                    {"role": "user", "content": prompt},
+                ],
+                response_format={"type": "json_object"},
+                temperature=0.2,
+            )
+
+            content = completion.choices[0].message.content if completion and completion.choices else None
+            try:
+                parsed: Dict[str, Any] = json.loads(content) if content else {}
+            except Exception:
+                parsed = {}
+
+            sql_code: Optional[str] = parsed.get("sql_code") if isinstance(parsed, dict) else None
+            if not sql_code or not isinstance(sql_code, str) or not sql_code.strip():
+                return Response(data="Groq não retornou sql_code válido", status_code=502, success=False)
+
+            file_path = f"{uuid.uuid4()}.sql"
+            upload_result = await self.repo_exports.upload_sql(file_path, sql_code)
+            if not upload_result.success:
+                return Response(data=upload_result.data, status_code=500, success=False)
+
+            signed_result = await self.repo_exports.create_signed_url(file_path, self.SIGNED_URL_EXPIRES_SECONDS)
+            if not signed_result.success:
+                return Response(data=signed_result.data, status_code=500, success=False)
+
+            # attempt to force download with explicit filename to keep .sql extension
+            signed_url = signed_result.data
+            separator = "&" if "?" in signed_url else "?"
+            return Response(data={"url": f"{signed_url}{separator}download={file_path}"}, success=True)
+
+        except Exception as e:
+            logger.exception("Erro ao gerar SQL")
+            return Response(data=str(e), status_code=500, success=False)
+
+    async def run_generate_sql_job(self, payload: dict[str, Any]) -> Response:
+        """Handler do job generate_sql (ServiceJobs)."""
+        return await self.generate_sql(payload["schema_data"], payload["sgbd"])
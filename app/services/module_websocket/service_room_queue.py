@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Set
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRoomQueue:
+    """
+    Fila de operações por sala (ator).
+
+    Cada schema tem uma asyncio.Queue e uma única task consumidora, que aplica
+    as operações uma a uma na ordem de chegada. Os handlers do socket apenas
+    enfileiram e retornam; a profundidade da fila serve como sinal de backpressure.
+    """
+
+    MAX_QUEUE_SIZE = 1000  # Operações pendentes aceitas por sala
+    BACKPRESSURE_THRESHOLD = 100  # A partir desta profundidade o cliente é avisado
+
+    def __init__(self, handler: Callable[[str, Any], Awaitable[None]]):
+        """
+        Args:
+            handler: corrotina chamada pelo consumidor para cada operação (schema_id, item)
+        """
+        self.handler = handler
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._consumers: Dict[str, asyncio.Task] = {}
+        # salas com close() em andamento; uma operação nova tira a sala daqui e cancela o encerramento
+        self._closing: Set[str] = set()
+
+    def enqueue(self, schema_id: str, item: Any) -> int:
+        """
+        Enfileira uma operação na sala, iniciando o consumidor se necessário.
+
+        Returns:
+            Profundidade da fila após enfileirar
+
+        Raises:
+            asyncio.QueueFull quando a sala atingiu MAX_QUEUE_SIZE
+        """
+        if schema_id not in self._queues:
+            self._queues[schema_id] = asyncio.Queue(maxsize=self.MAX_QUEUE_SIZE)
+            self._consumers[schema_id] = asyncio.create_task(self._consume(schema_id))
+            logger.info(f"Room queue started for schema {schema_id}")
+
+        queue = self._queues[schema_id]
+        queue.put_nowait(item)
+        # a sala voltou a ser usada durante um close(): o consumidor continua ativo
+        self._closing.discard(schema_id)
+        return queue.qsize()
+
+    def depth(self, schema_id: str) -> int:
+        """Quantidade de operações aguardando processamento na sala."""
+        queue = self._queues.get(schema_id)
+        return queue.qsize() if queue else 0
+
+    async def _consume(self, schema_id: str) -> None:
+        queue = self._queues[schema_id]
+        try:
+            while True:
+                item = await queue.get()
+                try:
+                    await self.handler(schema_id, item)
+                except Exception as e:
+                    logger.error(f"Error processing operation for schema {schema_id}: {e}")
+                finally:
+                    queue.task_done()
+
+        except asyncio.CancelledError:
+            logger.info(f"Room queue consumer cancelled for schema {schema_id}")
+
+    async def close(self, schema_id: str) -> None:
+        """
+        Processa o que restou na fila da sala e encerra o consumidor.
+        Se chegar uma operação nova enquanto a fila é drenada, a sala continua aberta.
+        """
+        queue = self._queues.get(schema_id)
+        if queue is None:
+            return
+
+        # a fila só sai do dicionário depois de drenada, para que novas operações mantenham a ordem
+        self._closing.add(schema_id)
+        await queue.join()
+
+        if schema_id not in self._closing or self._queues.get(schema_id) is not queue:
+            logger.info(f"Room queue for schema {schema_id} received new operations while closing, kept open")
+            return
+
+        # sem await daqui até o pop: com a fila drenada e sem operação nova, o consumidor está parado no get()
+        self._closing.discard(schema_id)
+        self._queues.pop(schema_id, None)
+        task = self._consumers.pop(schema_id, None)
+
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        logger.info(f"Room queue closed for schema {schema_id}")
@@ -0,0 +1,249 @@
+import math
+import logging
+from typing import Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (x, y, width, height)
+Rect = Tuple[float, float, float, float]
+
+
+def rect_union(first: Optional[Rect], second: Optional[Rect]) -> Optional[Rect]:
+    """Return the bounding box of two rectangles, ignoring missing ones."""
+    if first is None:
+        return second
+    if second is None:
+        return first
+
+    left = min(first[0], second[0])
+    top = min(first[1], second[1])
+    right = max(first[0] + first[2], second[0] + second[2])
+    bottom = max(first[1] + first[3], second[1] + second[3])
+    return (left, top, right - left, bottom - top)
+
+
+def is_valid_rect(values) -> bool:
+    """Check that x, y, width and height are finite numbers and the size is not negative."""
+    if len(values) != 4:
+        return False
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return False
+    return values[2] >= 0 and values[3] >= 0
+
+
+def rects_intersect(first: Rect, second: Rect) -> bool:
+    return (
+        first[0] <= second[0] + second[2] and second[0] <= first[0] + first[2] and
+        first[1] <= second[1] + second[3] and second[1] <= first[1] + first[3]
+    )
+
+
+class ServiceViewport:
+    """
+    Service to route high-frequency updates (cursor, move) only to the sessions
+    whose viewport intersects the updated region.
+
+    Viewports are kept in a uniform grid per schema, so a query only looks at
+    the sessions registered in the grid cells covered by the updated region.
+    Sessions that never published a viewport (or whose viewport is too large
+    to be worth indexing) are treated as global and receive everything.
+    """
+
+    GRID_SIZE = 1000  # Size of each grid cell in diagram coordinates
+    MAX_GRID_CELLS = 64  # Viewports covering more cells than this are treated as global
+
+    # Storage: {schema_id: {sid: viewport rect or None}}
+    _sessions: Dict[str, Dict[str, Optional[Rect]]] = {}
+
+    # Storage: {schema_id: {(gx, gy): {sid}}}
+    _grid: Dict[str, Dict[Tuple[int, int], Set[str]]] = {}
+
+    # Storage: {schema_id: {sid}} sessions that receive every update
+    _global: Dict[str, Set[str]] = {}
+
+    # Storage: {schema_id: {table_id: rect}}
+    _tables: Dict[str, Dict[str, Rect]] = {}
+
+    def __init__(self):
+        """Initialize viewport service."""
+        pass
+
+    def initialize_schema(self, schema_id: str) -> None:
+        """Initialize viewport tracking for a schema."""
+        if schema_id not in self._sessions:
+            self._sessions[schema_id] = {}
+            self._grid[schema_id] = {}
+            self._global[schema_id] = set()
+            self._tables[schema_id] = {}
+            logger.info(f"Viewport tracking initialized for schema {schema_id}")
+
+    def _grid_cells(self, rect: Rect) -> list[Tuple[int, int]]:
+        x, y, width, height = rect
+        first_x, last_x = int(x // self.GRID_SIZE), int((x + width) // self.GRID_SIZE)
+        first_y, last_y = int(y // self.GRID_SIZE), int((y + height) // self.GRID_SIZE)
+
+        if (last_x - first_x + 1) * (last_y - first_y + 1) > self.MAX_GRID_CELLS:
+            return []
+
+        return [
+            (grid_x, grid_y)
+            for grid_x in range(first_x, last_x + 1)
+            for grid_y in range(first_y, last_y + 1)
+        ]
+
+    def _unindex_session(self, schema_id: str, sid: str) -> None:
+        self._global[schema_id].discard(sid)
+
+        viewport = self._sessions[schema_id].get(sid)
+        if viewport is None:
+            return
+
+        grid = self._grid[schema_id]
+        for cell in self._grid_cells(viewport):
+            sids = grid.get(cell)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del grid[cell]
+
+    def register_session(self, schema_id: str, sid: str) -> None:
+        """Register a session without viewport; it receives every update until it publishes one."""
+        self.initialize_schema(schema_id)
+        self._sessions[schema_id][sid] = None
+        self._global[schema_id].add(sid)
+
+    def remove_session(self, schema_id: str, sid: str) -> None:
+        """Remove a session and its viewport from the index."""
+        if schema_id not in self._sessions or sid not in self._sessions[schema_id]:
+            return
+
+        self._unindex_session(schema_id, sid)
+        del self._sessions[schema_id][sid]
+
+        if not self._sessions[schema_id]:
+            self.cleanup_schema(schema_id)
+
+    def update_viewport(self, schema_id: str, sid: str, x: float, y: float, width: float, height: float) -> list[str]:
+        """
+        Update the visible region of a session.
+
+        Returns the tables that just entered the viewport. Updates to them may have been
+        filtered out while they were outside, so the caller should send their current state.
+        """
+        self.initialize_schema(schema_id)
+
+        previous = self._sessions[schema_id].get(sid)
+        was_global = previous is None or sid in self._global[schema_id]
+
+        if sid in self._sessions[schema_id]:
+            self._unindex_session(schema_id, sid)
+
+        viewport = (x, y, width, height)
+        self._sessions[schema_id][sid] = viewport
+
+        cells = self._grid_cells(viewport)
+        if not cells:
+            self._global[schema_id].add(sid)
+        else:
+            grid = self._grid[schema_id]
+            for cell in cells:
+                grid.setdefault(cell, set()).add(sid)
+
+        if was_global:
+            # a global session received every update: nothing is stale
+            return []
+
+        return [
+            table_id for table_id, bounds in self._tables[schema_id].items()
+            if rects_intersect(viewport, bounds) and not rects_intersect(previous, bounds)
+        ]
+
+    def index_cells(self, schema_id: str, cells: list[dict]) -> None:
+        """Rebuild the table position index from the schema cells."""
+        self.initialize_schema(schema_id)
+
+        tables = {}
+        for item in cells:
+            position = item.get("position")
+            if not position:
+                continue
+
+            size = item.get("size") or {}
+            tables[item["id"]] = (
+                position.get("x", 0),
+                position.get("y", 0),
+                size.get("width", 0),
+                size.get("height", 0)
+            )
+
+        self._tables[schema_id] = tables
+
+    def table_bounds(self, schema_id: str, table_id: str) -> Optional[Rect]:
+        """Get the last known bounds of a table."""
+        return self._tables.get(schema_id, {}).get(table_id)
+
+    def update_table(
+        self,
+        schema_id: str,
+        table_id: str,
+        x: float,
+        y: float,
+        width: Optional[float] = None,
+        height: Optional[float] = None
+    ) -> Rect:
+        """Update a table position and return the region covering its old and new bounds."""
+        self.initialize_schema(schema_id)
+
+        previous = self._tables[schema_id].get(table_id)
+        if width is None:
+            width = previous[2] if previous else 0
+        if height is None:
+            height = previous[3] if previous else 0
+
+        current = (x, y, width, height)
+        self._tables[schema_id][table_id] = current
+
+        return rect_union(previous, current)
+
+    def remove_table(self, schema_id: str, table_id: str) -> None:
+        """Remove a table from the position index."""
+        self._tables.get(schema_id, {}).pop(table_id, None)
+
+    def recipients(self, schema_id: str, rect: Rect, skip_sid: Optional[str] = None) -> Optional[list[str]]:
+        """
+        Get the sessions interested in a region.
+
+        Returns None when no session of the schema published a viewport, meaning
+        the update can be broadcast to the whole room.
+        """
+        sessions = self._sessions.get(schema_id)
+        if not sessions or len(self._global[schema_id]) == len(sessions):
+            return None
+
+        interested = set(self._global[schema_id])
+        cells = self._grid_cells(rect)
+
+        if cells:
+            grid = self._grid[schema_id]
+            for cell in cells:
+                for sid in grid.get(cell, ()):
+                    if sid not in interested and rects_intersect(sessions[sid], rect):
+                        interested.add(sid)
+        else:
+            # region too large to look up in the grid: check every viewport
+            interested.update(
+                sid for sid, viewport in sessions.items()
+                if viewport is not None and rects_intersect(viewport, rect)
+            )
+
+        interested.discard(skip_sid)
+        return list(interested)
+
+    def cleanup_schema(self, schema_id: str) -> None:
+        """Clean up all viewports for a schema."""
+        self._sessions.pop(schema_id, None)
+        self._grid.pop(schema_id, None)
+        self._global.pop(schema_id, None)
+        self._tables.pop(schema_id, None)
+        logger.info(f"Viewport service cleaned up for schema {schema_id}")
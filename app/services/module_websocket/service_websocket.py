@@ -1,42 +1,239 @@
+import os
 import asyncio
 import logging
-from app.models.entities.module_websocket.websocket import CreateTable, DeleteTable, LinkTable, MoveTable, BaseElement, SchemaUpdates, TextUpdateLinkLabelAttrs, UpdateTable
+from app.core.cache import TTLCache
+from app.models.entities.module_websocket.websocket import CreateTable, DeleteTable, LinkTable, MoveTable, BaseElement, OperationResult, SchemaUpdates, TextUpdateLinkLabelAttrs, UpdateTable
 from app.models.entities.module_schema.update_schema import UpdateSchemaData
 from app.services.module_schema.service_schema import ServiceSchema
+from app.models.dto.compartilhado.response import Response
+from app.database.module_websocket.repository_journal import RepositoryJournal
 
 logger = logging.getLogger(__name__)
 
 class ServiceWebsocket:
+    # Campos de controle da operação que não fazem parte da célula persistida
+    STAMP_FIELDS = {"clock", "client_id"}
+    # Operações que podem ser gravadas no journal, pelo nome da classe
+    OP_TYPES = {op.__name__: op for op in (CreateTable, LinkTable, DeleteTable, UpdateTable, TextUpdateLinkLabelAttrs, MoveTable)}
+    
+    SAVE_DELAY_SECONDS = 2
+    SAVE_RETRY_BASE_SECONDS = 2
+    SAVE_RETRY_MAX_SECONDS = 60
+    # falhas seguidas até parar de tentar sozinho (as operações ficam no journal e a sala é avisada)
+    SAVE_MAX_FAILURES = int(os.getenv("SCHEMA_SAVE_MAX_FAILURES", "8"))
+    # operações não salvas guardadas em memória por sala; acima disso a reaplicação usa o journal
+    MAX_UNSAVED_OPS = int(os.getenv("SCHEMA_MAX_UNSAVED_OPS", "1000"))
+    
+    # schemas excluídos recentemente: operações que ainda estavam na fila da sala são descartadas
+    _deleted_schemas = TTLCache(max_size=1024, ttl_seconds=600)
+
     def __init__(self, service_schema: ServiceSchema):
         self.pending_updates: dict[str, SchemaUpdates] = {}
 
         self.service_schema = service_schema       
+        self.repo_journal = RepositoryJournal()
+        # callback (schema_id) chamado quando a sala é recarregada do banco após um conflito de versão
+        self.on_resync = None
+        # callback (schema_id) chamado quando a sala é encerrada porque o schema foi excluído
+        self.on_room_closed = None
+        # callback (schema_id, erro) chamado quando o salvamento desiste depois de SAVE_MAX_FAILURES falhas
+        self.on_save_failed = None
+        
+    async def initialie_cells(self, schema_id: str, user_id: str) -> bool:
+        """
+        Carrega as células do schema para a memória, apenas se a sala ainda não estiver ativa
+        (o estado em memória de uma sala ativa é mais recente que o banco).
+        Retorna False quando o usuário não tem acesso ao schema.
+        """
+        if (schema_id in self.pending_updates):
+            access_result = await self.service_schema.has_access(schema_id, user_id)
+            if (not (access_result.success and access_result.data)):
+                return False
+            
+            if (schema_id in self.pending_updates):
+                self.pending_updates[schema_id].idle = False
+                return True
+            # a sala ociosa foi descartada durante a verificação: carrega de novo do banco
         
-    async def initialie_cells(self, schema_id: str, user_id: str):       
         cells_from_db = await self.service_schema.get_schema_with_cells(schema_id, user_id)
-        cells_dict = cells_from_db.model_dump()
+        if (not cells_from_db.success):
+            return False
+        
+        self.pending_updates[schema_id] = SchemaUpdates(task=None)
+        self.__load_cells(schema_id, cells_from_db.data)
+        return True
 
-        if (schema_id not in self.pending_updates or not cells_dict["success"]):
-            self.pending_updates[schema_id] = SchemaUpdates(cells=[], task=None)
-            return
-            
-        self.pending_updates[schema_id].cells = cells_dict["data"]["cells"].copy()
+    def __load_cells(self, schema_id: str, schema_with_cells: dict):
+        updates = self.pending_updates[schema_id]
+        updates.cells = schema_with_cells["cells"].copy()
+        updates.version = schema_with_cells.get("version")
+        self.__build_adjacency(schema_id)
+
+    async def reload_room(self, schema_id: str, user_id: str, replay_unsaved: bool = False) -> bool:
+        """
+        Substitui o estado em memória da sala pela versão persistida (ex.: após conflito de versão).
+        Com replay_unsaved, as operações ainda não salvas são reaplicadas sobre as células recarregadas,
+        na ordem em que foram aceitas (o last-writer-wins decide entre elas como da primeira vez).
+        """
+        cells_from_db = await self.service_schema.get_schema_with_cells(schema_id, user_id)
+        if (not cells_from_db.success or schema_id not in self.pending_updates):
+            return False
+        
+        journal_ops = []
+        if (replay_unsaved and self.pending_updates[schema_id].unsaved_overflow):
+            # parte das operações não salvas saiu da memória: o journal tem todas desde o último salvamento
+            journal_result = await self.repo_journal.get_pending_ops(schema_id)
+            if (not journal_result.success or schema_id not in self.pending_updates):
+                return False
+            journal_ops = [operation for operation in map(self.__journal_operation, journal_result.data) if operation is not None]
+        
+        # sem await daqui até o fim da reaplicação: nenhuma operação nova entra no meio
+        self.__load_cells(schema_id, cells_from_db.data)
+        
+        if (replay_unsaved):
+            updates = self.pending_updates[schema_id]
+            updates.versions = {}
+            # as operações em memória podem repetir as do journal: reaplicar o mesmo carimbo não muda nada
+            operations = journal_ops + updates.unsaved_ops
+            for operation in operations:
+                self.__apply_operation(schema_id, operation, operation.client_id)
+            logger.info(f"{len(operations)} operações não salvas reaplicadas no schema {schema_id}")
+        
+        if (self.on_resync):
+            await self.on_resync(schema_id)
+        return True
+
+    def get_live_version(self, schema_id: str) -> int | None:
+        """Versão persistida das células conhecida pela sala ativa (None quando a sala não está ativa)."""
+        updates = self.pending_updates.get(schema_id)
+        if (updates is None):
+            return None
+        return updates.version
+
+    async def restore_version(self, schema_id: str, version: int, user_id: str) -> Response:
+        """
+        Restaura uma versão do histórico. Com a sala ativa, a versão substitui o estado em memória,
+        é salva pelo fluxo normal e os clientes recebem o resync; sem sala, é salva direto no banco.
+        """
+        if (schema_id not in self.pending_updates):
+            return await self.service_schema.restore_version(schema_id, version, user_id)
+
+        version_result = await self.service_schema.service_versions.get_version(schema_id, version, user_id)
+        if (not version_result.success):
+            return version_result
+
+        updates = self.pending_updates[schema_id]
+        updates.cells = version_result.data["cells"]
+        self.__build_adjacency(schema_id)
+        self.__schedule_save(schema_id, user_id)
+
+        if (self.on_resync):
+            await self.on_resync(schema_id)
+
+        return Response(data={"schema_id": schema_id, "restored_version": version, "live": True}, success=True)
+
+    @staticmethod
+    def is_link(item: dict) -> bool:
+        return item.get("type") == "standard.Link" or "source" in item or "target" in item
+
+    def iter_cell_chunks(self, schema_id: str, chunk_size: int):
+        """Gera lotes das células em memória, tabelas primeiro e links por último."""
+        cells = self.pending_updates[schema_id].cells if schema_id in self.pending_updates else []
+        ordered = [item for item in cells if not self.is_link(item)] + [item for item in cells if self.is_link(item)]
+        
+        for start in range(0, len(ordered), chunk_size):
+            yield ordered[start:start + chunk_size]
             
+    def __build_adjacency(self, schema_id: str):
+        updates = self.pending_updates[schema_id]
+        updates.adjacency = {}
+        updates.link_ends = {}
+        
+        for item in updates.cells:
+            if (self.is_link(item)):
+                self.__index_link(updates, item)
+    
+    def __index_link(self, updates: SchemaUpdates, link: dict):
+        ends = ((link.get("source") or {}).get("id"), (link.get("target") or {}).get("id"))
+        updates.link_ends[link["id"]] = ends
+        
+        for table_id in ends:
+            if (table_id):
+                updates.adjacency.setdefault(table_id, set()).add(link["id"])
+    
+    def __unindex_link(self, updates: SchemaUpdates, link_id: str):
+        for table_id in updates.link_ends.pop(link_id, ()):
+            if (table_id in updates.adjacency):
+                updates.adjacency[table_id].discard(link_id)
+        
+    def get_clock(self, schema_id: str) -> int:
+        if (schema_id not in self.pending_updates):
+            return 0
+        
+        return self.pending_updates[schema_id].clock
+
+    def __find_element(self, schema_id: str, element_id: str) -> dict | None:
+        for item in self.pending_updates[schema_id].cells:
+            if(item["id"] == element_id):
+                return item
+        
+        return None
+
+    def __stamp_operation(self, schema_id: str, received_data: BaseElement, user_id: str) -> bool:
+        """
+        Aplica a regra last-writer-wins por elemento usando (clock, client_id).
+        Operações sem carimbo recebem o próximo valor do relógio (ordem de chegada).
+        Retorna False quando a operação é mais antiga que a última aplicada no elemento.
+        """
+        updates = self.pending_updates[schema_id]
+        clock = received_data.clock if received_data.clock is not None else updates.clock + 1
+        client_id = received_data.client_id or user_id
+        
+        # regra de recepção do relógio de Lamport
+        updates.clock = max(updates.clock, clock)
+        
+        current = updates.versions.get(received_data.id)
+        if (current is not None and (clock, client_id) <= current):
+            return False
+        
+        updates.versions[received_data.id] = (clock, client_id)
+        received_data.clock = clock
+        received_data.client_id = client_id
+        return True
         
     def __manipulate_create_element(self, schema_id: str, received_data: BaseElement):
-        self.pending_updates[schema_id].cells.append(received_data.model_dump())
+        updates = self.pending_updates[schema_id]
+        cell = received_data.model_dump(exclude=self.STAMP_FIELDS)
+        
+        if (self.__find_element(schema_id, cell["id"]) is not None):
+            # criação repetida (ex.: reaplicada do journal) substitui o elemento em vez de duplicá-lo
+            if (cell["id"] in updates.link_ends):
+                self.__unindex_link(updates, cell["id"])
+            updates.cells = [item for item in updates.cells if item["id"] != cell["id"]]
+        
+        updates.cells.append(cell)
+        
+        if (isinstance(received_data, LinkTable)):
+            self.__index_link(updates, cell)
     
-    def __manipulate_delete_element(self, schema_id: str, received_data: DeleteTable):
-        if(len(self.pending_updates[schema_id].cells) == 0):
-            return
+    def __manipulate_delete_element(self, schema_id: str, received_data: DeleteTable) -> list[str]:
+        """Remove o elemento e, se for uma tabela, os links incidentes. Retorna os links removidos em cascata."""
+        updates = self.pending_updates[schema_id]
+        removed_ids = {received_data.id}
+        cascaded_links: list[str] = []
         
-        index_exclusao = 0
-        for i, item in enumerate(self.pending_updates[schema_id].cells):
-            if(item["id"] == received_data.id):
-                index_exclusao = i
-                break
-                
-        self.pending_updates[schema_id].cells.pop(index_exclusao)
+        if (received_data.id in updates.link_ends):
+            self.__unindex_link(updates, received_data.id)
+        else:
+            cascaded_links = list(updates.adjacency.pop(received_data.id, ()))
+            for link_id in cascaded_links:
+                self.__unindex_link(updates, link_id)
+                # os links herdam o carimbo da exclusão para descartar operações antigas sobre eles
+                updates.versions[link_id] = updates.versions[received_data.id]
+            removed_ids.update(cascaded_links)
+        
+        updates.cells = [item for item in updates.cells if item["id"] not in removed_ids]
+        return cascaded_links
     
     def __manipulate_update_table(self, schema_id: str, received_data: UpdateTable | TextUpdateLinkLabelAttrs):
         for item in self.pending_updates[schema_id].cells:
@@ -55,42 +252,97 @@ class ServiceWebsocket:
                 item["position"]["y"] = received_data.position.y
                 break
         
-    def __preprocess_schema_received_data(self, schema_id: str, received_data: BaseElement):
+    def __preprocess_schema_received_data(self, schema_id: str, received_data: BaseElement) -> list[str]:
         if (isinstance(received_data, CreateTable) or isinstance(received_data, LinkTable)):
             self.__manipulate_create_element(schema_id, received_data)
             
         elif (isinstance(received_data, DeleteTable)):
-            self.__manipulate_delete_element(schema_id, received_data)
+            return self.__manipulate_delete_element(schema_id, received_data)
             
         elif (isinstance(received_data, UpdateTable) or isinstance(received_data, TextUpdateLinkLabelAttrs)):
             self.__manipulate_update_table(schema_id, received_data)
             
         elif (isinstance(received_data, MoveTable)):
             self.__manipulate_move_table(schema_id, received_data)
+        
+        return []
 
-    async def manipulate_received_data(self, received_data: BaseElement, schema_id: str, user_id: str):       
+    async def manipulate_received_data(self, received_data: BaseElement, schema_id: str, user_id: str, journal: bool = True) -> OperationResult:       
+        if (self._deleted_schemas.get(schema_id, False)):
+            return OperationResult(
+                applied=False,
+                element_id=received_data.id,
+                clock=received_data.clock or 0,
+                client_id=received_data.client_id or ""
+            )
+        
         if (schema_id not in self.pending_updates):
             self.pending_updates[schema_id] = SchemaUpdates()
-            
-        self.__preprocess_schema_received_data(schema_id, received_data) 
-            
-        task = self.pending_updates[schema_id].task 
-        if (task):
+        
+        result = self.__apply_operation(schema_id, received_data, user_id)
+        if (not result.applied):
+            logger.info(f"Operação obsoleta descartada para o elemento {received_data.id} (vencedor: {result.clock}/{result.client_id})")
+            return result
+        
+        updates = self.pending_updates[schema_id]
+        updates.unsaved_ops.append(received_data)
+        if (len(updates.unsaved_ops) > self.MAX_UNSAVED_OPS):
+            # salvamentos falhando há muito tempo: a memória não cresce mais, o journal guarda as operações
+            updates.unsaved_ops.clear()
+            updates.unsaved_overflow += 1
+            logger.warning(f"Mais de {self.MAX_UNSAVED_OPS} operações não salvas no schema {schema_id}, a reaplicação passa a usar o journal")
+        
+        if (journal):
+            # grava no journal antes de devolver o resultado (e portanto antes do broadcast)
+            journal_result = await self.repo_journal.append(
+                schema_id, user_id, type(received_data).__name__, received_data.model_dump(by_alias=True)
+            )
+            if (journal_result.success):
+                self.pending_updates[schema_id].journal_seq = journal_result.data
+            else:
+                logger.warning(f"Operação no elemento {received_data.id} aplicada sem journal: {journal_result.data}")
+        
+        self.__schedule_save(schema_id, user_id)
+
+        return result
+
+    def __apply_operation(self, schema_id: str, received_data: BaseElement, user_id: str) -> OperationResult:
+        """Aplica a operação no estado em memória, se ela vencer o last-writer-wins do elemento."""
+        if (not self.__stamp_operation(schema_id, received_data, user_id)):
+            clock, client_id = self.pending_updates[schema_id].versions[received_data.id]
+            return OperationResult(
+                applied=False,
+                element_id=received_data.id,
+                clock=clock,
+                client_id=client_id,
+                element=self.__find_element(schema_id, received_data.id)
+            )
+        
+        deleted_links = self.__preprocess_schema_received_data(schema_id, received_data)
+        
+        return OperationResult(
+            applied=True,
+            element_id=received_data.id,
+            clock=received_data.clock,
+            client_id=received_data.client_id,
+            deleted_links=deleted_links
+        )
+
+    def __schedule_save(self, schema_id: str, user_id: str, delay: float | None = None):
+        task = self.pending_updates[schema_id].task
+        if (task and not task.done()):
+            # não aguarda o cancelamento: o salvamento em andamento roda numa task própria (__save)
             logger.info(f"---- Cancelando o salvamento, porque o schema foi alterado novamente ----")
             task.cancel()
-            try:
-                await task
-            except asyncio.CancelledError:
-                pass
 
         # cria um multiprocess em paralelo para rodar o metodo salvamento_com_atraso por schema
-        self.pending_updates[schema_id].task = asyncio.create_task(self.scheduled_save(schema_id, user_id))
+        self.pending_updates[schema_id].task = asyncio.create_task(self.scheduled_save(schema_id, user_id, delay))
 
-    async def scheduled_save(self, schema_id: str, user_id: str):
+    async def scheduled_save(self, schema_id: str, user_id: str, delay: float | None = None):
         try:
             #enquanto não é usado redis deve esperar um determinado tempo para persistir no banco, porém caso alguem entre nesse intervalo de tempo ficará com as tabelas desatualizadas
             #quando começar a usar o redis criar um worker que irá fazer essa comunicação de pegar os dados do redis e mandar para o supabase
-            await asyncio.sleep(2) 
+            await asyncio.sleep(self.SAVE_DELAY_SECONDS if delay is None else delay) 
 
             if(schema_id == None or schema_id.strip() == ""):
                 logger.error(f"Schema ID é None, não é possível salvar o schema.")
@@ -100,10 +352,194 @@ class ServiceWebsocket:
                 logger.error("User ID é None, não é possível salvar o schema.")
                 return
             
-            update_data = UpdateSchemaData(schema_id, self.pending_updates[schema_id].cells)
-            await self.service_schema.update_schema(update_data, user_id)
+            updates = self.pending_updates.get(schema_id)
+            if (updates is None):
+                return
+            
+            if (updates.saving is not None):
+                # salvamento anterior ainda em voo: espera a versão que ele vai gravar
+                # (wait, e não await: uma falha daquele salvamento não pode impedir este)
+                await self.__wait_saving(schema_id, updates.saving)
             
-            logger.info(f"Schema {schema_id} salvo no banco!")
+            # o salvamento e o registro do resultado rodam numa task própria, que um novo agendamento não cancela
+            updates.saving = asyncio.create_task(self.__save(schema_id, user_id, asyncio.current_task()))
+            await self.__wait_saving(schema_id, updates.saving)
         except asyncio.CancelledError:
             logger.info(f"Operação cancelada, pois o schema foi alterado")
             return
+
+    async def __wait_saving(self, schema_id: str, saving: asyncio.Task):
+        await asyncio.wait([saving])
+        if (not saving.cancelled() and saving.exception() is not None):
+            logger.error(f"Salvamento do schema {schema_id} falhou: {saving.exception()!r}")
+
+    def leave_room(self, schema_id: str):
+        """A última sessão saiu da sala: o estado em memória é descartado assim que não houver nada por salvar."""
+        updates = self.pending_updates.get(schema_id)
+        if (updates is None):
+            return
+        
+        updates.idle = True
+        self.__release_if_idle(schema_id, None)
+
+    def __release_if_idle(self, schema_id: str, origin: asyncio.Task | None):
+        updates = self.pending_updates.get(schema_id)
+        if (updates is None or not updates.idle):
+            return
+        # depois de desistir de salvar, a sala ociosa sai da memória mesmo assim: o journal reaplica as operações no próximo start
+        if ((updates.unsaved_ops or updates.unsaved_overflow) and updates.save_failures < self.SAVE_MAX_FAILURES):
+            return
+        
+        pending = updates.task
+        if (pending is not None and pending is not origin and not pending.done()):
+            return
+        if (updates.saving is not None and updates.saving is not asyncio.current_task() and not updates.saving.done()):
+            return
+        
+        del self.pending_updates[schema_id]
+        logger.info(f"Sala do schema {schema_id} ociosa descartada da memória")
+
+    async def __save(self, schema_id: str, user_id: str, origin: asyncio.Task):
+        updates = self.pending_updates[schema_id]
+        # operações do journal e da memória até aqui fazem parte deste salvamento
+        journal_seq = updates.journal_seq
+        saved_ops = len(updates.unsaved_ops)
+        overflow = updates.unsaved_overflow
+        
+        update_data = UpdateSchemaData(schema_id, updates.cells, expected_version=updates.version)
+        result = await self.service_schema.update_schema(update_data, user_id)
+        
+        if (not result.success):
+            if (isinstance(result.data, dict) and result.data.get("conflict")):
+                # outro worker/sessão salvou uma versão mais nova: recarrega a sala e reaplica por cima as operações não salvas
+                logger.warning(f"Conflito de versão ao salvar o schema {schema_id}, recarregando a sala do banco")
+                if (await self.reload_room(schema_id, user_id, replay_unsaved=True)):
+                    # as operações continuam no journal até o salvamento do estado mesclado
+                    pending = updates.task
+                    if (pending is None or pending is origin or pending.done()):
+                        updates.task = asyncio.create_task(self.scheduled_save(schema_id, user_id, 0))
+                    return
+            
+            updates.save_failures += 1
+            logger.error(f"Erro ao salvar o schema {schema_id} (tentativa {updates.save_failures}): {result.data}")
+            
+            if (updates.save_failures >= self.SAVE_MAX_FAILURES):
+                # para de tentar sozinho: a próxima alteração agenda um novo salvamento
+                logger.error(f"Salvamento do schema {schema_id} suspenso após {updates.save_failures} falhas, as operações seguem no journal")
+                if (self.on_save_failed is not None):
+                    await self.on_save_failed(schema_id, str(result.data))
+                self.__release_if_idle(schema_id, origin)
+                return
+            
+            pending = updates.task
+            if (pending is None or pending is origin or pending.done()):
+                # nenhuma alteração nova agendou outro salvamento: tenta de novo com backoff (as operações estão no journal)
+                delay = min(self.SAVE_RETRY_BASE_SECONDS * 2 ** (updates.save_failures - 1), self.SAVE_RETRY_MAX_SECONDS)
+                updates.task = asyncio.create_task(self.scheduled_save(schema_id, user_id, delay))
+            return
+        
+        updates.version = result.data["version"]
+        updates.save_failures = 0
+        if (updates.unsaved_overflow == overflow):
+            del updates.unsaved_ops[:saved_ops]
+            updates.unsaved_overflow = 0
+        # senão a lista foi esvaziada durante o salvamento e só tem operações posteriores a ele; o journal segue necessário
+        await self.__drain_journal(schema_id, journal_seq)
+        logger.info(f"Schema {schema_id} salvo no banco!")
+        
+        self.__release_if_idle(schema_id, origin)
+
+    async def __drain_journal(self, schema_id: str, up_to_seq: int | None):
+        if (up_to_seq is None):
+            return
+        
+        truncate_result = await self.repo_journal.truncate(schema_id, up_to_seq)
+        if (not truncate_result.success):
+            # as operações continuam no journal e serão reaplicadas (de forma idempotente) no próximo start
+            logger.warning(f"Não foi possível limpar o journal do schema {schema_id}: {truncate_result.data}")
+
+    async def fork_schema(self, schema_id: str, user_id: str, title: str | None = None) -> Response:
+        """Duplica o schema; com a sala aberta, o salvamento pendente é antecipado para a cópia incluir as últimas operações."""
+        updates = self.pending_updates.get(schema_id)
+        if (updates is not None and updates.task is not None and not updates.task.done()):
+            access_result = await self.service_schema.has_access(schema_id, user_id)
+            if (access_result.success and access_result.data):
+                self.__schedule_save(schema_id, user_id, delay=0)
+                # wait (e não await): se uma nova operação reagendar o salvamento, a cópia segue com o que já foi gravado
+                await asyncio.wait([self.pending_updates[schema_id].task])
+        
+        return await self.service_schema.fork_schema(schema_id, user_id, title)
+
+    async def close_room(self, schema_id: str):
+        """
+        Encerra a sala de um schema já excluído: descarta o estado em memória, cancela os salvamentos
+        pendentes, limpa o journal e avisa os clientes conectados (on_room_closed).
+        """
+        # operações que ainda estão na fila da sala são descartadas a partir daqui
+        self._deleted_schemas.set(schema_id, True)
+        
+        updates = self.pending_updates.pop(schema_id, None)
+        if (updates is not None):
+            tasks = [task for task in (updates.task, updates.saving) if task is not None and not task.done()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        purge_result = await self.repo_journal.purge(schema_id)
+        if (not purge_result.success):
+            logger.warning(f"Não foi possível limpar o journal do schema {schema_id}: {purge_result.data}")
+        
+        if (self.on_room_closed is not None):
+            await self.on_room_closed(schema_id)
+
+    async def delete_schema(self, schema_id: str, user_id: str) -> Response:
+        """
+        Exclui o schema e só então fecha a sala em tempo real. Se a exclusão falhar a sala
+        continua aberta, com as alterações ainda não salvas e o journal intactos.
+        """
+        result = await self.service_schema.delete_schema(schema_id, user_id)
+        if (not result.success):
+            return result
+        
+        await self.close_room(schema_id)
+        
+        return result
+
+    def __journal_operation(self, op: dict) -> BaseElement | None:
+        op_class = self.OP_TYPES.get(op["op_type"])
+        if (op_class is None):
+            logger.warning(f"Tipo de operação desconhecido no journal: {op['op_type']}")
+            return None
+        return op_class(**op["payload"])
+
+    async def replay_journal(self):
+        """
+        Reaplica as operações que ficaram no journal (processo encerrado antes de salvar)
+        sobre as células do banco e agenda o salvamento de cada schema.
+        """
+        pending_result = await self.repo_journal.get_pending_ops()
+        if (not pending_result.success):
+            logger.error(f"Não foi possível ler o journal: {pending_result.data}")
+            return
+        
+        ops_by_schema: dict[str, list[dict]] = {}
+        for op in pending_result.data:
+            ops_by_schema.setdefault(op["schema_id"], []).append(op)
+        
+        for schema_id, ops in ops_by_schema.items():
+            user_id = ops[-1]["user_id"]
+            if (not await self.initialie_cells(schema_id, user_id)):
+                logger.error(f"Não foi possível carregar o schema {schema_id} para reaplicar o journal, as operações foram mantidas")
+                continue
+            
+            for op in ops:
+                operation = self.__journal_operation(op)
+                if (operation is None):
+                    continue
+                
+                await self.manipulate_received_data(operation, schema_id, op["user_id"], journal=False)
+            
+            self.pending_updates[schema_id].journal_seq = ops[-1]["seq"]
+            # ninguém está conectado: a sala sai da memória depois do salvamento
+            self.pending_updates[schema_id].idle = True
+            logger.info(f"Journal: {len(ops)} operações reaplicadas no schema {schema_id}")
@@ -0,0 +1,89 @@
+"""
+Mede o atraso do event loop durante salvamentos concorrentes de células no MongoDB.
+
+Compara o caminho antigo (pymongo síncrono chamado dentro de async def) com o
+RepositoryCells atual (AsyncMongoClient). Requer um mongod local, por exemplo:
+
+    docker run --rm -p 27017:27017 mongo:7
+    python -m benchmarks.bench_mongo_event_loop_lag
+"""
+import asyncio
+import os
+import statistics
+import time
+
+from pymongo import MongoClient
+
+from app.database.common.database_manager import db_manager
+from app.database.module_schema.repository_cells import RepositoryCells
+
+CONCURRENT_SAVES = int(os.getenv("BENCH_CONCURRENT_SAVES", "200"))
+CELLS_PER_SAVE = int(os.getenv("BENCH_CELLS_PER_SAVE", "300"))
+TICK_INTERVAL = 0.005
+
+
+def build_cells(count: int) -> list[dict]:
+    return [
+        {
+            "id": f"table-{i}",
+            "type": "standard.Rectangle",
+            "position": {"x": i * 10, "y": i * 5},
+            "size": {"width": 180, "height": 120},
+            "attrs": {"label": {"text": f"tabela_{i}", "fontSize": 14, "fill": "#333"}, "rows": {}},
+        }
+        for i in range(count)
+    ]
+
+
+async def measure_lag(stop: asyncio.Event, samples: list[float]):
+    """Registra quanto cada tick do loop atrasou em relação ao intervalo esperado."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_INTERVAL)
+        samples.append(time.perf_counter() - start - TICK_INTERVAL)
+
+
+async def run(label: str, save):
+    cells = build_cells(CELLS_PER_SAVE)
+    stop = asyncio.Event()
+    samples: list[float] = []
+    ticker = asyncio.create_task(measure_lag(stop, samples))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(save({"cells": cells}) for _ in range(CONCURRENT_SAVES)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await ticker
+
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99) - 1] if samples else 0
+    print(
+        f"{label:>6}: {elapsed:.2f}s total | ticks={len(samples)} "
+        f"lag médio={statistics.mean(samples) * 1000 if samples else 0:.1f}ms "
+        f"p99={p99 * 1000:.1f}ms max={max(samples, default=0) * 1000:.1f}ms"
+    )
+
+
+async def main():
+    connection_string = os.getenv("MONGODB_CONNECTION_STRING", "mongodb://localhost:27017")
+    database_name = os.getenv("MONGODB_DATABASE_NAME", "colabd_bench")
+    os.environ["MONGODB_DATABASE_NAME"] = database_name
+
+    sync_collection = MongoClient(connection_string)[database_name]["models"]
+
+    async def sync_save(cells_data: dict):
+        sync_collection.insert_one(dict(cells_data))
+
+    await db_manager._initialize_mongodb()
+    repo_cells = RepositoryCells()
+
+    await run("sync", sync_save)
+    await run("async", repo_cells.create_cells)
+
+    sync_collection.drop()
+    await db_manager.close_connections()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+Mede o pipeline de resposta JSON com um payload de schema de ~5 MB.
+
+Compara o caminho padrão do FastAPI (validação do response_model + jsonable_encoder +
+json da stdlib) com o FastResponseRoute/FastJSONResponse, com e sem compressão.
+Roda em processo, sem rede nem banco:
+
+    python -m benchmarks.bench_response_pipeline
+"""
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import httpx
+from fastapi import APIRouter, FastAPI
+
+from app.core.responses import FastJSONResponse, FastResponseRoute, add_compression, orjson
+from app.models.dto.compartilhado.response import Response
+
+PAYLOAD_MB = float(os.getenv("BENCH_PAYLOAD_MB", "5"))
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "20"))
+
+
+def build_cells(target_bytes: int) -> list[dict]:
+    cells = []
+    size = 0
+    i = 0
+    while size < target_bytes:
+        rows = {
+            f"row-{r}": {"name": f"coluna_{r}", "type": "VARCHAR(255)", "pk": r == 0, "fk": False}
+            for r in range(8)
+        }
+        cell = {
+            "id": f"table-{i}",
+            "type": "standard.Rectangle",
+            "position": {"x": i * 10, "y": i * 5},
+            "size": {"width": 180, "height": 120},
+            "attrs": {"label": {"text": f"tabela_{i}", "fontSize": 14, "fill": "#333"}, "rows": rows},
+            "clock": i,
+            "client_id": "bench",
+        }
+        cells.append(cell)
+        size += len(json.dumps(cell, separators=(",", ":")))
+        i += 1
+    return cells
+
+
+def build_app(fast: bool, payload: dict) -> FastAPI:
+    app = FastAPI(default_response_class=FastJSONResponse) if fast else FastAPI()
+    router = APIRouter(route_class=FastResponseRoute) if fast else APIRouter()
+
+    @router.get("/schema", response_model=Response)
+    async def get_schema():
+        return Response(data=payload, success=True)
+
+    app.include_router(router)
+    if fast:
+        add_compression(app)
+    return app
+
+
+async def run(label: str, app: FastAPI, headers: dict):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/schema", headers=headers)  # aquecimento
+
+        timings = []
+        wire_size = 0
+        for _ in range(REQUESTS):
+            start = time.perf_counter()
+            response = await client.get("/schema", headers=headers)
+            timings.append(time.perf_counter() - start)
+            wire_size = response.num_bytes_downloaded
+
+    print(
+        f"{label:<34} mediana {statistics.median(timings) * 1000:8.1f} ms | "
+        f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1] * 1000:8.1f} ms | "
+        f"bytes enviados {wire_size / 1024 / 1024:6.2f} MB"
+    )
+
+
+async def main():
+    cells = build_cells(int(PAYLOAD_MB * 1024 * 1024))
+    payload = {"schema": {"id": "bench", "title": "bench"}, "cells": cells, "version": 1}
+
+    print(f"{len(cells)} células, {REQUESTS} requisições, encoder: {'orjson' if orjson else 'json (stdlib)'}")
+    await run("padrão (response_model + stdlib)", build_app(False, payload), {"Accept-Encoding": "identity"})
+    await run("FastJSONResponse", build_app(True, payload), {"Accept-Encoding": "identity"})
+    await run("FastJSONResponse + gzip", build_app(True, payload), {"Accept-Encoding": "gzip"})
+    await run("FastJSONResponse + br/gzip", build_app(True, payload), {"Accept-Encoding": "br, gzip"})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
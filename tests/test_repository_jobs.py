@@ -0,0 +1,56 @@
+import time
+import asyncio
+
+from app.database.common.sqlite_database import SQLiteDatabase
+from app.database.module_jobs.repository_jobs import RepositoryJobs
+
+
+def open_repository(path):
+    # cada repositório com a própria conexão, como dois processos usando o mesmo arquivo
+    repository = RepositoryJobs()
+    repository._database = SQLiteDatabase(str(path), RepositoryJobs._database.schema, name="jobs-test")
+    return repository
+
+
+def test_job_is_claimed_only_once_across_connections(tmp_path):
+    async def scenario():
+        first, second = open_repository(tmp_path / "jobs.sqlite3"), open_repository(tmp_path / "jobs.sqlite3")
+        await first.enqueue("j1", "kind", "u1", {}, max_attempts=3)
+
+        claims = await asyncio.gather(first.claim_next("a", 60), second.claim_next("b", 60))
+        await first.close()
+        await second.close()
+        return [claim.data for claim in claims]
+
+    jobs = [job for job in asyncio.run(scenario()) if job is not None]
+
+    assert len(jobs) == 1
+    assert jobs[0]["status"] == "running"
+    assert jobs[0]["attempts"] == 1
+
+
+def test_expired_lease_is_taken_over_and_old_owner_cannot_finish(tmp_path):
+    async def scenario():
+        repository = open_repository(tmp_path / "jobs.sqlite3")
+        await repository.enqueue("j1", "kind", "u1", {}, max_attempts=3)
+
+        await repository.claim_next("a", 60)
+        assert (await repository.claim_next("b", 60)).data is None
+        assert (await repository.recover(time.time() - 3600)).data == 0
+
+        await repository.extend_lease("j1", "a", -1)
+        taken = (await repository.claim_next("b", 60)).data
+        lost = (await repository.mark_succeeded("j1", "a", {"ok": True})).data
+        finished = (await repository.mark_succeeded("j1", "b", {"ok": True})).data
+        job = (await repository.get_job("j1")).data
+        await repository.close()
+        return taken, lost, finished, job
+
+    taken, lost, finished, job = asyncio.run(scenario())
+
+    assert taken["owner"] == "b"
+    assert taken["attempts"] == 2
+    assert lost is False
+    assert finished is True
+    assert job["status"] == "succeeded"
+    assert job["owner"] is None
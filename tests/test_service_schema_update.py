@@ -0,0 +1,68 @@
+import asyncio
+
+from app.models.dto.compartilhado.response import Response
+from app.models.entities.module_schema.update_schema import UpdateSchemaData
+from app.services.module_schema.service_schema import ServiceSchema
+
+
+def returning(data, success=True):
+    async def call(*args, **kwargs):
+        return Response(data=data, success=success)
+    return call
+
+
+def build_service(database_model):
+    service = ServiceSchema()
+    calls = {"database_model": [], "touch": 0, "display_picture": []}
+
+    service.repo_schema.get_schema_by_id = returning({"id": "s1", "database_model": database_model, "display_picture": ""})
+    service.repo_schema.is_member = returning(True)
+    service.service_thumbnail.store_image = returning("storage indisponível", success=False)
+    service.service_versions.record = returning(1)
+
+    async def update_database_model(schema_id, database_model_id):
+        calls["database_model"].append(database_model_id)
+        return Response(data={}, success=True)
+
+    async def touch(schema_id):
+        calls["touch"] += 1
+        return Response(data={}, success=True)
+
+    async def update_display_picture(schema_id, path):
+        calls["display_picture"].append(path)
+        return Response(data={}, success=True)
+
+    service.repo_schema.update_schema_database_model = update_database_model
+    service.repo_schema.touch_schema = touch
+    service.repo_schema.update_schema_display_picture = update_display_picture
+    return service, calls
+
+
+def test_image_failure_still_points_schema_to_new_cells_document():
+    service, calls = build_service(database_model=None)
+    service.repo_cells.create_cells = returning("65f000000000000000000001")
+
+    result = asyncio.run(service.update_schema(UpdateSchemaData("s1", [{"id": "a"}]), "u1", display_picture=object()))
+
+    assert result.success
+    assert result.data["database_model"] == "65f000000000000000000001"
+    assert result.data["version"] == 0
+    assert result.data["image_error"].startswith("Erro no upload da imagem")
+    assert calls["database_model"] == ["65f000000000000000000001"]
+    assert calls["display_picture"] == []
+
+
+def test_image_failure_returns_new_version_of_in_place_save():
+    service, calls = build_service(database_model="65f000000000000000000001")
+    service.repo_cells.update_cells_by_id = returning({"version": 4})
+
+    result = asyncio.run(service.update_schema(
+        UpdateSchemaData("s1", [{"id": "a"}], expected_version=3), "u1", display_picture=object()
+    ))
+
+    assert result.success
+    assert result.data["version"] == 4
+    assert result.data["database_model"] == "65f000000000000000000001"
+    assert result.data["image_uploaded"] is False
+    assert calls["touch"] == 1
+    assert calls["database_model"] == []
@@ -0,0 +1,100 @@
+import asyncio
+
+from app.models.dto.compartilhado.response import Response
+from app.models.entities.module_websocket.websocket import MoveTable
+from app.services.module_schema.service_schema import ServiceSchema
+from app.services.module_websocket.service_websocket import ServiceWebsocket
+
+
+def returning(data, success=True):
+    async def call(*args, **kwargs):
+        return Response(data=data, success=success)
+    return call
+
+
+def build_service(update_schema):
+    service_schema = ServiceSchema()
+    stored = {"cells": [{"id": "a", "type": "standard.Rectangle", "position": {"x": 0, "y": 0}}], "version": 3}
+    service_schema.get_schema_with_cells = lambda *args: returning(dict(stored, cells=list(stored["cells"])))()
+    service_schema.has_access = returning(True)
+    service_schema.update_schema = update_schema
+
+    service = ServiceWebsocket(service_schema)
+    service.SAVE_DELAY_SECONDS = 0
+    service.SAVE_RETRY_BASE_SECONDS = 0.001
+
+    journal = []
+
+    async def append(schema_id, user_id, op_type, payload):
+        journal.append({"seq": len(journal) + 1, "schema_id": schema_id, "user_id": user_id, "op_type": op_type, "payload": payload})
+        return Response(data=len(journal), success=True)
+
+    service.repo_journal.append = append
+    service.repo_journal.truncate = returning(0)
+    service.repo_journal.get_pending_ops = lambda schema_id=None: returning([op for op in journal if op["schema_id"] == schema_id])()
+    return service
+
+
+def move(x):
+    return MoveTable(id="a", position={"x": x, "y": 0})
+
+
+def test_overflowed_unsaved_ops_are_replayed_from_the_journal_after_a_conflict():
+    attempts = []
+
+    async def update_schema(data, user_id):
+        attempts.append([cell["position"]["x"] for cell in data.cells])
+        if len(attempts) == 1:
+            return Response(data={"conflict": True}, success=False)
+        return Response(data={"version": 5}, success=True)
+
+    async def scenario():
+        service = build_service(update_schema)
+        service.SAVE_DELAY_SECONDS = 0.05
+        service.MAX_UNSAVED_OPS = 2
+        await service.initialie_cells("s1", "u1")
+
+        for x in (1, 2, 3):
+            await service.manipulate_received_data(move(x), "s1", "u1")
+        updates = service.pending_updates["s1"]
+        overflowed = (list(updates.unsaved_ops), updates.unsaved_overflow)
+
+        await asyncio.sleep(0.2)
+        return service, overflowed
+
+    service, overflowed = asyncio.run(scenario())
+    updates = service.pending_updates["s1"]
+
+    assert overflowed == ([], 1)
+    assert attempts == [[3], [3]]
+    assert updates.version == 5
+    assert updates.unsaved_overflow == 0
+
+
+def test_save_gives_up_after_max_failures_and_releases_the_idle_room():
+    attempts = []
+    notified = []
+
+    async def update_schema(data, user_id):
+        attempts.append(data)
+        return Response(data="banco indisponível", success=False)
+
+    async def on_save_failed(schema_id, error):
+        notified.append((schema_id, error))
+
+    async def scenario():
+        service = build_service(update_schema)
+        service.SAVE_MAX_FAILURES = 3
+        service.on_save_failed = on_save_failed
+        await service.initialie_cells("s1", "u1")
+
+        await service.manipulate_received_data(move(1), "s1", "u1")
+        service.leave_room("s1")
+        await asyncio.sleep(0.2)
+        return service
+
+    service = asyncio.run(scenario())
+
+    assert len(attempts) == 3
+    assert notified == [("s1", "banco indisponível")]
+    assert "s1" not in service.pending_updates